@@ -0,0 +1,250 @@
+import argparse
+import datetime
+import importlib.util
+import itertools
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import urllib.request
+
+import numpy as np
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Callbacks pro Dashboard: Argumente in Aufrufreihenfolge und wie Dash sie über /_dash-update-component schickt
+CALLBACKS = {
+    'alps': {
+        'update_country_options': {
+            'args': ['year'],
+            'output': 'country-dropdown.options',
+            'inputs': [('year-slider', 'value')],
+        },
+        'update_map': {
+            'args': ['year', 'country'],
+            'output': '..map-plot.figure...flood-table.data...damage-table.data..',
+            'inputs': [('year-slider', 'value'), ('country-dropdown', 'value'), ('raster-statistic', 'value'),
+                       ('raster-month', 'value')],
+        },
+        # Die Figur selbst entsteht im Browser (assets/precipitation.js), der Server liefert nur die Tagesreihe
+        'update_chart_data': {
+            'args': ['year', 'country'],
+            'output': 'precipitation-data.data',
+            'inputs': [('year-slider', 'value'), ('country-dropdown', 'value')],
+        },
+        # Direkt wird cumulative_figure gemessen, über HTTP der Callback (mit CDK_BACKGROUND_JOBS=1 Start des Jobs bis
+        # zum Ergebnis)
+        'cumulative_figure': {
+            'args': ['year', 'timeframe', 'country'],
+            'output': 'cumulative-precipitation-plot.figure',
+            'inputs': [('year-slider', 'value'), ('timeframe-dropdown', 'value'), ('country-dropdown', 'value'),
+                       ('cumulative-precipitation-plot', 'relayoutData')],
+        },
+    },
+    'ch': {
+        'update_map': {
+            'args': ['year', 'country'],
+            'output': '..map-plot.figure...flood-table.data...damage-table.data..',
+            'inputs': [('year-slider', 'value'), ('country-dropdown', 'value')],
+        },
+        'update_chart_data': {
+            'args': ['year'],
+            'output': 'precipitation-data.data',
+            'inputs': [('year-slider', 'value')],
+        },
+    },
+}
+
+MODULES = {'alps': 'dashboard_alps', 'ch': 'dashboard'}
+
+
+def peak_rss_mb(pid=None):
+    if pid is None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    # Spitzenwert des Server-Prozesses (Linux), bei gunicorn die PID eines Workers aus /health
+    with open(f'/proc/{pid}/status') as status:
+        for line in status:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) / 1024
+    return None
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def import_dashboard(name):
+    # Dashboards sind Skripte und keine Pakete, daher über den Pfad laden (ohne app.run_server)
+    path = os.path.join(ROOT_DIR, 'dashboard', f'{MODULES[name]}.py')
+    spec = importlib.util.spec_from_file_location(MODULES[name], path)
+    module = importlib.util.module_from_spec(spec)
+    # Flask sucht das Modul über sys.modules, sonst findet es für 'dashboard' das gleichnamige Verzeichnis
+    sys.modules[MODULES[name]] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def argument_grid(spec, years, countries, timeframes):
+    values = {'year': years, 'country': countries, 'timeframe': timeframes}
+    return list(itertools.product(*(values[arg] for arg in spec['args'])))
+
+
+def payload_size(result):
+    import plotly
+    return len(json.dumps(result, cls=plotly.utils.PlotlyJSONEncoder))
+
+
+def call_direct(module, name, args):
+    func = getattr(module, name)
+    # Ungecachte Funktion messen, sonst misst der Benchmark nur den FigureCache
+    func = getattr(func, 'uncached', func)
+    if name == 'cumulative_figure':
+        args = args + (None,)
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, payload_size(result)
+
+
+def _post(url, payload, query=''):
+    request = urllib.request.Request(url + '/_dash-update-component' + query, data=json.dumps(payload).encode(),
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=300) as response:
+        return response.read()
+
+
+def call_http(url, spec, args, poll_seconds=0.05):
+    values = list(args) + [None] * (len(spec['inputs']) - len(args))
+    output = spec['output']
+    if output.startswith('..'):
+        outputs = [dict(zip(('id', 'property'), part.split('.'))) for part in output.strip('.').split('...')]
+    else:
+        outputs = dict(zip(('id', 'property'), output.split('.')))
+    payload = {
+        'output': output,
+        'outputs': outputs,
+        'inputs': [{'id': id_, 'property': prop, 'value': value} for (id_, prop), value in zip(spec['inputs'], values)],
+        'changedPropIds': [f'{spec["inputs"][0][0]}.{spec["inputs"][0][1]}'],
+        'state': [],
+    }
+    start = time.perf_counter()
+    body = _post(url, payload)
+    job = json.loads(body) if body else {}
+    # Background-Callbacks antworten mit cacheKey/job, abgefragt wird bis 'response' (nicht nur 'progress') kommt
+    if 'cacheKey' in job:
+        query = f"?cacheKey={job['cacheKey']}&job={job['job']}"
+        while True:
+            time.sleep(poll_seconds)
+            body = _post(url, payload, query)
+            if body and 'response' in json.loads(body):
+                break
+    return time.perf_counter() - start, len(body)
+
+
+def summarize(seconds, sizes, rss_mb):
+    milliseconds = np.array(seconds) * 1000
+    p50, p95, p99 = np.percentile(milliseconds, [50, 95, 99])
+    return {
+        'calls': len(milliseconds),
+        'mean_ms': round(float(milliseconds.mean()), 3),
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+        'max_ms': round(float(milliseconds.max()), 3),
+        'payload_bytes_mean': int(np.mean(sizes)),
+        'payload_bytes_max': int(np.max(sizes)),
+        'peak_rss_mb': round(rss_mb, 1) if rss_mb is not None else None,
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as file:
+        baseline = json.load(file)
+    print(f"\ncompared with {baseline_path} (commit {baseline.get('commit')}):")
+    for name, stats in results['callbacks'].items():
+        old = baseline['callbacks'].get(name)
+        if old is None:
+            continue
+        ratios = ' '.join(f"{key[:-3]} {stats[key] / old[key]:.2f}x" for key in ('p50_ms', 'p95_ms', 'p99_ms')
+                          if old[key])
+        print(f"  {name:<24} {ratios}, payload {stats['payload_bytes_mean'] / old['payload_bytes_mean']:.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Latency, payload size and memory of the dashboard callbacks.')
+    parser.add_argument('--dashboard', choices=sorted(CALLBACKS), default='alps')
+    parser.add_argument('--mode', choices=['direct', 'http'], default='direct')
+    parser.add_argument('--url', default='http://127.0.0.1:8050', help='running server for --mode http')
+    parser.add_argument('--server-pid', type=int, help='server process for the peak RSS in --mode http (Linux)')
+    parser.add_argument('--data-dir', help='data directory (CDK_DATA_DIR), e.g. synthetic data')
+    parser.add_argument('--callbacks', nargs='+', help='subset of the callbacks, default all')
+    parser.add_argument('--years', type=int, nargs='+', help='default: every year with floods')
+    parser.add_argument('--countries', nargs='+', help="default: every country with floods plus 'none'")
+    parser.add_argument('--timeframes', nargs='+', default=['D', 'W', 'M'])
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--output', help='JSON result file, default benchmarks/results/<dashboard>-<mode>-<commit>.json')
+    parser.add_argument('--compare', help='earlier JSON result to compare with')
+    args = parser.parse_args()
+
+    if args.data_dir:
+        os.environ['CDK_DATA_DIR'] = os.path.abspath(args.data_dir)
+    # Keine Vorberechnung beim Import, gemessen wird die ungecachte Arbeit
+    os.environ.setdefault('CDK_CACHE_WARM_YEARS', '0')
+    sys.path.insert(0, ROOT_DIR)
+    from climate_data.dataset import get_dataset
+
+    dataset = get_dataset(args.dashboard)
+    years = args.years or dataset.years()
+    countries = [None if country == 'none' else country for country in args.countries] if args.countries \
+        else [None] + sorted(dataset.flood_data['Country name'].dropna().unique())
+
+    module = import_dashboard(args.dashboard) if args.mode == 'direct' else None
+    results = {
+        'commit': git_commit(),
+        'dashboard': args.dashboard,
+        'mode': args.mode,
+        'data_dir': os.environ.get('CDK_DATA_DIR'),
+        'python': platform.python_version(),
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'grid': {'years': years, 'countries': countries, 'timeframes': args.timeframes},
+        'callbacks': {},
+    }
+
+    print(f"{'callback':<24} {'calls':>6} {'p50 [ms]':>9} {'p95 [ms]':>9} {'p99 [ms]':>9} {'payload [kB]':>13} "
+          f"{'peak RSS [MB]':>14}")
+    for name, spec in CALLBACKS[args.dashboard].items():
+        if args.callbacks and name not in args.callbacks:
+            continue
+        seconds, sizes = [], []
+        for call_args in argument_grid(spec, years, countries, args.timeframes) * args.repeat:
+            if args.mode == 'direct':
+                elapsed, size = call_direct(module, name, call_args)
+            else:
+                elapsed, size = call_http(args.url, spec, call_args)
+            seconds.append(elapsed)
+            sizes.append(size)
+        rss_mb = peak_rss_mb(args.server_pid) if args.mode == 'http' and args.server_pid else \
+            peak_rss_mb() if args.mode == 'direct' else None
+        stats = summarize(seconds, sizes, rss_mb)
+        results['callbacks'][name] = stats
+        print(f"{name:<24} {stats['calls']:>6} {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f} "
+              f"{stats['payload_bytes_mean'] / 1024:>13.1f} {stats['peak_rss_mb'] or float('nan'):>14.0f}")
+
+    output = args.output or os.path.join(ROOT_DIR, 'benchmarks', 'results',
+                                         f"{args.dashboard}-{args.mode}-{results['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump(results, file, indent=2)
+    print(f"results written to {output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from climate_data import cube, loader
+
+
+def store_groupby(dataset, year, country):
+    # Bisheriger Weg ohne Rollup: Jahr (und Land) aus dem Parquet-Store lesen und pro Tag gruppieren
+    rain = loader.load_rain(dataset, years=[year], columns=['DAY', 'PRECIPITATION'], country=country)
+    return rain.groupby('DAY')['PRECIPITATION'].agg(PRECIPITATION_SUM='sum', N='count').reset_index()
+
+
+def cube_daily(rain_cube, year, country):
+    return rain_cube.daily(f'{year}-01-01', f'{year}-12-31', country)
+
+
+def measure(func, calls):
+    seconds = []
+    for args in calls:
+        start = time.perf_counter()
+        func(*args)
+        seconds.append(time.perf_counter() - start)
+    return np.array(seconds) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Daily country means: Parquet store + groupby vs. memory-mapped cube.')
+    parser.add_argument('--dataset', default='alps')
+    parser.add_argument('--countries', nargs='+', default=[None, 'Switzerland', 'Italy', 'Austria'])
+    parser.add_argument('--calls', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rain_cube = cube.open_cube(args.dataset)
+    years = loader.available_years(args.dataset)
+    rng = np.random.default_rng(args.seed)
+    calls = [(int(rng.choice(years)), args.countries[rng.integers(len(args.countries))]) for _ in range(args.calls)]
+
+    # Gleiche Summen prüfen (float32-Werte, Summation in anderer Reihenfolge)
+    year, country = calls[0]
+    expected = store_groupby(args.dataset, year, country)
+    actual = cube_daily(rain_cube, year, country)
+    actual = actual[actual['N'] > 0]
+    assert (actual['N'].to_numpy() == expected['N'].to_numpy()).all()
+    assert np.allclose(actual['PRECIPITATION_SUM'], expected['PRECIPITATION_SUM'], rtol=1e-4)
+
+    print(f"{rain_cube.precipitation.shape[0]} days x {rain_cube.precipitation.shape[1]} cells, {len(calls)} calls")
+    print(f"{'method':<16} {'p50 [ms]':>9} {'p95 [ms]':>9}")
+    for name, func in [('store groupby', lambda y, c: store_groupby(args.dataset, y, c)),
+                       ('cube', lambda y, c: cube_daily(rain_cube, y, c))]:
+        milliseconds = measure(func, calls)
+        print(f"{name:<16} {np.percentile(milliseconds, 50):>9.2f} {np.percentile(milliseconds, 95):>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from climate_data import dates
+
+FORMATS = ['%d.%m.%Y', '%Y-%m-%d', '%Y%m%d']
+
+
+def trial_formats(values):
+    # Bisheriges loader.parse_dates: ein Format gilt nur, wenn es auf alle Werte passt, sonst dayfirst-Fallback
+    for fmt in FORMATS:
+        try:
+            parsed = pd.to_datetime(values, format=fmt, errors='coerce', dayfirst=True)
+            if parsed.notna().all():
+                return parsed
+        except (ValueError, TypeError):
+            continue
+    return pd.to_datetime(values, errors='coerce', dayfirst=True)
+
+
+def per_format(values):
+    # Bisheriges rain_to_parquet.parse_days: jedes Format auf die noch offenen Zeilen
+    values = values.astype(str)
+    parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    for fmt in FORMATS:
+        missing = parsed.isna()
+        parsed[missing] = pd.to_datetime(values[missing], format=fmt, errors='coerce')
+    return parsed
+
+
+def mixed_values(rows, cells, seed):
+    # Wie in den Regen-CSVs: jeder Tag kommt einmal pro Zelle vor, das Format wechselt zwischen den Exporten
+    rng = np.random.default_rng(seed)
+    days = pd.date_range('1979-01-01', '2023-12-31', freq='D')
+    day = days[np.repeat(rng.permutation(len(days)), cells)[:rows] % len(days)]
+    fmt = rng.integers(len(FORMATS), size=len(day))
+    values = np.empty(len(day), dtype=object)
+    for index, pattern in enumerate(FORMATS):
+        values[fmt == index] = day[fmt == index].strftime(pattern)
+    values[rng.integers(len(values), size=10)] = 'n/a'
+    return pd.Series(values, name='DAY')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parse mixed-format date columns: format trials vs. pattern masks.')
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--cells', type=int, default=900)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    values = mixed_values(args.rows, args.cells, args.seed)
+    print(f"{len(values)} values, {values.nunique()} distinct")
+
+    results = {}
+    for name, func in [('format trials', trial_formats), ('per format', per_format),
+                       ('pattern masks', lambda v: dates.normalize_dates(v)[0])]:
+        start = time.perf_counter()
+        results[name] = func(values)
+        print(f"{name:<16} {time.perf_counter() - start:>8.2f}s  {int(results[name].isna().sum())} NaT")
+
+    parsed, unparsed = dates.normalize_dates(values)
+    assert parsed.equals(results['per format'])
+    print(dates.unparsed_report(values, unparsed))
+
+
+if __name__ == '__main__':
+    main()
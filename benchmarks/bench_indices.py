@@ -0,0 +1,87 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from climate_data import config, cube, indices
+
+
+def cell_loop(rain_cube, columns, base_years=config.EXTREME_BASE_YEARS):
+    # Naheliegender Weg: pro Zelle eine pandas-Serie, rolling(5) und groupby nach Jahr
+    days = pd.DatetimeIndex(rain_cube.days(slice(0, rain_cube.precipitation.shape[0])))
+    frames = []
+    for column in columns:
+        series = pd.Series(rain_cube.precipitation[:, column].astype('float64'), index=days)
+        base = series[str(base_years[0]):str(base_years[1])]
+        threshold = np.nanpercentile(base[base >= indices.WET_DAY], 95, method='median_unbiased')
+        year = series.index.year
+        frames.append(pd.DataFrame({
+            'RX1DAY': series.groupby(year).max(),
+            'RX5DAY': series.rolling(indices.WINDOW).sum().groupby(year).max(),
+            'R95P': series.where((series >= indices.WET_DAY) & (series > threshold), 0).groupby(year).sum(),
+            'R20MM': (series >= indices.HEAVY_DAY).groupby(year).sum(),
+        }))
+    return frames
+
+
+def repeated_cube(rain_cube, repeat, path):
+    # Jede Zelle repeat-mal nebeneinander: gleiche Tage, repeat-mal mehr Spalten, Länder bleiben zusammenhängend
+    n_days, n_cells = rain_cube.precipitation.shape
+    arrays = {cube.CUBE_FILE: rain_cube.precipitation}
+    arrays.update({name: rain_cube.temperature(variable) for variable, name in cube.TEMPERATURE_FILES.items()
+                   if rain_cube.temperature(variable) is not None})
+    for name, source in arrays.items():
+        target = np.lib.format.open_memmap(os.path.join(path, name), mode='w+', dtype='float32',
+                                           shape=(n_days, n_cells * repeat))
+        for start in range(0, n_days, 1024):
+            target[start:start + 1024] = np.repeat(source[start:start + 1024], repeat, axis=1)
+        target.flush()
+        del target
+    rain_cube.cells.loc[rain_cube.cells.index.repeat(repeat)].to_parquet(os.path.join(path, cube.CELLS_FILE))
+    with open(os.path.join(path, cube.META_FILE), 'w') as file:
+        json.dump({'first_day': str(rain_cube.first_day)}, file)
+    return cube.RainCube(rain_cube.name, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ETCCDI extreme indices: per-cell pandas loop vs. vectorized chunks.')
+    parser.add_argument('--dataset', default='alps')
+    parser.add_argument('--loop-cells', type=int, default=50, help='cells timed with the loop (extrapolated)')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    parser.add_argument('--repeat', type=int, default=1, help='repeat every cell (a finer grid over the same days)')
+    args = parser.parse_args()
+
+    rain_cube = cube.open_cube(args.dataset)
+    tmp_path = None
+    if args.repeat > 1:
+        tmp_path = tempfile.mkdtemp(prefix='bench_indices_')
+        rain_cube = repeated_cube(rain_cube, args.repeat, tmp_path)
+    try:
+        n_days, n_cells = rain_cube.precipitation.shape
+        print(f"{args.dataset}: {n_days} days x {n_cells} cells ({n_days * n_cells * 4 / 2 ** 20:.0f} MB)")
+
+        loop_cells = min(args.loop_cells, n_cells)
+        start = time.perf_counter()
+        cell_loop(rain_cube, range(loop_cells))
+        seconds = (time.perf_counter() - start) / loop_cells * n_cells
+        print(f"{'pandas loop per cell':<32} {seconds:>8.1f}s (from {loop_cells} cells)")
+
+        for workers in args.workers:
+            start = time.perf_counter()
+            table = indices.extreme_indices(rain_cube, workers=workers)
+            print(f"{f'vectorized, {workers} workers':<32} {time.perf_counter() - start:>8.1f}s "
+                  f"({len(table)} cell years)")
+    finally:
+        if tmp_path:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
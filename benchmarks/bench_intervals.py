@@ -0,0 +1,59 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from climate_data.intervals import FloodIntervals
+
+
+def legacy_in_flood_period(days, flood_periods):
+    # Bisherige Implementierung aus update_charts
+    return days.apply(lambda day: any(
+        (day >= start) and (day <= end) for start, end in zip(flood_periods['Start date'], flood_periods['End date'])))
+
+
+def make_floods(n_floods, first_day, n_days, seed=0):
+    rng = np.random.default_rng(seed)
+    starts = first_day + pd.to_timedelta(rng.integers(0, n_days, n_floods), unit='D')
+    ends = starts + pd.to_timedelta(rng.integers(0, 21, n_floods), unit='D')
+    return pd.DataFrame({'ID': np.arange(n_floods), 'Start date': starts, 'End date': ends})
+
+
+def timed(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the per-day any() loop with FloodIntervals.')
+    parser.add_argument('--start', default='1979-01-01')
+    parser.add_argument('--end', default='2023-12-31')
+    parser.add_argument('--floods', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    days = pd.Series(pd.date_range(args.start, args.end, freq='D'))
+    print(f"{len(days)} days")
+    print(f"{'floods':>8} {'legacy [s]':>12} {'contains [s]':>14} {'covering [s]':>14} {'speedup':>9}")
+    for n_floods in args.floods:
+        floods = make_floods(n_floods, days.iloc[0], len(days))
+
+        legacy_time, legacy = timed(lambda: legacy_in_flood_period(days, floods), args.repeat)
+        contains_time, contains = timed(lambda: FloodIntervals.from_events(floods).contains(days), args.repeat)
+        covering_time, _ = timed(lambda: FloodIntervals.from_events(floods).covering(days), args.repeat)
+
+        assert (legacy.to_numpy() == contains).all(), 'results differ from the legacy implementation'
+        print(f"{n_floods:>8} {legacy_time:>12.4f} {contains_time:>14.4f} {covering_time:>14.4f} "
+              f"{legacy_time / contains_time:>8.0f}x")
+
+
+if __name__ == '__main__':
+    main()
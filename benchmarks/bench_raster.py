@@ -0,0 +1,65 @@
+import argparse
+import calendar
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import plotly.graph_objects as go
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from climate_data import cube, raster
+
+
+def scatter_payload(rain_cube, values, days=1):
+    # Bisheriger Weg für ein Niederschlagsfeld: ein Kartenpunkt pro Zelle (und Tag), als Figuren-JSON
+    latitude = np.repeat(rain_cube.cells['LATITUDE'].to_numpy(), days)
+    longitude = np.repeat(rain_cube.cells['LONGITUDE'].to_numpy(), days)
+    figure = go.Figure(go.Scattermapbox(lat=latitude, lon=longitude, mode='markers',
+                                        marker=dict(color=np.repeat(values, days), colorscale=raster.COLORSCALE)))
+    return len(figure.to_json())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Monthly precipitation field on the map: scatter points vs. PNG overlay.')
+    parser.add_argument('--dataset', default='alps')
+    parser.add_argument('--year', type=int, default=2016)
+    parser.add_argument('--month', type=int, default=6)
+    args = parser.parse_args()
+
+    rain_cube = cube.open_cube(args.dataset)
+    values = raster.month_values(rain_cube, args.year, args.month, 'sum')
+    days = calendar.monthrange(args.year, args.month)[1]
+
+    cache_dir = tempfile.mkdtemp(prefix='bench_raster_')
+    try:
+        start = time.perf_counter()
+        rain_raster = raster.RainRaster(rain_cube, cache_dir)
+        setup = time.perf_counter() - start
+        start = time.perf_counter()
+        path = rain_raster.png_path(args.year, args.month, 'sum')
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        rain_raster.png_path(args.year, args.month, 'sum')
+        cached = time.perf_counter() - start
+        png_size = os.path.getsize(path)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    layer_size = len(json.dumps({'sourcetype': 'image', 'source': f'/raster/sum/{args.year}/{args.month}.png',
+                                 'coordinates': rain_raster.coordinates, 'opacity': 0.7, 'below': 'traces'}))
+
+    height, width = rain_raster.columns.shape
+    print(f"{rain_cube.precipitation.shape[1]} cells, image {width}x{height} px")
+    print(f"{'layer':<28} {'points':>9} {'payload [kB]':>13}")
+    print(f"{'scatter, one point per cell':<28} {len(values):>9} {scatter_payload(rain_cube, values) / 1024:>13.1f}")
+    print(f"{'scatter, cell x day':<28} {len(values) * days:>9} "
+          f"{scatter_payload(rain_cube, values, days) / 1024:>13.1f}")
+    print(f"{'PNG overlay (image + layer)':<28} {'':>9} {(png_size + layer_size) / 1024:>13.1f}")
+    print(f"pixel mapping {setup * 1000:.0f} ms, render {cold * 1000:.1f} ms, cached {cached * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
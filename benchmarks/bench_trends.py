@@ -0,0 +1,78 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from climate_data import config, cube, indices, trends
+from bench_indices import repeated_cube
+
+
+def cell_loop(rain_cube, columns):
+    # Naheliegender Weg: pro Zelle Jahreswerte mit pandas, ein Fit nach dem anderen, Perzentile per groupby
+    days = pd.DatetimeIndex(rain_cube.days(slice(0, rain_cube.precipitation.shape[0])))
+    temperature = rain_cube.temperature('TEMPERATURE_MAX')
+    for column in columns:
+        series = pd.Series(rain_cube.precipitation[:, column].astype('float64'), index=days)
+        yearly = series.where(series >= indices.WET_DAY, 0).groupby(series.index.year).sum()
+        years = yearly.index.to_numpy(dtype='float64')
+        values = yearly.to_numpy()
+        np.polyfit(years, values, 1)
+        first, second = np.triu_indices(len(years), 1)
+        np.median((values[second] - values[first]) / (years[second] - years[first]))
+        np.sign(values[second] - values[first]).sum()
+
+        if temperature is not None:
+            wet = series >= indices.WET_DAY
+            classes = (temperature[:, column][wet.to_numpy()] - trends.LOWEST_TEMPERATURE) // config.CC_BIN_WIDTH
+            quantiles = series[wet].groupby(classes).quantile(max(config.CC_PERCENTILES))
+            counts = series[wet].groupby(classes).size()
+            quantiles = quantiles[counts >= config.CC_MIN_DAYS]
+            if len(quantiles) >= trends.MIN_CLASSES:
+                np.polyfit(quantiles.index.to_numpy() * config.CC_BIN_WIDTH, np.log(quantiles.to_numpy()), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Trends and temperature scaling: loop of fits per cell vs. batched.')
+    parser.add_argument('--dataset', default='alps')
+    parser.add_argument('--loop-cells', type=int, default=50, help='cells timed with the loop (extrapolated)')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    parser.add_argument('--repeat', type=int, default=1, help='repeat every cell (a finer grid over the same days)')
+    args = parser.parse_args()
+
+    rain_cube = cube.open_cube(args.dataset)
+    index_table = indices.load_indices(args.dataset)
+    tmp_path = None
+    if args.repeat > 1:
+        tmp_path = tempfile.mkdtemp(prefix='bench_trends_')
+        rain_cube = repeated_cube(rain_cube, args.repeat, tmp_path)
+        index_table = None
+    try:
+        n_days, n_cells = rain_cube.precipitation.shape
+        temperatures = [variable for variable in cube.TEMPERATURE_FILES if rain_cube.temperature(variable) is not None]
+        print(f"{args.dataset}: {n_days} days x {n_cells} cells, temperatures {temperatures}, "
+              f"extreme indices {'yes' if index_table is not None else 'no'}")
+
+        loop_cells = min(args.loop_cells, n_cells)
+        start = time.perf_counter()
+        cell_loop(rain_cube, range(loop_cells))
+        seconds = (time.perf_counter() - start) / loop_cells * n_cells
+        print(f"{'loop per cell (PRCPTOT, Tmax P99)':<36} {seconds:>8.1f}s (from {loop_cells} cells)")
+
+        for workers in args.workers:
+            start = time.perf_counter()
+            trend_table, scaling_table = trends.trend_analysis(rain_cube, index_table, workers=workers)
+            print(f"{f'batched, {workers} workers':<36} {time.perf_counter() - start:>8.1f}s "
+                  f"({len(trend_table)} trends, {len(scaling_table)} scaling rates)")
+    finally:
+        if tmp_path:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from climate_data import views
+
+COUNTRIES = ['Switzerland', 'Italy', 'Germany', 'Austria', 'France', 'Liechtenstein', 'Slovenia']
+
+
+def legacy_map_tables(flood_data, year, country):
+    # Bisherige Aufbereitung aus update_map (dashboard_alps.py), ohne die Figur
+    filtered_data = flood_data[flood_data['Year'] == year]
+    if country:
+        filtered_data = filtered_data[filtered_data['Country name'] == country]
+
+    filtered_data['Losses (EUR, 2020)'] = filtered_data['Losses (mln EUR, 2020)'].fillna(0)
+    filtered_data['marker_size'] = filtered_data.apply(
+        lambda row: max(10, row['Losses (EUR, 2020)'] / 10) if row['Losses (EUR, 2020)'] != 0 else 10, axis=1)
+
+    flood_table_data = filtered_data[['Name', 'Start date', 'End date']].copy()
+    flood_table_data['Start date'] = flood_table_data['Start date'].dt.strftime('%d.%m.%Y')
+    flood_table_data['End date'] = flood_table_data['End date'].dt.strftime('%d.%m.%Y')
+    flood_table_data = flood_table_data.rename(columns={'Name': 'location'}).to_dict('records')
+
+    damage_data = filtered_data[['Name', 'Fatalities', 'Losses (EUR, 2020)']].copy()
+    damage_data['Fatalities'] = damage_data['Fatalities'].fillna('None')
+    damage_data['Losses (EUR, 2020)'] = damage_data['Losses (EUR, 2020)'].apply(
+        lambda x: '{:,.0f}'.format(x).replace(',', "'") if isinstance(x, (int, float)) else x)
+    damage_data['Name'] = damage_data['Name'].fillna('').astype(str)
+    damage_grouped = damage_data.groupby(['Fatalities', 'Losses (EUR, 2020)']).agg({'Name': ', '.join}).reset_index()
+    damage_table_data = damage_grouped.rename(columns={'Name': 'location'}).to_dict('records')
+    return filtered_data['marker_size'].to_numpy(), flood_table_data, damage_table_data
+
+
+def view_map_tables(flood_data, year, country):
+    filtered_data = views.select_floods(flood_data, year, country)
+    map_data = views.map_frame(filtered_data)
+    flood_table_data = views.flood_table_records(filtered_data)
+    damage_table_data = views.damage_table_records(filtered_data, losses_id='Losses (EUR, 2020)', fill_losses=0)
+    return map_data['marker_size'].to_numpy(), flood_table_data, damage_table_data
+
+
+def make_floods(n_rows, n_years, seed=0):
+    # Eine Zeile pro betroffener Region wie in flood_data_fixed.csv, ein Teil ohne Angaben zu Verlusten/Toten
+    rng = np.random.default_rng(seed)
+    starts = pd.Timestamp('1979-01-01') + pd.to_timedelta(rng.integers(0, n_years * 365, n_rows), unit='D')
+    losses = rng.gamma(1.0, 200.0, n_rows).round(1)
+    losses[rng.random(n_rows) < 0.3] = np.nan
+    fatalities = rng.integers(0, 20, n_rows).astype('float64')
+    fatalities[rng.random(n_rows) < 0.4] = np.nan
+    return pd.DataFrame({
+        'ID': rng.integers(0, n_rows // 3 + 1, n_rows),
+        'Year': starts.year,
+        'Country name': rng.choice(COUNTRIES, n_rows),
+        'Start date': starts,
+        'End date': starts + pd.to_timedelta(rng.integers(0, 14, n_rows), unit='D'),
+        'Name': [f'Region {i}' for i in rng.integers(0, 400, n_rows)],
+        'Latitude': rng.uniform(43, 49, n_rows),
+        'Longitude': rng.uniform(5, 17, n_rows),
+        'Fatalities': fatalities,
+        'Losses (mln EUR, 2020)': losses,
+    })
+
+
+def timed(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-callback cost of the update_map data preparation.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--years', type=int, default=45)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--figure', action='store_true', help='also time px.scatter_mapbox on the prepared frame')
+    args = parser.parse_args()
+
+    pd.options.mode.chained_assignment = None
+    print(f"{'rows':>8} {'per call':>9} {'legacy [ms]':>12} {'views [ms]':>11} {'speedup':>8}"
+          + (f" {'figure [ms]':>12}" if args.figure else ''))
+    for n_rows in args.rows:
+        floods = views.add_date_labels(make_floods(n_rows, args.years))
+        year = int(floods['Year'].mode()[0])
+        for country in (None, 'Switzerland'):
+            legacy_time, legacy = timed(lambda: legacy_map_tables(floods, year, country), args.repeat)
+            view_time, view = timed(lambda: view_map_tables(floods, year, country), args.repeat)
+            assert np.allclose(legacy[0], view[0]), 'marker sizes differ from the legacy implementation'
+            # Die alte Version gruppierte auf den gerundeten Strings, daher nur die Regionen vergleichen
+            assert sorted(', '.join(row['location'] for row in legacy[2]).split(', ')) \
+                == sorted(', '.join(row['location'] for row in view[2]).split(', ')), 'damage table differs'
+
+            selected = views.select_floods(floods, year, country)
+            line = (f"{n_rows:>8} {len(selected):>9} {legacy_time * 1000:>12.2f} {view_time * 1000:>11.2f} "
+                    f"{legacy_time / view_time:>7.1f}x")
+            if args.figure:
+                import plotly.express as px
+                map_data = views.map_frame(selected)
+                figure_time, _ = timed(lambda: px.scatter_mapbox(map_data, lat='Latitude', lon='Longitude',
+                                                                 hover_name='Name', size='marker_size', size_max=30),
+                                       args.repeat)
+                line += f" {figure_time * 1000:>12.2f}"
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
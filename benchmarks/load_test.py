@@ -0,0 +1,97 @@
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.request
+
+import numpy as np
+
+# Callbacks von dashboard_alps.py, wie sie der Browser an /_dash-update-component schickt
+CALLBACKS = ['charts', 'map']
+
+
+def _value(id_, value):
+    return {'id': id_, 'property': 'value', 'value': value}
+
+
+def callback_payload(kind, year, timeframe, country):
+    if kind == 'charts':
+        # Der Zeitrahmen wird im Browser umgerechnet, an den Server geht nur die Tagesreihe von Jahr und Land
+        output = 'precipitation-data.data'
+        outputs = {'id': 'precipitation-data', 'property': 'data'}
+        inputs = [_value('year-slider', year), _value('country-dropdown', country)]
+    else:
+        output = '..map-plot.figure...flood-table.data...damage-table.data..'
+        outputs = [{'id': 'map-plot', 'property': 'figure'}, {'id': 'flood-table', 'property': 'data'},
+                   {'id': 'damage-table', 'property': 'data'}]
+        inputs = [_value('year-slider', year), _value('country-dropdown', country), _value('raster-statistic', None),
+                  _value('raster-month', 1)]
+    return {'output': output, 'outputs': outputs, 'inputs': inputs, 'changedPropIds': ['year-slider.value'],
+            'state': []}
+
+
+def post(url, payload):
+    request = urllib.request.Request(url + '/_dash-update-component', data=json.dumps(payload).encode(),
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=120) as response:
+        return len(response.read())
+
+
+def run(url, payloads, concurrency):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    queue = iter(payloads)
+
+    def worker():
+        while True:
+            with lock:
+                payload = next(queue, None)
+            if payload is None:
+                return
+            start = time.perf_counter()
+            try:
+                post(url, payload)
+            except Exception as error:
+                with lock:
+                    errors.append(repr(error))
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return np.array(latencies), errors, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent load test against a running dashboard (dashboard_alps.py).')
+    parser.add_argument('--url', default='http://127.0.0.1:8050')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--years', type=int, nargs=2, default=[1979, 2023], metavar=('FIRST', 'LAST'))
+    parser.add_argument('--countries', nargs='*', default=[None, 'Switzerland', 'Italy', 'Austria', 'France'])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'concurrency':>11} {'req/s':>8} {'p50 [ms]':>9} {'p95 [ms]':>9} {'p99 [ms]':>9} {'errors':>7}")
+    for concurrency in args.concurrency:
+        # Zufällige Auswahl wie von vielen Nutzern, damit nicht nur der Figuren-Cache gemessen wird
+        payloads = [callback_payload(rng.choice(CALLBACKS), rng.randint(*args.years), rng.choice('DWM'),
+                                     rng.choice(args.countries)) for _ in range(args.requests)]
+        latencies, errors, seconds = run(args.url, payloads, concurrency)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000 if len(latencies) else (np.nan,) * 3
+        print(f"{concurrency:>11} {len(latencies) / seconds:>8.1f} {p50:>9.0f} {p95:>9.0f} {p99:>9.0f} "
+              f"{len(errors):>7}")
+        if errors:
+            print(f"  first error: {errors[0]}")
+
+
+if __name__ == '__main__':
+    main()
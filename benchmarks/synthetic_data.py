@@ -0,0 +1,338 @@
+import argparse
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from climate_data import config
+
+# Synthetische Daten in der Struktur von data/ (source/ und generated/) für Tests und Benchmarks ohne git lfs pull.
+# 1x entspricht dem heutigen Umfang: 25-km-Raster über den Alpenraum, 1979-2023, täglich.
+
+# Untersuchungsgebiet (lon/lat) und Raster wie grid_25km.shp (ETRS89-LAEA, 25 km)
+BBOX = (5.0, 43.5, 17.0, 49.0)
+GRID_CRS = 'EPSG:3035'
+GRID_SPACING = 25000
+
+# Grobe Länderzuordnung der Zellen: Schweiz und Liechtenstein als Rechtecke (lat/lon), sonst nächstes Zentrum
+COUNTRY_BOXES = {
+    'Liechtenstein': (47.05, 9.47, 47.27, 9.64),
+    'Switzerland': (45.85, 6.0, 47.75, 10.45),
+}
+COUNTRY_CENTERS = {
+    'France': (46.0, 4.5),
+    'Germany': (49.2, 10.0),
+    'Italy': (44.5, 11.0),
+    'Austria': (47.6, 13.8),
+    'Slovenia': (46.1, 15.2),
+}
+
+# Spalten der Agri4cast-Exporte (rain_data_*.csv), Semikolon-getrennt, DAY als yyyymmdd
+AGRI4CAST_COLUMNS = ['GRID_NO', 'LATITUDE', 'LONGITUDE', 'ALTITUDE', 'DAY', 'TEMPERATURE_MAX', 'TEMPERATURE_MIN',
+                     'TEMPERATURE_AVG', 'WINDSPEED', 'VAPOURPRESSURE', 'PRECIPITATION', 'ET0', 'RADIATION']
+RAIN_FILES = ['rain_data_1.csv', 'rain_data_2.csv', 'rain_data_3.csv', 'rain_data_4.csv']
+
+HANZE_COLUMNS = ['ID', 'Year', 'Country code', 'Country name', 'Start date', 'End date', 'Type', 'Flood source',
+                 'Regions affected (v2010)', 'Regions affected (v2021)', 'Area flooded', 'Persons affected',
+                 'Fatalities', 'Losses (nominal value)', 'Losses (original currency)', 'Losses (2020 euro)', 'Cause',
+                 'Notes', 'References', 'Changes']
+
+
+def make_grid(scale, grid_path=None):
+    """Cells with LATITUDE/LONGITUDE, ALTITUDE, COUNTRY and REGION_CODE, plus the 25 km parent cells for the shapes."""
+    from pyproj import Transformer
+    to_grid = Transformer.from_crs('EPSG:4326', GRID_CRS, always_xy=True)
+    to_lonlat = Transformer.from_crs(GRID_CRS, 'EPSG:4326', always_xy=True)
+
+    if grid_path:
+        import geopandas as gpd
+        centroids = gpd.read_file(grid_path).to_crs(GRID_CRS).centroid
+        x, y = centroids.x.to_numpy(), centroids.y.to_numpy()
+    else:
+        xs, ys = to_grid.transform([BBOX[0], BBOX[2], BBOX[0], BBOX[2]], [BBOX[1], BBOX[1], BBOX[3], BBOX[3]])
+        x, y = np.meshgrid(np.arange(min(xs), max(xs), GRID_SPACING) + GRID_SPACING / 2,
+                           np.arange(min(ys), max(ys), GRID_SPACING) + GRID_SPACING / 2)
+        x, y = x.ravel(), y.ravel()
+    lon, lat = to_lonlat.transform(x, y)
+    inside = (lon >= BBOX[0]) & (lon <= BBOX[2]) & (lat >= BBOX[1]) & (lat <= BBOX[3])
+    parents = pd.DataFrame({'X': x[inside], 'Y': y[inside], 'LATITUDE': lat[inside], 'LONGITUDE': lon[inside]})
+
+    # Land: Rechtecke zuerst, sonst nächstes Zentrum (Längengrade mit cos(lat) gewichtet)
+    # Regionen: 4x4 Elternzellen (100 km) pro Land
+    names = list(COUNTRY_CENTERS)
+    centers = np.array([COUNTRY_CENTERS[name] for name in names])
+    lat, lon = parents['LATITUDE'].to_numpy(), parents['LONGITUDE'].to_numpy()
+    distance = (lat[:, None] - centers[:, 0]) ** 2 + ((lon[:, None] - centers[:, 1]) * np.cos(np.radians(centers[:, 0]))) ** 2
+    parents['COUNTRY'] = np.array(names)[distance.argmin(axis=1)]
+    for country, (lat0, lon0, lat1, lon1) in reversed(COUNTRY_BOXES.items()):
+        inside = (lat >= lat0) & (lat <= lat1) & (lon >= lon0) & (lon <= lon1)
+        if not inside.any():
+            # Kleiner als eine Zelle: die Zelle am nächsten zur Boxmitte
+            inside = np.hypot(lat - (lat0 + lat1) / 2, lon - (lon0 + lon1) / 2) == \
+                np.hypot(lat - (lat0 + lat1) / 2, lon - (lon0 + lon1) / 2).min()
+        parents.loc[inside, 'COUNTRY'] = country
+
+    block = (parents['X'] // (4 * GRID_SPACING)).astype(int).astype(str) + '_' \
+        + (parents['Y'] // (4 * GRID_SPACING)).astype(int).astype(str)
+    parents['REGION_CODE'] = ''
+    for country, rows in parents.groupby('COUNTRY'):
+        numbers = pd.factorize(block[rows.index], sort=True)[0] + 1
+        parents.loc[rows.index, 'REGION_CODE'] = [f'{config.COUNTRY_CODES[country]}{n:03d}' for n in numbers]
+
+    # Skalierung: jede 25-km-Zelle wird in k x k Teilzellen zerlegt (k^2 ~ scale), Land und Region werden geerbt
+    k = max(1, int(round(np.sqrt(scale))))
+    offsets = (np.arange(k) + 0.5) / k - 0.5
+    dx, dy = [offset.ravel() * GRID_SPACING for offset in np.meshgrid(offsets, offsets)]
+    cells = parents.loc[parents.index.repeat(k * k)].reset_index(drop=True)
+    cells['X'] += np.tile(dx, len(parents))
+    cells['Y'] += np.tile(dy, len(parents))
+    cells['LONGITUDE'], cells['LATITUDE'] = to_lonlat.transform(cells['X'].to_numpy(), cells['Y'].to_numpy())
+    cells['LATITUDE'] = cells['LATITUDE'].round(5)
+    cells['LONGITUDE'] = cells['LONGITUDE'].round(5)
+
+    # Höhe: Alpenbogen als Gauss-Rücken um 46.5 N, dazu etwas Rauschen
+    rng = np.random.default_rng(1)
+    ridge = np.exp(-((cells['LATITUDE'] - 46.5) / 0.8) ** 2) * np.exp(-((cells['LONGITUDE'] - 10.5) / 4.0) ** 2)
+    cells['ALTITUDE'] = (300 + 2200 * ridge + rng.normal(0, 80, len(cells))).clip(0).round().astype(int)
+    cells.insert(0, 'GRID_NO', np.arange(1, len(cells) + 1, dtype='int32'))
+    return cells, parents
+
+
+def write_shapes(parents, source_dir):
+    # Länder- und NUTS-Polygone aus den 25-km-Zellen, für grid_index.py und das Shapefile-Backend der Geokodierung
+    import geopandas as gpd
+    from shapely.geometry import box
+    half = GRID_SPACING / 2
+    boxes = gpd.GeoDataFrame(parents[['COUNTRY', 'REGION_CODE']],
+                             geometry=[box(x - half, y - half, x + half, y + half)
+                                       for x, y in zip(parents['X'], parents['Y'])], crs=GRID_CRS)
+    countries = boxes.dissolve('COUNTRY').reset_index().rename(columns={'COUNTRY': 'name'})[['name', 'geometry']]
+    regions = boxes.dissolve('REGION_CODE').reset_index().rename(columns={'REGION_CODE': 'NUTS_ID'})
+    countries.to_crs('EPSG:4326').to_file(os.path.join(source_dir, 'countries.geojson'), driver='GeoJSON')
+    regions[['NUTS_ID', 'geometry']].to_crs('EPSG:4326').to_file(os.path.join(source_dir, 'nuts.geojson'),
+                                                                   driver='GeoJSON')
+
+
+def make_floods(cells, years, scale, seed):
+    """HANZE-style events: one or more neighbouring regions of one country, a few days long."""
+    rng = np.random.default_rng([seed, 0])
+    regions = cells.groupby('REGION_CODE').agg(COUNTRY=('COUNTRY', 'first'), LATITUDE=('LATITUDE', 'mean'),
+                                               LONGITUDE=('LONGITUDE', 'mean'))
+    events = []
+    for year in range(years[0], years[1] + 1):
+        for _ in range(rng.poisson(7 * scale)):
+            first = regions.sample(1, random_state=rng).iloc[0]
+            country_regions = regions[regions['COUNTRY'] == first['COUNTRY']]
+            distance = np.hypot(country_regions['LATITUDE'] - first['LATITUDE'],
+                                country_regions['LONGITUDE'] - first['LONGITUDE'])
+            codes = distance.nsmallest(int(rng.integers(1, 5))).index.tolist()
+            start = pd.Timestamp(year, 1, 1) + pd.Timedelta(days=int(rng.integers(0, 365 if year % 4 else 366)))
+            end = min(start + pd.Timedelta(days=int(rng.integers(0, 10))), pd.Timestamp(year, 12, 31))
+            losses = rng.gamma(0.6, 150.0) if rng.random() > 0.3 else np.nan
+            events.append({
+                'Year': year,
+                'Country code': config.COUNTRY_CODES[first['COUNTRY']],
+                'Country name': first['COUNTRY'],
+                'Start date': start,
+                'End date': end,
+                'Type': rng.choice(['River', 'Flash', 'River/Flash']),
+                'Regions affected (v2021)': ';'.join(codes),
+                'Fatalities': int(rng.poisson(1.5)) if rng.random() > 0.4 else np.nan,
+                'Losses (2020 euro)': round(losses, 1) if losses == losses else np.nan,
+                'Cause': rng.choice(['Heavy rainfall', 'Heavy rainfall, snowmelt', 'Torrential rain']),
+                'References': 'synthetic',
+            })
+    floods = pd.DataFrame(events).sort_values('Start date', ignore_index=True)
+    floods.insert(0, 'ID', np.arange(1, len(floods) + 1))
+    return floods
+
+
+def write_floods(floods, cells, source_dir, generated_dir):
+    hanze = floods.reindex(columns=HANZE_COLUMNS)
+    hanze['Start date'] = floods['Start date'].dt.strftime('%Y-%m-%d')
+    hanze['End date'] = floods['End date'].dt.strftime('%Y-%m-%d')
+    hanze.to_csv(os.path.join(source_dir, 'hanze_all.csv'), index=False)
+    hanze[hanze['Country name'] == 'Switzerland'].to_csv(os.path.join(source_dir, 'HANZE_events.csv'), index=False)
+
+    regions = cells.groupby('REGION_CODE').agg(COUNTRY=('COUNTRY', 'first'), Latitude=('LATITUDE', 'mean'),
+                                               Longitude=('LONGITUDE', 'mean')).reset_index()
+    regions = regions.rename(columns={'REGION_CODE': 'Code'})
+    regions['Name'] = regions['COUNTRY'] + ' ' + regions['Code'].str[2:]
+    regions[['Code', 'Name']].to_csv(os.path.join(source_dir, 'regioncodes.csv'), index=False)
+
+    # Eingaben des Schweizer Dashboards (bisher aus den Notebooks): Koordinaten als '(lat, lon)', Datum dd.mm.yyyy
+    coordinates = '(' + regions['Latitude'].round(4).astype(str) + ', ' + regions['Longitude'].round(4).astype(str) + ')'
+    regions_ch = regions.assign(Coordinates=coordinates)[regions['COUNTRY'] == 'Switzerland']
+    regions_ch[['Code', 'Name', 'Coordinates']].to_csv(os.path.join(generated_dir, 'regions_ch.csv'), index=False)
+
+    floods_ch = floods[floods['Country name'] == 'Switzerland'].assign(
+        Code=lambda frame: frame['Regions affected (v2021)'].str.split(';')).explode('Code')
+    floods_ch = floods_ch.merge(regions_ch[['Code', 'Coordinates']], on='Code')
+    pd.DataFrame({
+        'ID': floods_ch['ID'], 'Year': floods_ch['Year'], 'Country name': floods_ch['Country name'],
+        'Start date': floods_ch['Start date'].dt.strftime('%d.%m.%Y'),
+        'End date': floods_ch['End date'].dt.strftime('%d.%m.%Y'),
+        'Type': floods_ch['Type'], 'regions': floods_ch['Coordinates'], 'Cause': floods_ch['Cause'],
+        'References': floods_ch['References'], 'Fatalities': floods_ch['Fatalities'],
+        'Losses (mln EUR, 2020)': floods_ch['Losses (2020 euro)'],
+    }).to_csv(os.path.join(generated_dir, 'flood_data.csv'), index=False)
+
+
+def write_global_mean_temp(source_dir):
+    # Wie die NASA-Reihe (links.txt): Jahresanomalie und geglättete Werte ab 1880
+    years = np.arange(1880, 2024)
+    anomaly = -0.3 + 0.00007 * (years - 1880) ** 2 + np.random.default_rng(2).normal(0, 0.1, len(years))
+    smooth = pd.Series(anomaly).rolling(5, center=True, min_periods=1).mean()
+    pd.DataFrame({'YEAR': years, 'No_Smoothing': anomaly.round(2), 'Lowess(5)': smooth.round(2)}).to_csv(
+        os.path.join(source_dir, 'global_mean_temp.csv'), index=False)
+
+
+def weather_chunk(cells, days, region_index, n_regions, floods, rng, first_year):
+    """Agri4cast values for the given days (DatetimeIndex) x cells, as columns of length days * cells."""
+    n_days, n_cells = len(days), len(cells)
+    season = np.cos(2 * np.pi * (days.dayofyear.to_numpy() - 200) / 365.25)[:, None]
+    altitude = cells['ALTITUDE'].to_numpy()[None, :] / 1000.0
+
+    # Nass/trocken pro Region und Tag (räumlich korreliert), Menge pro Zelle gamma-verteilt, Alpen und Winter nässer
+    wet_probability = 0.42 - 0.08 * season + 0.06 * altitude
+    wet = rng.random((n_days, n_regions))[:, region_index] < wet_probability
+    trend = 1 + 0.003 * (days.year.to_numpy()[:, None] - first_year)
+    mean_amount = (5.0 + 2.0 * altitude) * trend
+    precipitation = np.where(wet, rng.gamma(0.8, mean_amount / 0.8, (n_days, n_cells)), 0.0)
+
+    # Überschwemmungen: starker Niederschlag in den betroffenen Regionen ab zwei Tage vor Beginn
+    for start, end, codes in zip(floods['Start date'], floods['End date'], floods['codes']):
+        in_event = (days >= start - pd.Timedelta(days=2)) & (days <= end)
+        if in_event.any():
+            in_regions = np.isin(cells['REGION_CODE'].to_numpy(), codes)
+            precipitation[np.ix_(in_event, in_regions)] += rng.gamma(2.0, 12.0, (in_event.sum(), in_regions.sum()))
+
+    temperature = 9.0 - 9.0 * season - 6.0 * altitude + rng.normal(0, 2.5, (n_days, n_cells))
+    spread = 4.0 + 2.0 * (~wet)
+    return {
+        'TEMPERATURE_MAX': temperature + spread,
+        'TEMPERATURE_MIN': temperature - spread,
+        'TEMPERATURE_AVG': temperature,
+        'WINDSPEED': rng.gamma(2.0, 1.5, (n_days, n_cells)),
+        'VAPOURPRESSURE': (6.1 * np.exp(17.3 * temperature / (temperature + 237.3))).clip(1),
+        'PRECIPITATION': precipitation,
+        'ET0': (0.12 * (temperature + 8) * (1.2 - 0.5 * wet)).clip(0),
+        'RADIATION': (12000 - 8000 * season) * (1 - 0.5 * wet) * rng.uniform(0.8, 1.1, (n_days, n_cells)),
+    }
+
+
+class RainWriter:
+    """Streams rows into the Agri4cast CSV files; header written once, values rounded like the exports."""
+
+    def __init__(self, paths):
+        self.schema = pa.schema([('GRID_NO', pa.int32()), ('LATITUDE', pa.float64()), ('LONGITUDE', pa.float64()),
+                                 ('ALTITUDE', pa.int32()), ('DAY', pa.int32())]
+                                + [(column, pa.float64()) for column in AGRI4CAST_COLUMNS[5:]])
+        self.files = {}
+        self.writers = {}
+        for name, path in paths.items():
+            self.files[name] = open(path, 'wb')
+            self.files[name].write((';'.join(AGRI4CAST_COLUMNS) + '\n').encode())
+            self.writers[name] = pa_csv.CSVWriter(self.files[name], self.schema, write_options=pa_csv.WriteOptions(
+                include_header=False, delimiter=';', quoting_style='none'))
+        self.rows = 0
+
+    def write(self, name, table):
+        self.writers[name].write_table(table)
+        self.rows += table.num_rows
+
+    def close(self):
+        for name in self.writers:
+            self.writers[name].close()
+            self.files[name].close()
+
+
+def write_rain(cells, floods, years, source_dir, seed, chunk_days=31):
+    # Zellen in vier Längenbänder auf rain_data_1..4.csv verteilen; Schweizer Zellen zusätzlich in rain_data_ch.csv
+    # (wie bei den echten Exporten doppelt, rain_prep.py entfernt die Duplikate)
+    band = pd.qcut(cells['LONGITUDE'], len(RAIN_FILES), labels=False).to_numpy()
+    targets = {name: np.flatnonzero(band == i) for i, name in enumerate(RAIN_FILES)}
+    targets['rain_data_ch.csv'] = np.flatnonzero(cells['COUNTRY'].to_numpy() == 'Switzerland')
+    writer = RainWriter({name: os.path.join(source_dir, name) for name in targets})
+
+    region_index, region_codes = pd.factorize(cells['REGION_CODE'])
+    events = floods[['ID', 'Year', 'Start date', 'End date']].assign(
+        codes=floods['Regions affected (v2021)'].str.split(';'))
+    static = {column: cells[column].to_numpy() for column in ['GRID_NO', 'LATITUDE', 'LONGITUDE', 'ALTITUDE']}
+    try:
+        for year in range(years[0], years[1] + 1):
+            # Pro Jahr ein eigener Zufallsgenerator: gleiche Werte für ein Jahr unabhängig vom gewählten Zeitraum
+            rng = np.random.default_rng([seed, year])
+            year_days = pd.date_range(f'{year}-01-01', f'{year}-12-31', freq='D')
+            year_events = events[events['Year'] == year]
+            for start in range(0, len(year_days), chunk_days):
+                days = year_days[start:start + chunk_days]
+                values = weather_chunk(cells, days, region_index, len(region_codes), year_events, rng, years[0])
+                day_numbers = (days.year * 10000 + days.month * 100 + days.day).to_numpy(dtype='int32')
+                for name, cell_index in targets.items():
+                    if len(cell_index) == 0:
+                        continue
+                    columns = {column: np.tile(static[column][cell_index], len(days)) for column in static}
+                    columns['DAY'] = np.repeat(day_numbers, len(cell_index))
+                    for column, array in values.items():
+                        columns[column] = array[:, cell_index].ravel().round(1)
+                    writer.write(name, pa.table(columns, schema=writer.schema))
+            print(f"{year}: {writer.rows} rows written")
+    finally:
+        writer.close()
+    return writer.rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic Agri4cast rain data and HANZE floods.')
+    parser.add_argument('--out', required=True, help='data directory to create (use it as CDK_DATA_DIR)')
+    parser.add_argument('--scale', type=float, default=1, help='1 = today (25 km grid), 10/100 = finer grid, more floods')
+    parser.add_argument('--years', type=int, nargs=2, default=[1979, 2023], metavar=('FIRST', 'LAST'))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--grid', help='cell layout from grid_25km.shp instead of the generated 25 km grid')
+    parser.add_argument('--chunk-days', type=int, default=31, help='days generated and written per step')
+    args = parser.parse_args()
+
+    if os.path.abspath(args.out) == os.path.abspath(config.DATA_DIR):
+        parser.error('refusing to overwrite the real data directory')
+    source_dir = os.path.join(args.out, 'source')
+    generated_dir = os.path.join(args.out, 'generated')
+    os.makedirs(source_dir, exist_ok=True)
+    os.makedirs(generated_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    cells, parents = make_grid(args.scale, args.grid)
+    write_shapes(parents, source_dir)
+    floods = make_floods(cells, args.years, args.scale, args.seed)
+    write_floods(floods, cells, source_dir, generated_dir)
+    print(f"{len(cells)} cells, {cells['REGION_CODE'].nunique()} regions, {len(floods)} flood events")
+
+    write_global_mean_temp(source_dir)
+    rows = write_rain(cells, floods, args.years, source_dir, args.seed, args.chunk_days)
+    # df_ch.csv (Quelle von rain_aggregates.py) ist derselbe Schweizer Export
+    shutil.copyfile(os.path.join(source_dir, 'rain_data_ch.csv'), os.path.join(source_dir, 'df_ch.csv'))
+    size = sum(os.path.getsize(os.path.join(source_dir, name)) for name in os.listdir(source_dir))
+    print(f"{rows} rain rows, {size / 2 ** 20:.0f} MB in {source_dir}, {time.perf_counter() - start:.0f}s")
+
+    out = os.path.abspath(args.out)
+    print(f"""
+next steps:
+  export CDK_DATA_DIR={out} CDK_COUNTRIES_SHAPEFILE={out}/source/countries.geojson \\
+         CDK_REGIONS_SHAPEFILE={out}/source/nuts.geojson
+  cd data_wrangling
+  python rain_prep.py --dataset alps
+  python rain_prep.py --dataset ch --sources $CDK_DATA_DIR/source/rain_data_ch.csv
+  python flood_prep.py
+  python grid_index.py
+  python rain_rollup.py
+  python rain_aggregates.py""")
+
+
+if __name__ == '__main__':
+    main()
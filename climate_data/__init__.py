@@ -0,0 +1,5 @@
+from climate_data.cube import RainCube, open_cube
+from climate_data.dataset import ClimateDataset, get_dataset
+from climate_data.intervals import FloodIntervals
+from climate_data.loader import (RAIN_COLUMNS, available_years, load_precipitation, load_precipitation_range,
+                                 load_rain)
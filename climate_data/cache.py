@@ -0,0 +1,102 @@
+import collections
+import functools
+import json
+import threading
+
+from climate_data import config
+
+_MISSING = object()
+
+
+class FigureCache:
+    """LRU cache for callback results (figures, table data), optionally backed by a shared on-disk cache."""
+
+    def __init__(self, namespace, maxsize=256, directory=None, disk_size_limit=2 ** 30):
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._memory = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = None
+        if directory:
+            # diskcache ist optional und nur nötig, wenn sich mehrere Worker einen Cache teilen sollen
+            import diskcache
+            self._disk = diskcache.Cache(directory, size_limit=disk_size_limit,
+                                         eviction_policy='least-recently-used')
+
+    @classmethod
+    def from_config(cls, namespace):
+        return cls(namespace, maxsize=config.CACHE_SIZE, directory=config.CACHE_DIR,
+                   disk_size_limit=config.CACHE_DISK_LIMIT)
+
+    def key(self, name, args):
+        return f'{self.namespace}:{name}:' + json.dumps(args, default=str)
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return True, self._memory[key]
+        if self._disk is not None:
+            value = self._disk.get(key, default=_MISSING)
+            if value is not _MISSING:
+                self._remember(key, value)
+                with self._lock:
+                    self.hits += 1
+                return True, value
+        with self._lock:
+            self.misses += 1
+        return False, None
+
+    def set(self, key, value):
+        self._remember(key, value)
+        if self._disk is not None:
+            self._disk.set(key, value)
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.maxsize:
+                self._memory.popitem(last=False)
+
+    def memoize(self, func):
+        """Decorator: cache func by its positional arguments, keyword arguments are passed on but not part of the key."""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = self.key(func.__name__, args)
+            found, value = self.get(key)
+            if not found:
+                value = func(*args, **kwargs)
+                self.set(key, value)
+            return value
+
+        wrapper.uncached = func
+        return wrapper
+
+    def warm(self, func, arg_list):
+        """Fill the cache for the given argument tuples ahead of the first request."""
+        for args in arg_list:
+            func(*args)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self.hits = self.misses = 0
+        if self._disk is not None:
+            self._disk.clear()
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'namespace': self.namespace,
+                'entries': len(self._memory),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / requests if requests else None,
+                'disk_entries': len(self._disk) if self._disk is not None else None,
+            }
@@ -0,0 +1,194 @@
+import os
+import tempfile
+
+# Alle Pfade relativ zum Repository, damit Skripte aus jeder Directory laufen.
+# Mit CDK_DATA_DIR kann ein anderes Datenverzeichnis verwendet werden (z.B. synthetische Daten).
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DATA_DIR = os.environ.get('CDK_DATA_DIR', os.path.join(ROOT_DIR, 'data'))
+SOURCE_DIR = os.path.join(DATA_DIR, 'source')
+GENERATED_DIR = os.path.join(DATA_DIR, 'generated')
+
+# Parquet-Stores der Regendaten (eine Partition pro Jahr), erzeugt durch data_wrangling/rain_prep.py (oder
+# rain_to_parquet.py aus den generierten CSVs, mit demselben Schema)
+RAIN_STORES = {
+    'ch': 'rain_data.parquet',
+    'alps': 'rain_data_alps.parquet',
+}
+
+# CSV-Quelle pro Store
+RAIN_CSV = {
+    'ch': 'rain_data.csv',
+    'alps': 'rain_data_alps.csv',
+}
+
+# Vorberechnete Tages-/Wochen-/Monatsmittel pro Land, erzeugt durch data_wrangling/rain_rollup.py
+RAIN_ROLLUPS = {
+    'ch': 'rain_rollup.parquet',
+    'alps': 'rain_rollup_alps.parquet',
+}
+
+# Niederschlag als dichtes float32-Array [Tag, Zelle] (memory-mapped), erzeugt durch data_wrangling/rain_cube.py
+RAIN_CUBES = {
+    'ch': 'rain_cube',
+    'alps': 'rain_cube_alps',
+}
+
+# Monatskarten des Niederschlags als PNG-Overlay (climate_data/raster.py), beim ersten Abruf aus dem Cube gerendert
+# und hier gespeichert (oder vorab mit data_wrangling/rain_raster.py). Die Farbskala reicht pro Statistik von 0 bis
+# RASTER_MAX mm, für alle Jahre gleich, damit die Karten vergleichbar sind. Dazu Jahreskarten der Extremindizes
+# (EXTREME_INDICES, r20mm in Tagen) und Karten der Trends (mm/Jahrzehnt) und der Skalierung (%/°C) von RASTER_MIN an
+RAIN_RASTERS = {
+    'ch': 'rain_raster',
+    'alps': 'rain_raster_alps',
+}
+RASTER_MAX = {'sum': 300, 'mean': 10, 'max': 80, 'rx1day': 100, 'rx5day': 200, 'r95p': 500, 'r20mm': 30,
+              'trend': 50, 'cc_tmax': 14, 'cc_tmin': 14}
+RASTER_MIN = {'trend': -50, 'cc_tmax': 0, 'cc_tmin': 0}
+RASTER_PIXELS_PER_CELL = int(os.environ.get('CDK_RASTER_PIXELS_PER_CELL', 4))
+
+# Niederschlag über den Zellen der betroffenen Regionen rund um jede Überschwemmung, erzeugt durch
+# data_wrangling/event_rain.py: von EVENT_DAYS_BEFORE Tagen vor Beginn bis zum Ende. Regionen ohne eigene Zelle im
+# Cube (kleiner als 25 km) nehmen die EVENT_NEAREST_CELLS nächsten Zellen
+EVENT_PRECIPITATION = {
+    'ch': 'event_precipitation.parquet',
+    'alps': 'event_precipitation_alps.parquet',
+}
+EVENT_DAYS_BEFORE = int(os.environ.get('CDK_EVENT_DAYS_BEFORE', 7))
+EVENT_NEAREST_CELLS = 4
+
+# Extremindizes des Niederschlags (ETCCDI) pro Zelle und Jahr, erzeugt durch data_wrangling/extreme_indices.py:
+# Rx1day, Rx5day, R95p (Schwelle: 95. Perzentil der nassen Tage >= 1 mm in EXTREME_BASE_YEARS) und R20mm.
+# Jahre mit mehr als EXTREME_MAX_MISSING_DAYS fehlenden Tagen bleiben leer (NaN), wie bei ETCCDI
+EXTREME_INDICES = {
+    'ch': 'extreme_indices.parquet',
+    'alps': 'extreme_indices_alps.parquet',
+}
+EXTREME_BASE_YEARS = (1981, 2010)
+EXTREME_MAX_MISSING_DAYS = 15
+
+# Trends der Jahreswerte (OLS, Sen-Steigung mit Mann-Kendall-Test) und Skalierung des Niederschlags mit der
+# Temperatur (Clausius-Clapeyron, Lenderink & van Meijgaard 2008) pro Zelle und NUTS-Region, erzeugt durch
+# data_wrangling/precipitation_trends.py. Skalierung: Perzentile CC_PERCENTILES der nassen Tage in Klassen von
+# CC_BIN_WIDTH °C der Tagestemperatur, nur Klassen mit mindestens CC_MIN_DAYS Tagen
+PRECIPITATION_TRENDS = {
+    'ch': 'precipitation_trends.parquet',
+    'alps': 'precipitation_trends_alps.parquet',
+}
+CC_SCALING = {
+    'ch': 'cc_scaling.parquet',
+    'alps': 'cc_scaling_alps.parquet',
+}
+CC_PERCENTILES = (0.9, 0.99)
+CC_BIN_WIDTH = 2.0
+CC_MIN_DAYS = 50
+
+# Resample-Regeln pro Zeitrahmen, wie sie die Dashboards bisher verwendet haben. Der Schlüssel 'M' ist der Wert im
+# Dashboard, die Regel für Monatsende heisst ab pandas 2.2 'ME' ('M' ist veraltet)
+TIMEFRAME_RULES = {
+    'ch': {'D': 'D', 'W': 'W-MON', 'M': 'ME'},
+    'alps': {'D': 'D', 'W': 'W', 'M': 'ME'},
+}
+
+# Flutdaten und Regionen pro Dashboard (Datumsformate werden pro Wert erkannt, siehe climate_data/dates.py)
+FLOOD_SOURCES = {
+    'ch': ('flood_data.csv', 'regions_ch.csv'),
+    'alps': ('flood_data_fixed.csv', 'regionswithcords.csv'),
+}
+
+# Platzhalter für "kein Land ausgewählt" im Rollup
+ALL_COUNTRIES = 'ALL'
+
+# Zuordnung Rasterzelle -> Land/Region (CELL_ID), erzeugt durch data_wrangling/grid_index.py
+GRID_CELLS = 'grid_cells.parquet'
+
+# Ländergrenzen für die räumliche Zuordnung der Rasterzellen (Polygone mit Spalte name oder NAME). Nötig ab
+# geopandas 1.0, nur ältere Versionen haben naturalearth_lowres als Default (siehe data_wrangling/grid_index.py)
+COUNTRIES_SHAPEFILE = os.environ.get('CDK_COUNTRIES_SHAPEFILE')
+
+# Optional: NUTS-Regionen als Polygone (Spalte NUTS_ID). Ohne Shapefile wird die nächste Region aus regionswithcords.csv genommen
+REGIONS_SHAPEFILE = os.environ.get('CDK_REGIONS_SHAPEFILE')
+
+# Cache für Figuren/Callback-Ergebnisse: Einträge im Speicher, optionales Verzeichnis für einen gemeinsamen
+# Disk-Cache mehrerer Worker (braucht diskcache) und wie viele der letzten Jahre beim Start vorberechnet werden
+CACHE_SIZE = int(os.environ.get('CDK_CACHE_SIZE', 256))
+CACHE_DIR = os.environ.get('CDK_CACHE_DIR')
+CACHE_DISK_LIMIT = int(os.environ.get('CDK_CACHE_DISK_LIMIT', 2 ** 30))
+CACHE_WARM_YEARS = int(os.environ.get('CDK_CACHE_WARM_YEARS', 1))
+
+# Kumulatives Diagramm des Alpen-Dashboards als Background-Callback in eigenen Prozessen (CDK_BACKGROUND_JOBS=1),
+# Default ist ein normaler Callback. Jobs und Ergebnisse liegen in JOBS_DIR (Dash DiskcacheManager, braucht
+# diskcache und multiprocess)
+BACKGROUND_JOBS = os.environ.get('CDK_BACKGROUND_JOBS') == '1'
+JOBS_DIR = os.environ.get('CDK_JOBS_DIR', os.path.join(tempfile.gettempdir(), 'cdk-jobs'))
+
+# Messung der Callbacks (climate_data/profiling.py, /metrics): ab wie vielen ms ein Callback als langsam gilt und ein
+# Profil in PROFILE_DIR geschrieben wird (nicht gesetzt = kein Profiler), mit cprofile oder pyinstrument (optional)
+PROFILE_SLOW_MS = float(os.environ['CDK_PROFILE_SLOW_MS']) if os.environ.get('CDK_PROFILE_SLOW_MS') else None
+PROFILE_DIR = os.environ.get('CDK_PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'cdk-profiles'))
+PROFILER = os.environ.get('CDK_PROFILER', 'cprofile')
+
+# Produktivbetrieb (dashboard/wsgi.py): welches Dashboard der WSGI-Server ausliefert, 'ch' oder 'alps'
+DASHBOARD = os.environ.get('CDK_DASHBOARD', 'alps')
+
+# Geokodierung der Regionen in flood_prep.py: lokaler Cache pro NUTS-Code und Backend für fehlende Codes
+# (cache, shapefile, opencage, nominatim). Default: nur Cache bzw. NUTS-Shapefile, kein Netzwerk
+GEOCODE_CACHE = 'geocode_cache.csv'
+GEOCODER = os.environ.get('CDK_GEOCODER')
+
+# NUTS-Länderpräfix der Länder im Dashboard
+COUNTRY_CODES = {
+    'France': 'FR',
+    'Switzerland': 'CH',
+    'Liechtenstein': 'LI',
+    'Monaco': 'MC',
+    'Slovenia': 'SI',
+    'Austria': 'AT',
+    'Germany': 'DE',
+    'Italy': 'IT',
+}
+
+
+def source_path(name):
+    return os.path.join(SOURCE_DIR, name)
+
+
+def generated_path(name):
+    return os.path.join(GENERATED_DIR, name)
+
+
+def _dataset_path(files, dataset):
+    if dataset not in files:
+        raise ValueError(f"Unknown dataset '{dataset}', expected one of {sorted(files)}")
+    return generated_path(files[dataset])
+
+
+def rain_store_path(dataset):
+    return _dataset_path(RAIN_STORES, dataset)
+
+
+def rain_rollup_path(dataset):
+    return _dataset_path(RAIN_ROLLUPS, dataset)
+
+
+def rain_cube_path(dataset):
+    return _dataset_path(RAIN_CUBES, dataset)
+
+
+def rain_raster_path(dataset):
+    return _dataset_path(RAIN_RASTERS, dataset)
+
+
+def event_precipitation_path(dataset):
+    return _dataset_path(EVENT_PRECIPITATION, dataset)
+
+
+def extreme_indices_path(dataset):
+    return _dataset_path(EXTREME_INDICES, dataset)
+
+
+def precipitation_trends_path(dataset):
+    return _dataset_path(PRECIPITATION_TRENDS, dataset)
+
+
+def cc_scaling_path(dataset):
+    return _dataset_path(CC_SCALING, dataset)
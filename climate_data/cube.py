@@ -0,0 +1,82 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from climate_data import config
+
+CUBE_FILE = 'precipitation.npy'
+# Tagestemperaturen (°C) derselben Tage und Zellen, falls der Store Werte hat (Agri4cast-Quellen, nicht die CSVs)
+TEMPERATURE_FILES = {'TEMPERATURE_MAX': 'temperature_max.npy', 'TEMPERATURE_MIN': 'temperature_min.npy'}
+CELLS_FILE = 'cells.parquet'
+META_FILE = 'cube.json'
+
+
+class RainCube:
+    """Daily precipitation of one rain store as a read-only float32 [day, cell] memory map.
+
+    Rows are consecutive days from first_day, columns are grid cells sorted by country and region, so
+    the cells of a country or region are one column range and a day mean is a reduction over a view.
+    Missing values are NaN.
+    """
+    __slots__ = ('name', 'path', 'precipitation', 'first_day', 'cells', '_columns')
+
+    def __init__(self, name, path):
+        with open(os.path.join(path, META_FILE)) as file:
+            meta = json.load(file)
+        self.name = name
+        self.path = path
+        self.precipitation = np.load(os.path.join(path, CUBE_FILE), mmap_mode='r')
+        self.first_day = np.datetime64(meta['first_day'], 'D')
+        self.cells = pd.read_parquet(os.path.join(path, CELLS_FILE))
+        self._columns = {}
+        for column in ('COUNTRY', 'REGION_CODE'):
+            for value, index in self.cells.groupby(column, sort=False).indices.items():
+                if index[-1] - index[0] + 1 != len(index):
+                    raise ValueError(f"Cells of {column} '{value}' are not contiguous in {path}, a region lies in "
+                                     f"several countries: rerun grid_index.py, then rain_cube.py")
+                self._columns[(column, value)] = slice(int(index[0]), int(index[-1]) + 1)
+
+    def temperature(self, variable):
+        """Daily 'TEMPERATURE_MAX' or 'TEMPERATURE_MIN' as a [day, cell] memory map, None if the cube has none."""
+        path = os.path.join(self.path, TEMPERATURE_FILES[variable])
+        if not os.path.exists(path):
+            return None
+        return np.load(path, mmap_mode='r')
+
+    def columns(self, country=None, region=None):
+        """Column range of a region, a country or all cells (an empty range for unknown names)."""
+        if region is not None:
+            return self._columns.get(('REGION_CODE', region), slice(0, 0))
+        if country is not None:
+            return self._columns.get(('COUNTRY', country), slice(0, 0))
+        return slice(0, self.precipitation.shape[1])
+
+    def rows(self, start, end):
+        """Row range of the days start..end (inclusive, anything np.datetime64 accepts), clipped to the cube."""
+        first = (np.datetime64(start, 'D') - self.first_day).astype(int)
+        last = (np.datetime64(end, 'D') - self.first_day).astype(int) + 1
+        n_days = self.precipitation.shape[0]
+        return slice(int(np.clip(first, 0, n_days)), int(np.clip(last, 0, n_days)))
+
+    def days(self, rows):
+        return self.first_day + np.arange(rows.start, rows.stop).astype('timedelta64[D]')
+
+    def daily(self, start, end, country=None, region=None):
+        """Sum and count of the cell values per day, like the rollup rows (DAY, PRECIPITATION_SUM, N)."""
+        rows = self.rows(start, end)
+        block = self.precipitation[rows, self.columns(country, region)]
+        valid = ~np.isnan(block)
+        return pd.DataFrame({
+            'DAY': self.days(rows).astype('datetime64[ns]'),
+            'PRECIPITATION_SUM': block.sum(axis=1, dtype='float64', where=valid),
+            'N': valid.sum(axis=1),
+        })
+
+
+def open_cube(dataset):
+    path = config.rain_cube_path(dataset)
+    if not os.path.exists(os.path.join(path, META_FILE)):
+        raise FileNotFoundError(f"Rain cube {path} not found, run data_wrangling/rain_cube.py first")
+    return RainCube(dataset, path)
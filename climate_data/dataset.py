@@ -0,0 +1,275 @@
+import collections
+import functools
+import os
+import threading
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from climate_data import config, events, indices, loader, trends, views
+from climate_data.cube import open_cube
+from climate_data.raster import open_raster
+from climate_data.intervals import FloodIntervals
+
+
+# Anzahl FloodIntervals (Jahr, Land), die ein Datensatz behält, die zuletzt verwendeten bleiben
+INTERVALS_SIZE = 256
+
+
+class ClimateDataset:
+    """Read-only flood events and precipitation rollup of one dashboard dataset ('ch' or 'alps').
+
+    Nothing is read before the first query. The rollup is kept as one set of numpy arrays per
+    (country, timeframe), so a dataset loaded before the web server forks its workers is shared
+    copy-on-write instead of being loaded again by every worker. Without a rollup the means are computed
+    from the memory-mapped RainCube, if it was built.
+    """
+    __slots__ = ('name', '_lock', '_flood_data', '_series', '_intervals', '_cube', '_events', '_raster', '_indices',
+                 '_trends', '_artifacts')
+
+    def __init__(self, name):
+        if name not in config.FLOOD_SOURCES:
+            raise ValueError(f"Unknown dataset '{name}', expected one of {sorted(config.FLOOD_SOURCES)}")
+        self.name = name
+        self._lock = threading.RLock()
+        self._flood_data = None
+        self._series = None
+        self._intervals = collections.OrderedDict()
+        self._cube = None
+        self._events = None
+        self._raster = None
+        self._indices = None
+        self._trends = None
+        self._artifacts = None
+
+    def load(self):
+        """Read everything now, e.g. in the server process before the workers are forked."""
+        self.flood_data
+        self.cube()
+        self._rollup()
+        return self
+
+    @property
+    def flood_data(self):
+        """All flood events, one row per affected region (do not modify, use floods() for selections)."""
+        if self._flood_data is None:
+            with self._lock:
+                if self._flood_data is None:
+                    floods_name, regions_name = config.FLOOD_SOURCES[self.name]
+                    floods = loader.load_floods(floods_name, regions_name)
+                    self._flood_data = views.add_date_labels(floods)
+        return self._flood_data
+
+    def years(self):
+        return sorted(int(year) for year in self.flood_data['Year'].unique())
+
+    def countries(self, year):
+        return list(self.floods(year)['Country name'].unique())
+
+    def floods(self, year, country=None):
+        """Flood rows of one year, optionally of one country."""
+        return views.select_floods(self.flood_data, year, country)
+
+    def flood_intervals(self, year=None, country=None):
+        """FloodIntervals of one year and country, or of all floods when year is None."""
+        key = (year, country)
+        with self._lock:
+            if key in self._intervals:
+                self._intervals.move_to_end(key)
+                return self._intervals[key]
+            floods = self.flood_data if year is None else self.floods(year, country)
+            intervals = self._intervals[key] = FloodIntervals.from_events(floods)
+            while len(self._intervals) > INTERVALS_SIZE:
+                self._intervals.popitem(last=False)
+            return intervals
+
+    def cube(self):
+        """The RainCube ([day, cell] memory map) of this dataset, None if data_wrangling/rain_cube.py was not run."""
+        if self._cube is None:
+            with self._lock:
+                if self._cube is None:
+                    try:
+                        self._cube = open_cube(self.name)
+                    except FileNotFoundError:
+                        self._cube = False
+                    except ValueError as error:
+                        # Ein unbrauchbarer Cube darf den Start nicht verhindern, es bleibt der Weg über Parquet
+                        warnings.warn(f"{self.name}: rain cube not used, {error}")
+                        self._cube = False
+        return self._cube or None
+
+    def raster(self):
+        """The RainRaster (monthly precipitation maps as PNG) of this dataset, None without a cube."""
+        self._check_artifacts()
+        raster = self._raster
+        if raster is None and self.cube() is not None:
+            with self._lock:
+                if self._raster is None:
+                    layers = trends.map_layers(*self._trend_tables(), self.cube())
+                    self._raster = open_raster(self.name, self.cube(), self._index_table(), layers)
+                raster = self._raster
+        return raster
+
+    def extreme_indices(self, year, country=None):
+        """Extreme indices of the cells of a country (or all cells) in one year, one row per cell.
+
+        Columns CELL_ID, LATITUDE, LONGITUDE, N_DAYS and indices.INDICES, read from the table written by
+        data_wrangling/extreme_indices.py (empty if it was not run).
+        """
+        table = self._index_table()
+        if table is None or self.cube() is None:
+            columns = ['CELL_ID', 'LATITUDE', 'LONGITUDE', 'N_DAYS'] + list(indices.INDICES)
+            return pd.DataFrame({column: [] for column in columns})
+        start, stop = np.searchsorted(table['YEAR'].to_numpy(), [year, year + 1])
+        rows = table.iloc[start:stop].drop(columns='YEAR')
+        cells = self.cube().cells
+        if country is not None:
+            cells = cells[cells['COUNTRY'] == country]
+        return cells[['CELL_ID', 'LATITUDE', 'LONGITUDE']].merge(rows, on='CELL_ID')
+
+    def precipitation_trends(self, level='region', variable=trends.PRCPTOT):
+        """Trends of one yearly variable per cell or NUTS region (level 'cell' or 'region'), trends.TREND_COLUMNS.
+
+        Slopes are per year; empty if data_wrangling/precipitation_trends.py was not run.
+        """
+        table = self._trend_tables()[0]
+        if table is None:
+            return pd.DataFrame({column: [] for column in trends.TREND_COLUMNS})
+        return table[(table['LEVEL'] == level) & (table['VARIABLE'] == variable)].reset_index(drop=True)
+
+    def cc_scaling(self, level='region', temperature='TEMPERATURE_MAX'):
+        """Scaling of the wet-day percentiles with temperature (%/°C) per cell or NUTS region.
+
+        One row per percentile of config.CC_PERCENTILES; empty without the table or temperatures in the cube.
+        """
+        table = self._trend_tables()[1]
+        if table is None:
+            return pd.DataFrame({column: [] for column in trends.SCALING_COLUMNS})
+        return table[(table['LEVEL'] == level) & (table['TEMPERATURE'] == temperature)].reset_index(drop=True)
+
+    def _check_artifacts(self):
+        # Indizes und Trends kann pipeline.py erzeugen, während das Dashboard läuft: dann neu laden
+        paths = [config.extreme_indices_path(self.name), config.precipitation_trends_path(self.name),
+                 config.cc_scaling_path(self.name)]
+        artifacts = tuple(os.stat(path).st_mtime_ns if os.path.exists(path) else None for path in paths)
+        if artifacts != self._artifacts:
+            with self._lock:
+                if artifacts != self._artifacts:
+                    self._indices = self._trends = self._raster = None
+                    self._artifacts = artifacts
+
+    def _trend_tables(self):
+        self._check_artifacts()
+        if self._trends is None:
+            with self._lock:
+                if self._trends is None:
+                    self._trends = trends.load_trends(self.name)
+        return self._trends
+
+    def _index_table(self):
+        self._check_artifacts()
+        if self._indices is None:
+            with self._lock:
+                if self._indices is None:
+                    table = indices.load_indices(self.name)
+                    self._indices = False if table is None else table
+        return None if self._indices is False else self._indices
+
+    def event_precipitation(self, event_id, code=None):
+        """Mean precipitation over the cells of one affected region around a flood: DAY, PRECIPITATION, N, IN_EVENT.
+
+        Read from the batch written by data_wrangling/event_rain.py, or computed from the cube on first use.
+        """
+        table, windows = self._event_table()
+        rows = windows.get((event_id, code if isinstance(code, str) else ''))
+        if rows is None:
+            return table.iloc[:0][['DAY', 'PRECIPITATION', 'N', 'IN_EVENT']]
+        return table.iloc[rows][['DAY', 'PRECIPITATION', 'N', 'IN_EVENT']].reset_index(drop=True)
+
+    def _event_table(self):
+        if self._events is None:
+            with self._lock:
+                if self._events is None:
+                    path = config.event_precipitation_path(self.name)
+                    if os.path.exists(path):
+                        table = pd.read_parquet(path)
+                    elif self.cube() is not None:
+                        table = events.event_precipitation(self.cube(), self.flood_data)
+                    else:
+                        table = pd.DataFrame({column: [] for column in events.EVENT_COLUMNS})
+                    table = table.sort_values(['ID', 'Code', 'DAY'], ignore_index=True)
+                    # (ID, Code) -> Zeilenbereich der sortierten Tabelle
+                    groups = table.groupby(['ID', 'Code'], sort=False).indices
+                    windows = {key: slice(int(index[0]), int(index[-1]) + 1) for key, index in groups.items()}
+                    self._events = (table, windows)
+        return self._events
+
+    def _rollup(self):
+        if self._series is None:
+            with self._lock:
+                if self._series is None:
+                    self._series = self._read_rollup()
+        return self._series
+
+    def _read_rollup(self):
+        try:
+            rollup = loader.open_rollup(self.name).to_table(
+                columns=['COUNTRY', 'TIMEFRAME', 'YEAR', 'DAY', 'PRECIPITATION_SUM', 'N']).to_pandas()
+        except FileNotFoundError:
+            if self.cube() is None:
+                raise
+            return {}
+        series = {}
+        for (country, timeframe), rows in rollup.groupby(['COUNTRY', 'TIMEFRAME'], observed=True, sort=False):
+            rows = rows.sort_values(['YEAR', 'DAY'])
+            arrays = (rows['YEAR'].to_numpy(dtype='int32'),
+                      rows['DAY'].to_numpy(dtype='datetime64[ns]'),
+                      rows['PRECIPITATION_SUM'].to_numpy(dtype='float64'),
+                      rows['N'].to_numpy(dtype='int64'))
+            for array in arrays:
+                array.flags.writeable = False
+            series[(str(country), str(timeframe))] = arrays
+        return series
+
+    def _rollup_rows(self, start_year, end_year, country, freq):
+        if not self._rollup() and self.cube() is not None:
+            return self._cube_rows(start_year, end_year, country, freq)
+        key = (country or config.ALL_COUNTRIES, freq)
+        if key not in self._rollup():
+            return pd.DataFrame({'DAY': pd.Series(dtype='datetime64[ns]'), 'PRECIPITATION_SUM': [], 'N': []})
+        years, days, sums, counts = self._rollup()[key]
+        start = np.searchsorted(years, start_year, side='left')
+        end = np.searchsorted(years, end_year, side='right')
+        return pd.DataFrame({'DAY': days[start:end], 'PRECIPITATION_SUM': sums[start:end], 'N': counts[start:end]})
+
+    def _cube_rows(self, start_year, end_year, country, freq):
+        daily = self.cube().daily(f'{start_year}-01-01', f'{end_year}-12-31', country)
+        # Wie im Rollup nur Tage mit Werten
+        daily = daily[daily['N'] > 0].reset_index(drop=True)
+        if freq == 'D':
+            return daily
+        return daily.resample(config.TIMEFRAME_RULES[self.name][freq], on='DAY')[['PRECIPITATION_SUM', 'N']] \
+            .sum().reset_index()
+
+    def precip_series(self, year, country=None, freq='D'):
+        """Spatial mean precipitation of one year at freq ('D', 'W' or 'M'), columns DAY and PRECIPITATION."""
+        return loader._mean_precipitation(self._rollup_rows(year, year, country, freq))
+
+    def precip_sums(self, year, country=None):
+        """Daily PRECIPITATION_SUM and N (cell values) of one year, to sum weeks or months elsewhere."""
+        return self._rollup_rows(year, year, country, 'D')
+
+    def precip_range(self, start_year, end_year, country=None, freq='D'):
+        """Like precip_series, but resampled continuously over start_year..end_year."""
+        daily = self._rollup_rows(start_year, end_year, country, 'D')
+        if freq != 'D':
+            rule = config.TIMEFRAME_RULES[self.name][freq]
+            daily = daily.resample(rule, on='DAY')[['PRECIPITATION_SUM', 'N']].sum().reset_index()
+        return loader._mean_precipitation(daily)
+
+
+@functools.lru_cache(maxsize=None)
+def get_dataset(name):
+    """The shared ClimateDataset of name, created on first use."""
+    return ClimateDataset(name)
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+# Datumsformate der Quellen, pro Wert am Muster erkannt (HANZE/Notebooks: %d.%m.%Y und %Y-%m-%d, Agri4cast: %Y%m%d)
+DATE_PATTERNS = [
+    (r'\d{1,2}\.\d{1,2}\.\d{4}', '%d.%m.%Y'),
+    (r'\d{4}-\d{2}-\d{2}', '%Y-%m-%d'),
+    (r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}', '%Y-%m-%d %H:%M:%S'),
+    (r'\d{8}', '%Y%m%d'),
+]
+
+# Kanonische Form in den generierten Dateien
+ISO_FORMAT = '%Y-%m-%d'
+
+
+def _from_numbers(numbers):
+    numbers = np.asarray(numbers, dtype='int64')
+    return pd.to_datetime(pd.DataFrame({'year': numbers // 10000, 'month': numbers // 100 % 100, 'day': numbers % 100}),
+                          errors='coerce').to_numpy(dtype='datetime64[ns]')
+
+
+def _as_text(value):
+    # Einzelne Zahlen in Objektspalten (z.B. 19790101.0 aus einer CSV mit Lücken) als yyyymmdd behandeln
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return str(int(value)) if float(value).is_integer() else str(value)
+    return str(value).strip()
+
+
+def normalize_dates(values):
+    """Parse mixed %d.%m.%Y / %Y-%m-%d / %Y%m%d values to datetime64[ns].
+
+    Returns the parsed Series and a boolean Series of the rows that had a value but could not be parsed (NaT in
+    the result). The format is chosen per value by pattern, and every distinct value is parsed only once.
+    """
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values, pd.Series(False, index=values.index)
+    if pd.api.types.is_integer_dtype(values):
+        parsed = pd.Series(_from_numbers(values), index=values.index)
+        return parsed, parsed.isna()
+
+    codes, uniques = pd.factorize(values)
+    text = pd.Series([_as_text(value) for value in uniques], dtype=object)
+    parsed_uniques = np.full(len(text), np.datetime64('NaT'), dtype='datetime64[ns]')
+    for pattern, fmt in DATE_PATTERNS:
+        mask = text.str.fullmatch(pattern).to_numpy(dtype=bool)
+        if mask.any():
+            parsed = pd.to_datetime(text[mask], format=fmt, errors='coerce')
+            parsed_uniques[mask] = parsed.to_numpy(dtype='datetime64[ns]')
+
+    # Code -1 = fehlender Wert: zeigt auf das angehängte NaT und zählt nicht als Fehler
+    parsed = np.append(parsed_uniques, np.datetime64('NaT'))[codes]
+    unparsed = np.append(np.isnat(parsed_uniques), False)[codes]
+    return pd.Series(parsed, index=values.index, name=values.name), pd.Series(unparsed, index=values.index)
+
+
+def unparsed_report(values, unparsed, examples=5):
+    """One line for the build logs: how many values could not be parsed, with a few examples."""
+    if not unparsed.any():
+        return f"{values.name or 'dates'}: all {int(values.notna().sum())} values parsed"
+    sample = ', '.join(repr(value) for value in pd.Series(values)[unparsed].drop_duplicates().head(examples))
+    return f"{values.name or 'dates'}: {int(unparsed.sum())} of {len(values)} values could not be parsed, e.g. {sample}"
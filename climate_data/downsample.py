@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+
+def _as_float(values):
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[ns]').astype('int64').astype('float64')
+    return values.astype('float64')
+
+
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets: indices of the n_out points that best keep the shape of the series."""
+    x = _as_float(x)
+    y = np.nan_to_num(_as_float(y))
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # Erster und letzter Punkt bleiben immer, der Rest wird auf n_out - 2 gleich grosse Buckets verteilt
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_start, next_end = edges[bucket + 1], edges[bucket + 2]
+        else:
+            next_start, next_end = n - 1, n
+        next_x = x[next_start:next_end].mean()
+        next_y = y[next_start:next_end].mean()
+
+        area = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(area.argmax())
+        selected[bucket + 1] = previous
+    return selected
+
+
+def minmax_indices(y, n_buckets):
+    """Index of the minimum and maximum of each of n_buckets equally sized buckets."""
+    y = _as_float(y)
+    n = len(y)
+    if 2 * n_buckets >= n or n_buckets < 1:
+        return np.arange(n)
+    edges = np.linspace(0, n, n_buckets + 1).astype(int)[:-1]
+    bucket = np.repeat(np.arange(n_buckets), np.diff(np.r_[edges, n]))
+    order = np.lexsort((np.nan_to_num(y, nan=-np.inf), bucket))
+    bucket_last = np.r_[np.flatnonzero(np.diff(bucket[order])), n - 1]
+    bucket_first = np.r_[0, bucket_last[:-1] + 1]
+    return np.unique(np.r_[order[bucket_first], order[bucket_last]])
+
+
+def downsample(frame, x, y, n_out, keep=None, method='lttb'):
+    """Reduce frame to about n_out rows, always keeping the rows where keep is True."""
+    if len(frame) <= n_out:
+        return frame
+    if method == 'lttb':
+        indices = lttb_indices(frame[x].to_numpy(), frame[y].to_numpy(), n_out)
+    elif method == 'minmax':
+        indices = minmax_indices(frame[y].to_numpy(), n_out // 2)
+    else:
+        raise ValueError(f"Unknown downsampling method '{method}', expected 'lttb' or 'minmax'")
+    if keep is not None:
+        indices = np.union1d(indices, np.flatnonzero(np.asarray(keep)))
+    return frame.iloc[indices]
+
+
+def visible_range(relayout_data):
+    """(start, end) of the x-axis range from a Dash relayoutData dict, None when autoscaled or unknown."""
+    if not relayout_data or relayout_data.get('xaxis.autorange'):
+        return None
+    if 'xaxis.range[0]' in relayout_data and 'xaxis.range[1]' in relayout_data:
+        start, end = relayout_data['xaxis.range[0]'], relayout_data['xaxis.range[1]']
+    elif 'xaxis.range' in relayout_data:
+        start, end = relayout_data['xaxis.range']
+    else:
+        return None
+    return pd.Timestamp(start), pd.Timestamp(end)
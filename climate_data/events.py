@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+from climate_data import config
+
+EVENT_COLUMNS = ['ID', 'Code', 'DAY', 'PRECIPITATION', 'N', 'IN_EVENT']
+
+
+def region_cells(cube, code=None, latitude=None, longitude=None, nearest=config.EVENT_NEAREST_CELLS):
+    """Cube columns of a NUTS region; the nearest cells to (latitude, longitude) if the region has none."""
+    if isinstance(code, str):
+        columns = cube.columns(region=code)
+        if columns.stop > columns.start:
+            return columns
+    if latitude is None or np.isnan(latitude):
+        return np.array([], dtype='int64')
+    distance = (cube.cells['LATITUDE'].to_numpy() - latitude) ** 2 \
+        + ((cube.cells['LONGITUDE'].to_numpy() - longitude) * np.cos(np.radians(latitude))) ** 2
+    return np.sort(np.argsort(distance)[:nearest])
+
+
+def _key(columns):
+    return (columns.start, columns.stop) if isinstance(columns, slice) else tuple(columns.tolist())
+
+
+def event_windows(floods, days_before=config.EVENT_DAYS_BEFORE):
+    """One row per (flood ID, region) with the window from days_before days before the start to the end date."""
+    windows = floods[['ID', 'Code', 'Start date', 'End date', 'Latitude', 'Longitude']].copy()
+    windows['Code'] = windows['Code'].astype(object).where(windows['Code'].notna(), '')
+    windows = windows.dropna(subset=['Start date']).drop_duplicates(['ID', 'Code'], ignore_index=True)
+    windows['End date'] = windows['End date'].fillna(windows['Start date'])
+    windows['From'] = windows['Start date'] - pd.Timedelta(days=days_before)
+    return windows
+
+
+def event_precipitation(cube, floods, days_before=config.EVENT_DAYS_BEFORE):
+    """Daily mean over the region cells around every flood, long table ID, Code, DAY, PRECIPITATION, N, IN_EVENT.
+
+    Every region (set of cells) is averaged once over all days of the cube, the events are then only row
+    ranges of these series.
+    """
+    windows = event_windows(floods, days_before)
+    series = {}
+    frames = []
+    for event_id, code, start, end, first, latitude, longitude in zip(
+            windows['ID'], windows['Code'], windows['Start date'], windows['End date'], windows['From'],
+            windows['Latitude'], windows['Longitude']):
+        columns = region_cells(cube, code, latitude, longitude)
+        key = _key(columns)
+        if key not in series:
+            block = cube.precipitation[:, columns]
+            valid = ~np.isnan(block)
+            series[key] = (block.sum(axis=1, dtype='float64', where=valid), valid.sum(axis=1))
+        sums, counts = series[key]
+
+        rows = cube.rows(first, end)
+        days = cube.days(rows)
+        count = counts[rows]
+        frames.append(pd.DataFrame({
+            'ID': event_id,
+            'Code': code,
+            'DAY': days.astype('datetime64[ns]'),
+            'PRECIPITATION': sums[rows] / np.where(count > 0, count, np.nan),
+            'N': count,
+            'IN_EVENT': days >= np.datetime64(start, 'D'),
+        }))
+    if not frames:
+        return pd.DataFrame({column: [] for column in EVENT_COLUMNS})
+    return pd.concat(frames, ignore_index=True)[EVENT_COLUMNS]
@@ -0,0 +1,145 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from climate_data import config
+
+# ETCCDI-Indizes (Expert Team on Climate Change Detection and Indices), Spaltennamen der Tabelle
+INDICES = ('RX1DAY', 'RX5DAY', 'R95P', 'R20MM')
+INDEX_COLUMNS = ['YEAR', 'CELL_ID', 'N_DAYS'] + list(INDICES)
+WET_DAY = 1.0
+HEAVY_DAY = 20.0
+PERCENTILE = 0.95
+WINDOW = 5
+
+# Spalten pro Arbeitsschritt: ein Block [Tag, Zelle] von 45 Jahren braucht so rund 70 MB pro Kopie (float64)
+CHUNK_CELLS = 512
+
+
+def year_starts(first_day, n_days):
+    """Years of the cube and the row of 1 January of every year (the first row for a partial first year)."""
+    first_year = first_day.astype('datetime64[Y]').astype(int) + 1970
+    last_year = (first_day + n_days - 1).astype('datetime64[Y]').astype(int) + 1970
+    years = np.arange(first_year, last_year + 1)
+    starts = (years - 1970).astype('datetime64[Y]').astype('datetime64[D]') - first_day
+    return years, np.maximum(starts.astype('int64'), 0)
+
+
+def quantile_position(counts, quantile):
+    """0-based position of the type 8 quantile in sorted samples of counts values (fractional, 0 for no values)."""
+    return np.clip((counts + 1 / 3) * quantile + 1 / 3, 1, np.maximum(counts, 1)) - 1
+
+
+def wet_day_percentile(block, quantile=PERCENTILE):
+    """Quantile of the wet days (>= WET_DAY) of every column, NaN for columns without wet days.
+
+    Like np.nanpercentile(method='median_unbiased') (Hyndman & Fan type 8, as climdex uses), but for all
+    columns at once: sorted once, the two neighbouring order statistics are interpolated per column.
+    """
+    ordered = np.sort(np.where(block >= WET_DAY, block, np.nan), axis=0)
+    counts = (~np.isnan(ordered)).sum(axis=0)
+    position = quantile_position(counts, quantile)
+    lower = np.floor(position).astype('int64')
+    upper = np.minimum(lower + 1, np.maximum(counts - 1, 0))
+    low = np.take_along_axis(ordered, lower[None, :], axis=0)[0]
+    high = np.take_along_axis(ordered, upper[None, :], axis=0)[0]
+    return np.where(counts > 0, low + (position - lower) * (high - low), np.nan)
+
+
+def block_indices(block, starts, base_rows):
+    """Indices of a [day, cell] block: dict of [year, cell] arrays, N_DAYS (days with a value) and INDICES.
+
+    Every index is one reduction over the year row ranges (ufunc.reduceat), Rx5day over the 5-day sums of
+    a rolling window ending on the day (windows with a missing day are missing). Years with more than
+    config.EXTREME_MAX_MISSING_DAYS missing days are NaN.
+    """
+    values = np.asarray(block, dtype='float64')
+    valid = ~np.isnan(values)
+    rolling = np.full_like(values, np.nan)
+    rolling[WINDOW - 1:] = np.lib.stride_tricks.sliding_window_view(values, WINDOW, axis=0).sum(axis=-1)
+    threshold = wet_day_percentile(values[base_rows])
+
+    result = {
+        'N_DAYS': np.add.reduceat(valid, starts, axis=0, dtype='int32'),
+        'RX1DAY': np.fmax.reduceat(values, starts, axis=0),
+        'RX5DAY': np.fmax.reduceat(rolling, starts, axis=0),
+        'R95P': np.add.reduceat(np.where((values >= WET_DAY) & (values > threshold), values, 0), starts, axis=0),
+        'R20MM': np.add.reduceat(values >= HEAVY_DAY, starts, axis=0, dtype='int32').astype('float64'),
+    }
+    days = np.diff(np.append(starts, len(values)))
+    incomplete = days[:, None] - result['N_DAYS'] > config.EXTREME_MAX_MISSING_DAYS
+    for index in INDICES:
+        result[index][incomplete] = np.nan
+    return result
+
+
+def _chunk_indices(cube_file, columns, starts, base_rows):
+    # Läuft in einem eigenen Prozess: der Cube wird dort erneut (memory-mapped) geöffnet statt übertragen
+    precipitation = np.load(cube_file, mmap_mode='r')
+    return block_indices(precipitation[:, columns], starts, base_rows)
+
+
+def base_rows(cube, base_years=config.EXTREME_BASE_YEARS):
+    """Row range of the base period for the percentile threshold, clipped to the cube."""
+    rows = cube.rows(f'{base_years[0]}-01-01', f'{base_years[1]}-12-31')
+    if rows.stop <= rows.start:
+        raise ValueError(f"Base period {base_years[0]}-{base_years[1]} is not in the cube of '{cube.name}'")
+    return rows
+
+
+def extreme_indices(cube, base_years=config.EXTREME_BASE_YEARS, workers=None, chunk_cells=CHUNK_CELLS):
+    """INDEX_COLUMNS of every cube cell and year, sorted by YEAR and in the column order of the cube.
+
+    The cells are split into chunks of chunk_cells columns computed on a process pool of workers
+    processes (default: one per CPU, 1 computes in this process).
+    """
+    n_days, n_cells = cube.precipitation.shape
+    years, starts = year_starts(cube.first_day, n_days)
+    base = base_rows(cube, base_years)
+    chunks = [slice(start, min(start + chunk_cells, n_cells)) for start in range(0, n_cells, chunk_cells)]
+    workers = min(workers or os.cpu_count() or 1, len(chunks))
+
+    if workers <= 1:
+        parts = [block_indices(cube.precipitation[:, columns], starts, base) for columns in chunks]
+    else:
+        cube_file = cube.precipitation.filename
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parts = list(executor.map(_chunk_indices, [cube_file] * len(chunks), chunks,
+                                      [starts] * len(chunks), [base] * len(chunks)))
+
+    table = pd.DataFrame({
+        'YEAR': np.repeat(years, n_cells).astype('int16'),
+        'CELL_ID': np.tile(cube.cells['CELL_ID'].to_numpy(), len(years)),
+    })
+    for column in ['N_DAYS'] + list(INDICES):
+        values = np.concatenate([part[column] for part in parts], axis=1).ravel()
+        table[column] = values if column == 'N_DAYS' else values.astype('float32')
+    return table
+
+
+def year_values(table, cube, year, index):
+    """Values of one index and year in the column order of cube, None if the table does not match the cube."""
+    start, stop = np.searchsorted(table['YEAR'].to_numpy(), [year, year + 1])
+    if stop - start != cube.precipitation.shape[1]:
+        return None
+    if not np.array_equal(table['CELL_ID'].to_numpy()[start:stop], cube.cells['CELL_ID'].to_numpy()):
+        return None
+    return table[index].to_numpy()[start:stop].astype('float64')
+
+
+def index_matrix(table, cube, index):
+    """One index as a [year, cell] array in the column order of cube, None if the table does not match the cube."""
+    n_cells = cube.precipitation.shape[1]
+    if len(table) % n_cells or not np.array_equal(table['CELL_ID'].to_numpy()[:n_cells], cube.cells['CELL_ID']):
+        return None
+    return table[index].to_numpy(dtype='float64').reshape(-1, n_cells)
+
+
+def load_indices(dataset):
+    """The table written by data_wrangling/extreme_indices.py, None if it was not built."""
+    path = config.extreme_indices_path(dataset)
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path)
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+
+class FloodIntervals:
+    """Sorted, closed [start, end] date intervals with vectorized membership queries."""
+
+    def __init__(self, starts, ends, ids=None):
+        starts = pd.to_datetime(pd.Series(starts)).to_numpy(dtype='datetime64[ns]')
+        ends = pd.to_datetime(pd.Series(ends)).to_numpy(dtype='datetime64[ns]')
+        ids = np.arange(len(starts)) if ids is None else np.asarray(ids)
+        self.names = {}
+
+        valid = ~(np.isnat(starts) | np.isnat(ends))
+        order = np.argsort(starts[valid], kind='stable')
+        self.starts = starts[valid][order]
+        self.ends = ends[valid][order]
+        self.ids = ids[valid][order]
+
+        # Überlappende Intervalle zu disjunkten Blöcken zusammenfassen: ein Tag liegt in einer Flut,
+        # wenn er im letzten Block liegt, der vor oder an diesem Tag beginnt
+        if len(self.starts):
+            block_first = np.flatnonzero(np.r_[True, self.starts[1:] > np.maximum.accumulate(self.ends)[:-1]])
+            self._block_starts = self.starts[block_first]
+            self._block_ends = np.maximum.reduceat(self.ends, block_first)
+        else:
+            self._block_starts = self._block_ends = np.array([], dtype='datetime64[ns]')
+
+    @classmethod
+    def from_frame(cls, frame, start='Start date', end='End date', id_column=None):
+        return cls(frame[start], frame[end], None if id_column is None else frame[id_column])
+
+    @classmethod
+    def from_events(cls, floods, id_column='ID', name_column='Name', start='Start date', end='End date'):
+        # flood_data hat eine Zeile pro betroffener Region, daher zuerst auf ein Intervall pro Ereignis reduzieren
+        floods = floods.dropna(subset=[start, end])
+        event_ids = floods[id_column] if id_column in floods.columns else pd.Series(floods.index, index=floods.index)
+        events = floods.groupby(event_ids).agg(start=(start, 'min'), end=(end, 'max'))
+        intervals = cls(events['start'], events['end'], ids=events.index)
+        if name_column in floods.columns:
+            names = floods[name_column].dropna().astype(str)
+            intervals.names = names.groupby(event_ids).agg(lambda n: ', '.join(n.unique())).to_dict()
+        return intervals
+
+    def __len__(self):
+        return len(self.starts)
+
+    def contains(self, days):
+        """Boolean array: True where the day lies within at least one interval."""
+        days = pd.to_datetime(pd.Series(days)).to_numpy(dtype='datetime64[ns]')
+        block = np.searchsorted(self._block_starts, days, side='right') - 1
+        inside = block >= 0
+        inside[inside] = days[inside] <= self._block_ends[block[inside]]
+        return inside
+
+    def covering(self, days):
+        """For every day, the ids of all intervals that cover it (in order of interval start)."""
+        days = pd.to_datetime(pd.Series(days)).to_numpy(dtype='datetime64[ns]')
+        order = np.argsort(days, kind='stable')
+        sorted_days = days[order]
+
+        # Jedes Intervall deckt einen zusammenhängenden Bereich der sortierten Tage ab
+        lo = np.searchsorted(sorted_days, self.starts, side='left')
+        hi = np.searchsorted(sorted_days, self.ends, side='right')
+        counts = np.maximum(hi - lo, 0)
+        interval_index = np.repeat(np.arange(len(self.starts)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        day_index = order[np.repeat(lo, counts) + offsets]
+
+        covering = [[] for _ in range(len(days))]
+        for day, interval in zip(day_index.tolist(), interval_index.tolist()):
+            covering[day].append(self.ids[interval])
+        return [tuple(ids) for ids in covering]
+
+    def describe(self, days, separator='; '):
+        """For every day, the names of the covering intervals joined into one label ('' if none)."""
+        return [separator.join(str(self.names.get(event_id, event_id)) for event_id in ids)
+                for ids in self.covering(days)]
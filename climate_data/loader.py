@@ -0,0 +1,137 @@
+import functools
+import os
+import warnings
+
+import pandas as pd
+import pyarrow.dataset as ds
+
+from climate_data import config, dates
+
+# Spalten, die die Dashboards aus den Regendaten brauchen
+RAIN_COLUMNS = ['DAY', 'LATITUDE', 'LONGITUDE', 'PRECIPITATION']
+
+# Zahlenspalten der Flutdaten, werden beim Laden einmal nach float64 konvertiert
+FLOOD_NUMBER_COLUMNS = ['Fatalities', 'Losses (mln EUR, 2020)']
+
+
+def _as_years(years):
+    if years is None:
+        return None
+    if isinstance(years, int):
+        return [years]
+    return sorted({int(year) for year in years})
+
+
+def open_rain_store(dataset):
+    path = config.rain_store_path(dataset)
+    if not os.path.isdir(path):
+        raise FileNotFoundError(
+            f"Rain store {path} not found, run data_wrangling/rain_to_parquet.py first")
+    return ds.dataset(path, format='parquet', partitioning='hive')
+
+
+@functools.lru_cache(maxsize=1)
+def load_grid_cells():
+    """CELL_ID -> LATITUDE, LONGITUDE, COUNTRY, REGION_CODE lookup table of the 25 km grid."""
+    path = config.generated_path(config.GRID_CELLS)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Grid index {path} not found, run data_wrangling/grid_index.py first")
+    return pd.read_parquet(path).set_index('CELL_ID').sort_index()
+
+
+def country_cell_ids(country):
+    cells = load_grid_cells()
+    return cells.index[cells['COUNTRY'] == country].to_numpy()
+
+
+def split_coordinates(coordinates):
+    """Split '(lat, lon)' tuple strings (older generated files) into two float Series."""
+    parts = coordinates.str.strip('[]()').str.split(',', expand=True)
+    return pd.to_numeric(parts[0], errors='coerce'), pd.to_numeric(parts[1], errors='coerce')
+
+
+def load_regions(name='regionswithcords.csv'):
+    """NUTS regions with numeric Latitude/Longitude and the region Code as categorical key."""
+    regions = pd.read_csv(config.generated_path(name), sep=',')
+    if 'Latitude' not in regions.columns:
+        regions['Latitude'], regions['Longitude'] = split_coordinates(regions['Coordinates'])
+    if 'Code' in regions.columns:
+        regions['Code'] = regions['Code'].astype('category')
+    return regions
+
+
+def load_floods(name='flood_data_fixed.csv', regions_name='regionswithcords.csv'):
+    """Flood events, one row per affected region, with the region Name joined on the NUTS Code."""
+    floods = pd.read_csv(config.generated_path(name), sep=',')
+    for column in FLOOD_NUMBER_COLUMNS:
+        if column in floods.columns:
+            floods[column] = pd.to_numeric(floods[column], errors='coerce').astype('float64')
+    # flood_prep.py schreibt ISO-Daten, ältere Dateien (flood_data.csv) haben noch %d.%m.%Y
+    for column in ('Start date', 'End date'):
+        raw = floods[column]
+        floods[column], unparsed = dates.normalize_dates(raw)
+        if unparsed.any():
+            warnings.warn(f"{name}: {dates.unparsed_report(raw, unparsed)}")
+    regions = load_regions(regions_name)
+
+    if 'Code' in floods.columns:
+        lookup = regions.drop_duplicates('Code').set_index('Code')[['Name']]
+        floods['Code'] = floods['Code'].astype('category')
+        return floods.join(lookup, on='Code')
+
+    # Ältere flood_data-Dateien haben nur Koordinaten-Strings in 'regions', dort bleibt nur der Join über die Koordinaten
+    floods['Latitude'], floods['Longitude'] = split_coordinates(floods['regions'])
+    return pd.merge(floods, regions, on=['Latitude', 'Longitude'], how='left', suffixes=('', '_region'))
+
+
+def load_rain(dataset, years=None, columns=None, country=None):
+    """Read only the requested year partitions and columns of a rain store, optionally for one country."""
+    store = open_rain_store(dataset)
+    years = _as_years(years)
+    row_filter = ds.field('YEAR').isin(years) if years is not None else None
+    if country:
+        country_filter = ds.field('CELL_ID').isin(country_cell_ids(country))
+        row_filter = country_filter if row_filter is None else row_filter & country_filter
+    table = store.to_table(columns=list(columns or RAIN_COLUMNS), filter=row_filter)
+    return table.to_pandas()
+
+
+def available_years(dataset):
+    store = open_rain_store(dataset)
+    return sorted({int(ds.get_partition_keys(fragment.partition_expression)['YEAR'])
+                   for fragment in store.get_fragments()})
+
+
+def open_rollup(dataset):
+    path = config.rain_rollup_path(dataset)
+    if not os.path.isdir(path):
+        raise FileNotFoundError(
+            f"Rain rollup {path} not found, run data_wrangling/rain_rollup.py first")
+    return ds.dataset(path, format='parquet', partitioning='hive')
+
+
+def _load_rollup_rows(dataset, years, timeframe, country):
+    row_filter = ((ds.field('YEAR').isin(_as_years(years)))
+                  & (ds.field('TIMEFRAME') == timeframe)
+                  & (ds.field('COUNTRY') == (country or config.ALL_COUNTRIES)))
+    table = open_rollup(dataset).to_table(columns=['DAY', 'PRECIPITATION_SUM', 'N'], filter=row_filter)
+    return table.to_pandas().sort_values('DAY', ignore_index=True)
+
+
+def _mean_precipitation(rows):
+    rows['PRECIPITATION'] = rows['PRECIPITATION_SUM'] / rows['N'].where(rows['N'] > 0)
+    return rows[['DAY', 'PRECIPITATION']]
+
+
+def load_precipitation(dataset, year, timeframe, country=None):
+    """Spatial mean precipitation of one year at the given timeframe ('D', 'W' or 'M')."""
+    return _mean_precipitation(_load_rollup_rows(dataset, [year], timeframe, country))
+
+
+def load_precipitation_range(dataset, start_year, end_year, timeframe, country=None):
+    """Like load_precipitation, but resampled continuously over start_year..end_year."""
+    daily = _load_rollup_rows(dataset, range(start_year, end_year + 1), 'D', country)
+    if timeframe != 'D':
+        rule = config.TIMEFRAME_RULES[dataset][timeframe]
+        daily = daily.resample(rule, on='DAY')[['PRECIPITATION_SUM', 'N']].sum().reset_index()
+    return _mean_precipitation(daily)
@@ -0,0 +1,297 @@
+import bisect
+import collections
+import contextlib
+import contextvars
+import cProfile
+import functools
+import os
+import threading
+import time
+
+import flask
+from dash.exceptions import PreventUpdate
+
+from climate_data import config
+
+# Grenzen der Histogramme (Prometheus: Anzahl Werte <= le)
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = (1e3, 1e4, 3e4, 1e5, 3e5, 1e6, 3e6, 1e7)
+
+# Zeit eines Callbacks ausserhalb von span(): vor allem Dash selbst (Ausgaben prüfen, Antwort als JSON serialisieren)
+DASH_STAGE = 'dash'
+
+# Namenszusatz der Background-Callbacks: ihre Requests starten den Job oder fragen ihn ab, ohne ihn zu messen
+BACKGROUND_SUFFIX = ' (background request)'
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+_trace = contextvars.ContextVar('cdk_trace', default=None)
+
+
+def resident_memory():
+    """Resident set size of this process in bytes (Linux /proc), None elsewhere."""
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def payload_size(response):
+    """Bytes of the JSON response Dash sends for a callback, None for anything else."""
+    if isinstance(response, str):
+        return len(response) if response.isascii() else len(response.encode())
+    if isinstance(response, bytes):
+        return len(response)
+    return None
+
+
+class Trace:
+    """Stages of the running callback; nested spans are recorded, but only the outer ones add up to the total."""
+    __slots__ = ('stages', 'depth', 'covered')
+
+    def __init__(self):
+        self.stages = []
+        self.depth = 0
+        self.covered = 0.0
+
+
+@contextlib.contextmanager
+def span(stage):
+    """Time one stage of the running callback; does nothing outside an instrumented callback (warm-up, jobs)."""
+    trace = _trace.get()
+    if trace is None:
+        yield
+        return
+    trace.depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        trace.depth -= 1
+        trace.stages.append((stage, seconds))
+        if trace.depth == 0:
+            trace.covered += seconds
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield bound, total
+
+
+def _labels(**labels):
+    text = ','.join('{}="{}"'.format(name, str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+                    for name, value in labels.items())
+    return '{' + text + '}' if text else ''
+
+
+def _bound(value):
+    return '+Inf' if value == float('inf') else repr(float(value))
+
+
+class Metrics:
+    """Timings, stages, payload sizes and memory deltas of the callbacks of one process, as Prometheus text."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.seconds = {}
+        self.stage_seconds = {}
+        self.response_bytes = {}
+        self.memory_delta = collections.defaultdict(lambda: [0, 0])
+        self.errors = collections.Counter()
+        self.profiles = collections.Counter()
+
+    def observe(self, callback, seconds, stages, size=None, memory_delta=None, error=False, profiled=False):
+        with self._lock:
+            self.seconds.setdefault(callback, Histogram(SECONDS_BUCKETS)).observe(seconds)
+            for stage, stage_seconds in stages:
+                self.stage_seconds.setdefault((callback, stage), Histogram(SECONDS_BUCKETS)).observe(stage_seconds)
+            if size is not None:
+                self.response_bytes.setdefault(callback, Histogram(BYTES_BUCKETS)).observe(size)
+            if memory_delta is not None:
+                self.memory_delta[callback][0] += memory_delta
+                self.memory_delta[callback][1] += 1
+            self.errors[callback] += error
+            self.profiles[callback] += profiled
+
+    def render(self, caches=()):
+        lines = []
+
+        def histogram(name, text, histograms, label_names):
+            lines.extend([f'# HELP {name} {text}', f'# TYPE {name} histogram'])
+            for key, values in sorted(histograms.items()):
+                labels = dict(zip(label_names, key if isinstance(key, tuple) else (key,)))
+                for bound, count in values.cumulative():
+                    lines.append(f'{name}_bucket{_labels(**labels, le=_bound(bound))} {count}')
+                lines.append(f'{name}_sum{_labels(**labels)} {values.sum!r}')
+                lines.append(f'{name}_count{_labels(**labels)} {values.count}')
+
+        def simple(name, kind, text, values):
+            lines.extend([f'# HELP {name} {text}', f'# TYPE {name} {kind}'])
+            for labels, value in values:
+                lines.append(f'{name}{_labels(**labels)} {value}')
+
+        with self._lock:
+            histogram('cdk_callback_seconds', 'Server time of a Dash callback request.', self.seconds, ['callback'])
+            histogram('cdk_callback_stage_seconds', f"Time of the stages of a callback ('{DASH_STAGE}': outside of "
+                      'the stages, mostly output checks and JSON serialization by Dash).',
+                      self.stage_seconds, ['callback', 'stage'])
+            histogram('cdk_callback_response_bytes', 'Size of the JSON response of a callback.',
+                      self.response_bytes, ['callback'])
+            lines.extend(['# HELP cdk_callback_memory_delta_bytes Change of the resident memory of the process '
+                          'during a callback (other threads included).',
+                          '# TYPE cdk_callback_memory_delta_bytes summary'])
+            for callback, (total, count) in sorted(self.memory_delta.items()):
+                lines.append(f'cdk_callback_memory_delta_bytes_sum{_labels(callback=callback)} {total}')
+                lines.append(f'cdk_callback_memory_delta_bytes_count{_labels(callback=callback)} {count}')
+            simple('cdk_callback_errors_total', 'counter', 'Callbacks that raised an exception.',
+                   [({'callback': callback}, count) for callback, count in sorted(self.errors.items())])
+            simple('cdk_callback_profiles_total', 'counter', 'Profiles of slow callbacks written to CDK_PROFILE_DIR.',
+                   [({'callback': callback}, count) for callback, count in sorted(self.profiles.items())])
+
+        memory = resident_memory()
+        if memory is not None:
+            simple('cdk_process_resident_memory_bytes', 'gauge', 'Resident memory of the process.',
+                   [({'pid': os.getpid()}, memory)])
+        stats = [cache.stats() for cache in caches]
+        simple('cdk_cache_hits_total', 'counter', 'Figure cache hits.',
+               [({'namespace': item['namespace']}, item['hits']) for item in stats])
+        simple('cdk_cache_misses_total', 'counter', 'Figure cache misses.',
+               [({'namespace': item['namespace']}, item['misses']) for item in stats])
+        simple('cdk_cache_entries', 'gauge', 'Entries in the in-memory figure cache.',
+               [({'namespace': item['namespace']}, item['entries']) for item in stats])
+        return '\n'.join(lines) + '\n'
+
+
+class SlowProfiler:
+    """Profiles callbacks and keeps the profile of those slower than threshold_ms (one callback at a time).
+
+    cprofile writes a pstats file (python -m pstats, snakeviz), pyinstrument (optional, pip install pyinstrument)
+    a sampling profile as HTML.
+    """
+
+    def __init__(self, threshold_ms, directory, kind='cprofile'):
+        if kind not in ('cprofile', 'pyinstrument'):
+            raise ValueError(f"Unknown profiler '{kind}', expected 'cprofile' or 'pyinstrument'")
+        if kind == 'pyinstrument':
+            import pyinstrument  # noqa: F401, fehlt es, soll der Start scheitern und nicht der erste Request
+        self.threshold = threshold_ms / 1000
+        self.directory = directory
+        self.kind = kind
+        # cProfile kann nicht in mehreren Threads gleichzeitig laufen, parallele Requests bleiben ohne Profil
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self):
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            if self.kind == 'pyinstrument':
+                import pyinstrument
+                profiler = pyinstrument.Profiler()
+                profiler.start()
+            else:
+                profiler = cProfile.Profile()
+                profiler.enable()
+        except Exception:
+            self._lock.release()
+            raise
+        return profiler
+
+    def stop(self, profiler, callback, seconds):
+        """Stop profiler, write its profile if the callback took at least the threshold; the path or None."""
+        try:
+            if self.kind == 'pyinstrument':
+                profiler.stop()
+            else:
+                profiler.disable()
+            if seconds < self.threshold:
+                return None
+            name = f'{callback}-{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-{int(seconds * 1000)}ms'
+            path = os.path.join(self.directory, name + ('.html' if self.kind == 'pyinstrument' else '.prof'))
+            # Ein Profil, das sich nicht schreiben lässt, soll den Request nicht scheitern lassen
+            try:
+                if self.kind == 'pyinstrument':
+                    with open(path, 'w', encoding='utf-8') as file:
+                        file.write(profiler.output_html())
+                else:
+                    profiler.dump_stats(path)
+            except OSError:
+                return None
+            return path
+        finally:
+            self._lock.release()
+
+
+def instrumented(callback, func, metrics, profiler=None):
+    """Wrap a Dash callback function (the entry of app.callback_map, returns the JSON response)."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        trace = Trace()
+        token = _trace.set(trace)
+        memory = resident_memory()
+        running = profiler.start() if profiler is not None else None
+        response = None
+        error = True
+        start = time.perf_counter()
+        try:
+            response = func(*args, **kwargs)
+            error = False
+            return response
+        except PreventUpdate:
+            error = False
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            profile = profiler.stop(running, callback, seconds) if running is not None else None
+            _trace.reset(token)
+            after = resident_memory()
+            stages = trace.stages + [(DASH_STAGE, max(seconds - trace.covered, 0.0))]
+            memory_delta = after - memory if memory is not None and after is not None else None
+            metrics.observe(callback, seconds, stages, payload_size(response), memory_delta, error, profile is not None)
+
+    return wrapper
+
+
+def instrument(app, caches=()):
+    """Measure every server-side callback of app and serve the numbers (and caches) on /metrics.
+
+    Call it after the last app.callback; the callbacks mark their stages with span(). Slow callbacks are profiled
+    if config.PROFILE_SLOW_MS is set. Background callbacks are listed with BACKGROUND_SUFFIX and not profiled, their
+    requests only start and poll the job. The numbers are per process, behind gunicorn every worker has its own.
+    """
+    metrics = Metrics()
+    profiler = None
+    if config.PROFILE_SLOW_MS is not None:
+        profiler = SlowProfiler(config.PROFILE_SLOW_MS, config.PROFILE_DIR, config.PROFILER)
+    for entry in app.callback_map.values():
+        # Clientside-Callbacks haben keine Funktion auf dem Server
+        if 'callback' not in entry:
+            continue
+        name = entry['callback'].__name__
+        if entry.get('long'):
+            # Background-Callbacks: gemessen werden nur Start und Abfragen des Jobs, nicht der Job im eigenen Prozess
+            entry['callback'] = instrumented(name + BACKGROUND_SUFFIX, entry['callback'], metrics)
+        else:
+            entry['callback'] = instrumented(name, entry['callback'], metrics, profiler)
+
+    @app.server.route('/metrics')
+    def metrics_page():
+        return flask.Response(metrics.render(caches), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+    return metrics
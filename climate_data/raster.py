@@ -0,0 +1,228 @@
+import json
+import os
+import shutil
+import struct
+import threading
+import zlib
+
+import numpy as np
+import pyproj
+
+from climate_data import config, indices
+from climate_data.cube import CUBE_FILE
+
+STATISTICS = ('sum', 'mean', 'max')
+# Jahreskarten der Extremindizes (climate_data/indices.py), nur wenn data_wrangling/extreme_indices.py gelaufen ist
+INDEX_STATISTICS = tuple(index.lower() for index in indices.INDICES)
+META_FILE = 'raster.json'
+
+# ColorBrewer YlGnBu (plotly 'YlGnBu'), von wenig zu viel Niederschlag
+COLORS = np.array([
+    (255, 255, 217), (237, 248, 177), (199, 233, 180), (127, 205, 187), (65, 182, 196),
+    (29, 145, 192), (34, 94, 168), (37, 52, 148), (8, 29, 88),
+], dtype='float64')
+# Trends und Temperaturskalierung (climate_data/trends.py): ColorBrewer RdBu um die Mitte der Skala (0 mm bzw. etwa
+# die Clausius-Clapeyron-Rate), mehr Niederschlag blau bzw. eine Skalierung über CC rot
+DIVERGING_COLORS = np.array([
+    (178, 24, 43), (214, 96, 77), (244, 165, 130), (253, 219, 199), (247, 247, 247),
+    (209, 229, 240), (146, 197, 222), (67, 147, 195), (33, 102, 172),
+], dtype='float64')
+PALETTES = {'trend': DIVERGING_COLORS, 'cc_tmax': DIVERGING_COLORS[::-1], 'cc_tmin': DIVERGING_COLORS[::-1]}
+
+
+def colorscale(statistic=None):
+    """Plotly colorscale of the palette of statistic, for the colour bar next to the map."""
+    colors = PALETTES.get(statistic, COLORS)
+    return [[index / (len(colors) - 1), 'rgb({:.0f},{:.0f},{:.0f})'.format(*color)]
+            for index, color in enumerate(colors)]
+
+
+COLORSCALE = colorscale()
+
+# Das Agri4cast-Raster ist in ETRS89-LAEA regelmässig, die Karte (Mapbox) in Web-Mercator
+_TO_LAEA = pyproj.Transformer.from_crs('EPSG:4326', 'EPSG:3035', always_xy=True)
+
+
+def _mercator_y(latitude):
+    return np.log(np.tan(np.pi / 4 + np.radians(latitude) / 2))
+
+
+def _latitude(mercator_y):
+    return np.degrees(2 * np.arctan(np.exp(mercator_y)) - np.pi / 2)
+
+
+def grid_step(x, y, sample=256):
+    """Edge length of the grid cells: median distance to the nearest other cell centre (of a sample of cells)."""
+    index = np.unique(np.linspace(0, len(x) - 1, min(sample, len(x))).astype(int))
+    distance = np.hypot(x[index, None] - x[None, :], y[index, None] - y[None, :])
+    distance[distance < 1] = np.inf
+    return float(np.median(distance.min(axis=1)))
+
+
+def pixel_columns(cells, pixels_per_cell=config.RASTER_PIXELS_PER_CELL):
+    """Cube column of every pixel of a Web-Mercator image (-1 outside the grid) and the image corners (lon, lat).
+
+    Every pixel centre is projected to ETRS89-LAEA and rounded to the nearest grid node, so the pixels show the
+    square 25 km cells as they are, only distorted like the base map.
+    """
+    x, y = _TO_LAEA.transform(cells['LONGITUDE'].to_numpy(dtype='float64'),
+                              cells['LATITUDE'].to_numpy(dtype='float64'))
+    step = grid_step(x, y)
+    ix = np.rint((x - x[0]) / step).astype('int64')
+    iy = np.rint((y - y[0]) / step).astype('int64')
+    lattice = np.full((iy.max() - iy.min() + 1, ix.max() - ix.min() + 1), -1, dtype='int32')
+    lattice[iy - iy.min(), ix - ix.min()] = np.arange(len(x), dtype='int32')
+
+    # Ausdehnung aus den Ecken aller Zellen, in Grad bzw. Mercator-Einheiten
+    corners_x = np.concatenate([x - step / 2, x + step / 2, x - step / 2, x + step / 2])
+    corners_y = np.concatenate([y - step / 2, y - step / 2, y + step / 2, y + step / 2])
+    longitudes, latitudes = _TO_LAEA.transform(corners_x, corners_y, direction='INVERSE')
+    west, east = longitudes.min(), longitudes.max()
+    north, south = _mercator_y(latitudes.max()), _mercator_y(latitudes.min())
+
+    # Quadratische Pixel in Mercator, Pixelgrösse aus der Zellbreite in der Mitte des Gebiets
+    middle = np.radians(np.median(cells['LATITUDE'].to_numpy(dtype='float64')))
+    pixel = step / 6378137 / np.cos(middle) / pixels_per_cell
+    width = int(np.ceil(np.radians(east - west) / pixel))
+    height = int(np.ceil((north - south) / pixel))
+    east = west + np.degrees(width * pixel)
+    south = north - height * pixel
+
+    pixel_lon = west + np.degrees((np.arange(width) + 0.5) * pixel)
+    pixel_lat = _latitude(north - (np.arange(height) + 0.5) * pixel)
+    px, py = _TO_LAEA.transform(*np.meshgrid(pixel_lon, pixel_lat))
+    col = np.rint((px - x[0]) / step).astype('int64') - ix.min()
+    row = np.rint((py - y[0]) / step).astype('int64') - iy.min()
+    inside = (col >= 0) & (col < lattice.shape[1]) & (row >= 0) & (row < lattice.shape[0])
+    columns = np.full((height, width), -1, dtype='int32')
+    columns[inside] = lattice[row[inside], col[inside]]
+
+    top, bottom = float(_latitude(north)), float(_latitude(south))
+    coordinates = [[float(west), top], [float(east), top], [float(east), bottom], [float(west), bottom]]
+    return columns, coordinates
+
+
+def month_values(cube, year, month, statistic):
+    """Monthly 'sum' (mm), daily 'mean' (mm/day) or daily 'max' (mm) of every cube column, NaN without data."""
+    first = np.datetime64(f'{year}-{month:02d}', 'M')
+    block = cube.precipitation[cube.rows(first.astype('datetime64[D]'), (first + 1).astype('datetime64[D]') - 1)]
+    valid = ~np.isnan(block)
+    counts = valid.sum(axis=0)
+    if statistic == 'max':
+        values = np.max(block, axis=0, where=valid, initial=-np.inf).astype('float64')
+    else:
+        values = block.sum(axis=0, dtype='float64', where=valid)
+        if statistic == 'mean':
+            values = values / np.maximum(counts, 1)
+    return np.where(counts > 0, values, np.nan)
+
+
+def colorize(values, columns, maximum, minimum=0, colors=COLORS):
+    """RGBA pixels: values (per column) on colors from minimum to maximum, transparent where there is no value."""
+    pixel_values = np.where(columns >= 0, values[np.maximum(columns, 0)], np.nan)
+    scaled = np.clip((np.nan_to_num(pixel_values) - minimum) / (maximum - minimum), 0, 1) * (len(colors) - 1)
+    lower = np.minimum(scaled.astype(int), len(colors) - 2)
+    fraction = (scaled - lower)[..., None]
+    rgb = colors[lower] * (1 - fraction) + colors[lower + 1] * fraction
+    alpha = np.where(np.isnan(pixel_values), 0, 255)[..., None]
+    return np.concatenate([np.rint(rgb), alpha], axis=-1).astype('uint8')
+
+
+def encode_png(rgba):
+    """Minimal PNG encoder (8 bit RGBA, no filter), so no imaging library is needed."""
+    height, width = rgba.shape[:2]
+    raw = np.hstack([np.zeros((height, 1), dtype='uint8'), rgba.reshape(height, width * 4)]).tobytes()
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw, 9)) + chunk(b'IEND', b''))
+
+
+class RainRaster:
+    """Monthly precipitation maps of a RainCube as PNG overlays, rendered on first use and cached on disk.
+
+    The images are stretched by the map over coordinates (corners top left, top right, bottom right, bottom
+    left as [lon, lat]). Yearly maps of the extreme indices need their table (indices.load_indices), the
+    maps of trends and scaling their values per cube column (layers, trends.map_layers). The cache is cleared
+    when the cube or one of these tables was rebuilt.
+    """
+    __slots__ = ('cube', 'path', 'indices', 'layers', 'columns', 'coordinates', '_lock')
+
+    def __init__(self, cube, path, pixels_per_cell=config.RASTER_PIXELS_PER_CELL, index_table=None, layers=None):
+        self.cube = cube
+        self.path = path
+        self.indices = index_table
+        self.layers = layers or {}
+        self.columns, self.coordinates = pixel_columns(cube.cells, pixels_per_cell)
+        self._lock = threading.Lock()
+        self._check_cache(pixels_per_cell)
+
+    def _check_cache(self, pixels_per_cell):
+        cube_file = os.path.join(config.rain_cube_path(self.cube.name), CUBE_FILE)
+        sources = [config.extreme_indices_path(self.cube.name), config.precipitation_trends_path(self.cube.name),
+                   config.cc_scaling_path(self.cube.name)]
+        meta = {'cube_mtime': os.stat(cube_file).st_mtime_ns, 'shape': list(self.cube.precipitation.shape),
+                'pixels_per_cell': pixels_per_cell, 'maximum': config.RASTER_MAX, 'minimum': config.RASTER_MIN,
+                'sources': {os.path.basename(path): os.stat(path).st_mtime_ns if os.path.exists(path) else None
+                            for path in sources}}
+        meta_path = os.path.join(self.path, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path) as file:
+                if json.load(file) == meta:
+                    return
+            shutil.rmtree(self.path, ignore_errors=True)
+        os.makedirs(self.path, exist_ok=True)
+        with open(meta_path + f'.{os.getpid()}', 'w') as file:
+            json.dump(meta, file)
+        os.replace(meta_path + f'.{os.getpid()}', meta_path)
+
+    def png_path(self, year, month, statistic):
+        """Path of the PNG of one month and statistic ('sum', 'mean' or 'max'), rendered if it is not cached yet."""
+        if statistic not in STATISTICS:
+            raise ValueError(f"Unknown statistic '{statistic}', expected one of {STATISTICS}")
+        path = os.path.join(self.path, statistic, f'{int(year)}-{int(month):02d}.png')
+        return self._cached(path, lambda: month_values(self.cube, int(year), int(month), statistic), statistic)
+
+    def index_png_path(self, year, statistic):
+        """Path of the PNG of one extreme index (INDEX_STATISTICS) in one year, None without (matching) indices."""
+        if statistic not in INDEX_STATISTICS:
+            raise ValueError(f"Unknown index '{statistic}', expected one of {INDEX_STATISTICS}")
+        if self.indices is None:
+            return None
+        values = indices.year_values(self.indices, self.cube, int(year), statistic.upper())
+        if values is None:
+            return None
+        return self._cached(os.path.join(self.path, statistic, f'{int(year)}.png'), lambda: values, statistic)
+
+    def layer_png_path(self, statistic):
+        """Path of the PNG of a layer without year (trends.MAP_LAYERS), None if its values are missing."""
+        if statistic not in self.layers:
+            return None
+        return self._cached(os.path.join(self.path, 'layers', f'{statistic}.png'), lambda: self.layers[statistic],
+                            statistic)
+
+    def _cached(self, path, values, statistic):
+        if not os.path.exists(path):
+            with self._lock:
+                if not os.path.exists(path):
+                    self._write(path, self.render(values(), statistic))
+        return path
+
+    def render(self, values, statistic):
+        return encode_png(colorize(values, self.columns, config.RASTER_MAX[statistic],
+                                   config.RASTER_MIN.get(statistic, 0), PALETTES.get(statistic, COLORS)))
+
+    @staticmethod
+    def _write(path, png):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Andere Worker können dieselbe Karte gleichzeitig schreiben, daher über eine eigene Datei ersetzen
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}'
+        with open(tmp_path, 'wb') as file:
+            file.write(png)
+        os.replace(tmp_path, path)
+
+
+def open_raster(dataset, cube, index_table=None, layers=None):
+    return RainRaster(cube, config.rain_raster_path(dataset), index_table=index_table, layers=layers)
@@ -0,0 +1,290 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from climate_data import config, indices
+from climate_data.cube import TEMPERATURE_FILES
+
+# Jahreswerte mit Trend: Niederschlag der nassen Tage (ETCCDI PRCPTOT) und, falls berechnet, die Extremindizes
+PRCPTOT = 'PRCPTOT'
+TREND_COLUMNS = ['LEVEL', 'KEY', 'VARIABLE', 'N_YEARS', 'OLS_SLOPE', 'OLS_INTERCEPT', 'SEN_SLOPE', 'MK_S', 'MK_Z',
+                 'MK_P']
+SCALING_COLUMNS = ['LEVEL', 'KEY', 'TEMPERATURE', 'PERCENTILE', 'N_DAYS', 'N_CLASSES', 'RATE']
+
+# Temperaturklassen von LOWEST_TEMPERATURE an (kältere bzw. wärmere Tage in der ersten bzw. letzten Klasse),
+# eine Skalierungsrate braucht mindestens MIN_CLASSES Klassen mit genug Tagen
+LOWEST_TEMPERATURE = -30.0
+N_CLASSES = 40
+MIN_CLASSES = 3
+SORT_SCALE = 4096.0
+
+# Kartenlayer (climate_data/raster.py): Sen-Steigung von PRCPTOT in mm pro Jahrzehnt, Skalierung des höchsten
+# Perzentils aus config.CC_PERCENTILES mit der Tagesmaximum- bzw. Tagesminimumtemperatur in %/°C
+MAP_LAYERS = {'trend': None, 'cc_tmax': 'TEMPERATURE_MAX', 'cc_tmin': 'TEMPERATURE_MIN'}
+
+
+def masked_ols(x, y):
+    """Least-squares line over x [n] through the valid (not NaN) values of every column of y [n, m].
+
+    Solved for all columns at once from the normal equations; returns slope, intercept and the number of
+    values per column (slope NaN if there are fewer than two distinct x).
+    """
+    valid = ~np.isnan(y)
+    n = valid.sum(axis=0)
+    weights = valid / np.maximum(n, 1)
+    x_mean = x @ weights
+    y_mean = np.einsum('ij,ij->j', np.where(valid, y, 0), weights)
+    dx = np.where(valid, x[:, None] - x_mean, 0)
+    sxx = np.einsum('ij,ij->j', dx, dx)
+    sxy = np.einsum('ij,ij->j', dx, np.where(valid, y - y_mean, 0))
+    slope = np.where(sxx > 0, sxy / np.where(sxx > 0, sxx, 1), np.nan)
+    return slope, y_mean - slope * x_mean, n
+
+
+def column_median(values):
+    """Median of the valid values of every column (NaN without values), one sort for all columns."""
+    ordered = np.sort(values, axis=0)
+    counts = (~np.isnan(ordered)).sum(axis=0)
+    lower = np.take_along_axis(ordered, (np.maximum(counts - 1, 0) // 2)[None, :], axis=0)[0]
+    upper = np.take_along_axis(ordered, (counts // 2)[None, :], axis=0)[0]
+    return np.where(counts > 0, (lower + upper) / 2, np.nan)
+
+
+def sen_slope(x, y):
+    """Theil-Sen slope of every column of y over x: median of the slopes between all pairs of valid values."""
+    first, second = np.triu_indices(len(x), 1)
+    return column_median((y[second] - y[first]) / (x[second] - x[first])[:, None])
+
+
+def _two_sided_p(z):
+    # numpy hat keine Fehlerfunktion und scipy ist keine Abhängigkeit, math.erfc pro Wert
+    return np.frompyfunc(math.erfc, 1, 1)(np.abs(z) / math.sqrt(2)).astype('float64')
+
+
+def mann_kendall(y):
+    """Mann-Kendall test of every column of y [n, m] in time order: S, Z and the two-sided p-value.
+
+    Missing values are left out, the variance of S is corrected for ties (groups of equal values).
+    """
+    valid = ~np.isnan(y)
+    n = valid.sum(axis=0)
+    first, second = np.triu_indices(len(y), 1)
+    s = np.nansum(np.sign(y[second] - y[first]), axis=0)
+    # Eine Gruppe von t gleichen Werten zählt t(t-1)(2t+5), jeder ihrer Werte also (t-1)(2t+5)
+    ties = (y[:, None, :] == y[None, :, :]).sum(axis=1)
+    tie_term = np.where(valid, (ties - 1) * (2 * ties + 5), 0).sum(axis=0)
+    variance = (n * (n - 1) * (2 * n + 5) - tie_term) / 18
+    z = np.where(variance > 0, (s - np.sign(s)) / np.sqrt(np.where(variance > 0, variance, 1)), np.nan)
+    return s, z, _two_sided_p(z)
+
+
+def fit_trends(years, values):
+    """OLS, Sen's slope and Mann-Kendall of every column of values [year, column], slopes per year."""
+    ols_slope, ols_intercept, n_years = masked_ols(years.astype('float64'), values)
+    s, z, p = mann_kendall(values)
+    return {'N_YEARS': n_years, 'OLS_SLOPE': ols_slope, 'OLS_INTERCEPT': ols_intercept,
+            'SEN_SLOPE': sen_slope(years.astype('float64'), values), 'MK_S': s, 'MK_Z': z, 'MK_P': p}
+
+
+def class_centres():
+    return LOWEST_TEMPERATURE + (np.arange(N_CLASSES) + 0.5) * config.CC_BIN_WIDTH
+
+
+def binned_quantiles(precipitation, temperature, groups, n_groups, quantiles=config.CC_PERCENTILES):
+    """Quantiles of the wet-day precipitation per group of columns and temperature class.
+
+    precipitation and temperature are [day, column] blocks, groups the group of every column (-1: none).
+    All wet days are sorted once by (group, class, value), every quantile is then a position in the runs of
+    this order. Returns the wet days [group, class] and one [group, class] array per quantile (NaN for
+    classes with fewer than config.CC_MIN_DAYS days).
+    """
+    wet = (precipitation >= indices.WET_DAY) & ~np.isnan(temperature) & (groups >= 0)
+    values = precipitation[wet]
+    classes = np.clip(np.floor((temperature[wet] - LOWEST_TEMPERATURE) / config.CC_BIN_WIDTH), 0, N_CLASSES - 1)
+    keys = np.broadcast_to(groups, wet.shape)[wet] * N_CLASSES + classes.astype('int64')
+    # Schlüssel und Wert in einer Zahl (Werte < SORT_SCALE mm, exakt in float64): ein sort statt lexsort
+    combined = np.sort(keys * SORT_SCALE + np.minimum(values, SORT_SCALE - 1))
+    ordered = np.append(combined - np.floor(combined / SORT_SCALE) * SORT_SCALE, np.nan)
+    counts = np.bincount(keys, minlength=n_groups * N_CLASSES)
+    starts = np.cumsum(counts) - counts
+
+    result = []
+    for quantile in quantiles:
+        position = indices.quantile_position(counts, quantile)
+        lower = np.floor(position).astype('int64')
+        upper = np.minimum(lower + 1, np.maximum(counts - 1, 0))
+        low = ordered[np.minimum(starts + lower, len(ordered) - 1)]
+        high = ordered[np.minimum(starts + upper, len(ordered) - 1)]
+        value = np.where(counts >= config.CC_MIN_DAYS, low + (position - lower) * (high - low), np.nan)
+        result.append(value.reshape(n_groups, N_CLASSES))
+    return counts.reshape(n_groups, N_CLASSES), result
+
+
+def scaling_rate(quantile_values):
+    """Change of a quantile per °C in % for every group of quantile_values [group, class].
+
+    From the least-squares slope of its logarithm over the class centres (exponential scaling as in
+    Lenderink & van Meijgaard 2008), NaN with fewer than MIN_CLASSES classes.
+    """
+    slope, _, n_classes = masked_ols(class_centres(), np.log(quantile_values).T)
+    return np.where(n_classes >= MIN_CLASSES, 100 * np.expm1(slope), np.nan), n_classes
+
+
+def region_means(values, regions):
+    """Mean of the valid cells of every region (start, stop column range) per row of values [year, cell]."""
+    starts = np.array([start for start, _ in regions], dtype='int64')
+    stops = np.array([stop for _, stop in regions], dtype='int64')
+    sums = np.concatenate([np.zeros((len(values), 1)), np.cumsum(np.nan_to_num(values), axis=1)], axis=1)
+    counts = np.concatenate([np.zeros((len(values), 1)), np.cumsum(~np.isnan(values), axis=1)], axis=1)
+    n = counts[:, stops] - counts[:, starts]
+    return np.where(n > 0, (sums[:, stops] - sums[:, starts]) / np.maximum(n, 1), np.nan)
+
+
+def chunk_analysis(files, columns, regions, years, starts, index_values):
+    """Trends and temperature scaling of the cube columns (a slice) and of the regions inside them.
+
+    files: .npy path of 'PRECIPITATION' and of the temperatures in the cube, regions: (start, stop) relative
+    to the slice, index_values: [year, cell] array of the slice per extreme index. Runs in a worker process,
+    the arrays are opened there memory-mapped. Cells come first, then the regions.
+    """
+    precipitation = np.asarray(np.load(files['PRECIPITATION'], mmap_mode='r')[:, columns], dtype='float64')
+    n_cells = precipitation.shape[1]
+
+    # PRCPTOT pro Zelle und Jahr, Jahre mit zu vielen fehlenden Tagen fallen weg (wie bei den Extremindizes)
+    counts = np.add.reduceat(~np.isnan(precipitation), starts, axis=0, dtype='int32')
+    prcptot = np.add.reduceat(np.where(precipitation >= indices.WET_DAY, precipitation, 0), starts, axis=0)
+    days = np.diff(np.append(starts, len(precipitation)))
+    prcptot[days[:, None] - counts > config.EXTREME_MAX_MISSING_DAYS] = np.nan
+
+    trends = {}
+    for variable, values in {PRCPTOT: prcptot, **index_values}.items():
+        if regions:
+            values = np.concatenate([values, region_means(values, regions)], axis=1)
+        trends[variable] = fit_trends(years, values)
+
+    region_of = np.full(n_cells, -1, dtype='int64')
+    for region, (start, stop) in enumerate(regions):
+        region_of[start:stop] = region
+    scaling = {}
+    for variable, path in files.items():
+        if variable == 'PRECIPITATION':
+            continue
+        temperature = np.asarray(np.load(path, mmap_mode='r')[:, columns], dtype='float64')
+        cell_days, cell_values = binned_quantiles(precipitation, temperature, np.arange(n_cells), n_cells)
+        region_days, region_values = binned_quantiles(precipitation, temperature, region_of, len(regions))
+        for quantile, cell_quantile, region_quantile in zip(config.CC_PERCENTILES, cell_values, region_values):
+            rate, n_classes = scaling_rate(np.concatenate([cell_quantile, region_quantile]))
+            scaling[(variable, quantile)] = {
+                'N_DAYS': np.concatenate([cell_days, region_days]).sum(axis=1), 'N_CLASSES': n_classes, 'RATE': rate}
+    return trends, scaling
+
+
+def chunk_plan(cells, chunk_cells=indices.CHUNK_CELLS):
+    """Column slices of about chunk_cells cells that never split a NUTS region, with the regions in each slice.
+
+    Regions are contiguous column ranges of the cube; cells without a region belong to no region.
+    """
+    codes = cells['REGION_CODE'].to_numpy(dtype=object)
+    known = pd.notna(codes)
+    # Neuer Abschnitt bei jedem Wechsel des Codes, jede Zelle ohne Region ist ein eigener Abschnitt
+    new_run = np.ones(len(codes), dtype=bool)
+    new_run[1:] = (codes[1:] != codes[:-1]) | ~known[1:] | ~known[:-1]
+    run_starts = np.flatnonzero(new_run)
+    run_stops = np.append(run_starts[1:], len(codes))
+
+    plan = []
+    chunk_start = 0
+    regions = []
+    for start, stop in zip(run_starts, run_stops):
+        if start > chunk_start and stop - chunk_start > chunk_cells:
+            plan.append((slice(chunk_start, int(start)), regions))
+            chunk_start, regions = int(start), []
+        if known[start]:
+            regions.append((str(codes[start]), int(start) - chunk_start, int(stop) - chunk_start))
+    if len(codes) > chunk_start:
+        plan.append((slice(chunk_start, len(codes)), regions))
+    return plan
+
+
+def trend_analysis(cube, index_table=None, workers=None, chunk_cells=indices.CHUNK_CELLS):
+    """TREND_COLUMNS and SCALING_COLUMNS tables of every cube cell and NUTS region (LEVEL 'cell' or 'region').
+
+    Trends of PRCPTOT and of the extreme indices of index_table (if given), per year; scaling only if the cube
+    has temperatures. The column slices of chunk_plan are computed on a process pool of workers processes
+    (default: one per CPU, 1 computes in this process).
+    """
+    n_days, _ = cube.precipitation.shape
+    years, starts = indices.year_starts(cube.first_day, n_days)
+    files = {'PRECIPITATION': cube.precipitation.filename}
+    files.update({variable: os.path.join(cube.path, name) for variable, name in TEMPERATURE_FILES.items()
+                  if cube.temperature(variable) is not None})
+    matrices = {}
+    if index_table is not None:
+        matrices = {index: indices.index_matrix(index_table, cube, index) for index in indices.INDICES}
+        matrices = {index: matrix for index, matrix in matrices.items() if matrix is not None}
+
+    plan = chunk_plan(cube.cells, chunk_cells)
+    arguments = [(files, columns, [(start, stop) for _, start, stop in regions], years, starts,
+                  {index: matrix[:, columns] for index, matrix in matrices.items()})
+                 for columns, regions in plan]
+    workers = min(workers or os.cpu_count() or 1, len(plan))
+    if workers <= 1:
+        parts = [chunk_analysis(*argument) for argument in arguments]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parts = list(executor.map(chunk_analysis, *zip(*arguments)))
+
+    # Schlüssel in derselben Reihenfolge wie die Spalten der Teilergebnisse: erst Zellen, dann Regionen
+    cell_ids = cube.cells['CELL_ID'].astype(str).to_numpy()
+    keys = np.concatenate([np.concatenate([cell_ids[columns], [code for code, _, _ in regions]])
+                           for columns, regions in plan])
+    levels = np.concatenate([np.repeat(['cell', 'region'], [columns.stop - columns.start, len(regions)])
+                             for columns, regions in plan])
+
+    frames = []
+    for variable in parts[0][0]:
+        frame = pd.DataFrame({'LEVEL': levels, 'KEY': keys, 'VARIABLE': variable})
+        for column in TREND_COLUMNS[3:]:
+            frame[column] = np.concatenate([trends[variable][column] for trends, _ in parts])
+        frames.append(frame)
+    trend_table = pd.concat(frames, ignore_index=True)
+
+    frames = []
+    for variable, quantile in parts[0][1]:
+        frame = pd.DataFrame({'LEVEL': levels, 'KEY': keys, 'TEMPERATURE': variable, 'PERCENTILE': quantile})
+        for column in SCALING_COLUMNS[4:]:
+            frame[column] = np.concatenate([scaling[(variable, quantile)][column] for _, scaling in parts])
+        frames.append(frame)
+    scaling_table = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=SCALING_COLUMNS)
+    return trend_table, scaling_table
+
+
+def load_trends(dataset):
+    """Trend and scaling tables written by data_wrangling/precipitation_trends.py, None if not built."""
+    tables = []
+    for path in (config.precipitation_trends_path(dataset), config.cc_scaling_path(dataset)):
+        tables.append(pd.read_parquet(path) if os.path.exists(path) else None)
+    return tuple(tables)
+
+
+def map_layers(trend_table, scaling_table, cube):
+    """Values of the MAP_LAYERS in the column order of cube (NaN for cells without a result)."""
+    keys = cube.cells['CELL_ID'].astype(str)
+    layers = {}
+    for name, temperature in MAP_LAYERS.items():
+        if temperature is None and trend_table is not None:
+            rows = trend_table[(trend_table['LEVEL'] == 'cell') & (trend_table['VARIABLE'] == PRCPTOT)]
+            values = rows.set_index('KEY')['SEN_SLOPE'].reindex(keys) * 10
+        elif temperature is not None and scaling_table is not None:
+            rows = scaling_table[(scaling_table['LEVEL'] == 'cell') & (scaling_table['TEMPERATURE'] == temperature)
+                                 & (scaling_table['PERCENTILE'] == max(config.CC_PERCENTILES))]
+            if rows.empty:
+                continue
+            values = rows.set_index('KEY')['RATE'].reindex(keys)
+        else:
+            continue
+        layers[name] = values.to_numpy(dtype='float64')
+    return layers
@@ -0,0 +1,117 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+LOSSES_COLUMN = 'Losses (mln EUR, 2020)'
+MIN_MARKER_SIZE = 10
+
+# Wochentage in der Reihenfolge von Date.getUTCDay() in JavaScript, für das Wochenende der Resample-Regel ('W-MON')
+WEEKDAYS = ['SUN', 'MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT']
+
+
+def select_floods(floods, year, country=None):
+    mask = floods['Year'].to_numpy() == year
+    if country:
+        mask &= floods['Country name'].to_numpy() == country
+    return floods[mask]
+
+
+def marker_sizes(losses):
+    """A tenth of the losses (mln EUR), at least MIN_MARKER_SIZE; floods without known losses get the minimum."""
+    losses = np.nan_to_num(np.asarray(losses, dtype='float64'))
+    return np.maximum(MIN_MARKER_SIZE, losses / 10)
+
+
+def map_frame(floods):
+    """Columns the map needs: Name, Latitude, Longitude (float), marker_size (float) and ID/Code of the event."""
+    frame = pd.DataFrame({
+        'Name': floods['Name'],
+        'Latitude': floods['Latitude'].to_numpy(dtype='float64'),
+        'Longitude': floods['Longitude'].to_numpy(dtype='float64'),
+        'marker_size': marker_sizes(floods[LOSSES_COLUMN]),
+    }, index=floods.index)
+    # Für den Klick auf einen Marker (Detailansicht), Regionen ohne Code als ''
+    frame['ID'] = floods['ID'].to_numpy()
+    frame['Code'] = floods['Code'].astype(object).where(floods['Code'].notna(), '') if 'Code' in floods else ''
+    return frame
+
+
+def add_date_labels(floods):
+    """Format 'Start date'/'End date' once at startup instead of in every update_map call."""
+    floods['Start label'] = floods['Start date'].dt.strftime('%d.%m.%Y')
+    floods['End label'] = floods['End date'].dt.strftime('%d.%m.%Y')
+    return floods
+
+
+def _nullable(values):
+    # NaN ist kein gültiges JSON, fehlende Werte gehen als null an die DataTable (Anzeige über Format.nully)
+    return [None if value != value else value for value in values.tolist()]
+
+
+def flood_table_records(floods):
+    columns = {'location': floods['Name'].to_numpy(),
+               'Start date': floods['Start label'].to_numpy(),
+               'End date': floods['End label'].to_numpy()}
+    return [dict(zip(columns, row)) for row in zip(*(_nullable(values) for values in columns.values()))]
+
+
+def _same(a, b):
+    return (a == b) | (np.isnan(a) & np.isnan(b))
+
+
+def damage_table_records(floods, losses_id=LOSSES_COLUMN, fill_losses=None):
+    """One row per (Fatalities, losses) combination with the affected regions joined, values stay numeric."""
+    fatalities = floods['Fatalities'].to_numpy(dtype='float64')
+    losses = floods[LOSSES_COLUMN].to_numpy(dtype='float64')
+    if fill_losses is not None:
+        losses = np.where(np.isnan(losses), fill_losses, losses)
+    names = floods['Name'].fillna('').astype(str).to_numpy()
+    if len(names) == 0:
+        return []
+
+    # Nach (Fatalities, Verluste) sortieren (NaN zuletzt) und an den Schlüsselwechseln in Gruppen teilen
+    order = np.lexsort((losses, fatalities))
+    fatalities, losses, names = fatalities[order], losses[order], names[order]
+    starts = np.r_[0, np.flatnonzero(~(_same(fatalities[1:], fatalities[:-1]) & _same(losses[1:], losses[:-1]))) + 1]
+    ends = np.r_[starts[1:], len(names)]
+    return [{'location': ', '.join(names[start:end]), 'Fatalities': fatality, losses_id: loss}
+            for start, end, fatality, loss in zip(starts, ends, _nullable(fatalities[starts]), _nullable(losses[starts]))]
+
+
+def number_format(nully=''):
+    """DataTable format for the numeric columns: no decimals, ' as thousands separator."""
+    from dash.dash_table.Format import Format, Group, Scheme
+    return Format(precision=0, scheme=Scheme.fixed, group=Group.yes, groups=3, group_delimiter="'", nully=nully)
+
+
+def precipitation_chart(figure, labels, categories, colors, rolling=None):
+    """Data-independent part of the yearly precipitation chart that dashboard/assets/precipitation.js draws.
+
+    figure holds the layout (with its template), labels the y axis label, title and subtitle per timeframe
+    ('{year}' is filled in by the browser), categories the bar names without/with flood and rolling an optional
+    moving average {'window': n, 'trace': {...}}.
+    """
+    return {'layout': json.loads(figure.to_json())['layout'], 'labels': labels, 'categories': list(categories),
+            'colors': colors, 'rolling': rolling}
+
+
+def precipitation_store(daily, intervals, year, week_rule):
+    """Daily PRECIPITATION_SUM/N of one year and the floods around it, the dcc.Store behind the yearly chart.
+
+    Weeks and months are summed from it in the browser like in data_wrangling/rain_rollup.py, so changing the
+    timeframe needs no request.
+    """
+    # Wochen am Jahresende können erst im Januar des Folgejahres enden
+    first, last = np.datetime64(f'{year}-01-01'), np.datetime64(f'{year + 1}-01-07')
+    around = (intervals.ends >= first) & (intervals.starts <= last)
+    floods = [[str(start)[:10], str(end)[:10], str(intervals.names.get(event_id, event_id))]
+              for start, end, event_id in zip(intervals.starts[around], intervals.ends[around], intervals.ids[around])]
+    return {
+        'year': int(year),
+        'week_end': WEEKDAYS.index(week_rule.partition('-')[2] or 'SUN'),
+        'days': daily['DAY'].dt.strftime('%Y-%m-%d').tolist(),
+        'sums': daily['PRECIPITATION_SUM'].astype('float64').tolist(),
+        'counts': daily['N'].astype('int64').tolist(),
+        'floods': floods,
+    }
@@ -0,0 +1,104 @@
+// Jahresdiagramm des Niederschlags, im Browser gezeichnet (clientside_callback der Dashboards).
+// Der Server schickt pro Jahr/Land einmal die Tagessummen und Überschwemmungen (dcc.Store 'precipitation-data',
+// climate_data/views.py: precipitation_store); Wochen, Monate und der gleitende Durchschnitt werden hier berechnet,
+// ein Wechsel des Zeitrahmens braucht damit keinen Request.
+(function () {
+    var DAY_MS = 24 * 60 * 60 * 1000;
+
+    function isoDay(date) {
+        return date.toISOString().slice(0, 10);
+    }
+
+    // Label des Zeitraums wie bei pandas resample: Wochen enden am Tag week_end (0 = Sonntag), Monate am Monatsende
+    function periodEnd(day, timeframe, weekEnd) {
+        var date = new Date(day + 'T00:00:00Z');
+        if (timeframe === 'W') {
+            return isoDay(new Date(date.getTime() + ((weekEnd - date.getUTCDay() + 7) % 7) * DAY_MS));
+        }
+        if (timeframe === 'M') {
+            return isoDay(new Date(Date.UTC(date.getUTCFullYear(), date.getUTCMonth() + 1, 0)));
+        }
+        return day;
+    }
+
+    // Summe und Anzahl pro Zeitraum addieren (wie data_wrangling/rain_rollup.py), Mittel = Summe / Anzahl
+    function aggregate(data, timeframe) {
+        var days = [], sums = [], counts = [];
+        for (var i = 0; i < data.days.length; i++) {
+            var label = periodEnd(data.days[i], timeframe, data.week_end);
+            var last = days.length - 1;
+            if (last >= 0 && days[last] === label) {
+                sums[last] += data.sums[i];
+                counts[last] += data.counts[i];
+            } else {
+                days.push(label);
+                sums.push(data.sums[i]);
+                counts.push(data.counts[i]);
+            }
+        }
+        var means = sums.map(function (sum, j) { return counts[j] > 0 ? sum / counts[j] : null; });
+        return {days: days, means: means};
+    }
+
+    // Wie pandas rolling(window, min_periods=1).mean(): fehlende Werte zählen nicht
+    function rollingMean(values, window) {
+        return values.map(function (_, i) {
+            var sum = 0, n = 0;
+            for (var j = Math.max(0, i - window + 1); j <= i; j++) {
+                if (values[j] !== null) {
+                    sum += values[j];
+                    n += 1;
+                }
+            }
+            return n > 0 ? sum / n : null;
+        });
+    }
+
+    function figure(data, timeframe, chart) {
+        if (!data || !chart) {
+            return window.dash_clientside.no_update;
+        }
+        var series = aggregate(data, timeframe);
+        var labels = chart.labels[timeframe];
+        var fill = function (text) { return text.replace('{year}', data.year); };
+
+        // Ein Balken-Trace pro Kategorie in der Reihenfolge des ersten Auftretens, wie px.bar(color=...)
+        var traces = [], byCategory = {};
+        series.days.forEach(function (day, i) {
+            var events = data.floods.filter(function (flood) { return flood[0] <= day && day <= flood[1]; });
+            var category = chart.categories[events.length > 0 ? 1 : 0];
+            if (!(category in byCategory)) {
+                byCategory[category] = {
+                    type: 'bar', x: [], y: [], customdata: [], name: category, legendgroup: category,
+                    offsetgroup: category, alignmentgroup: 'True', orientation: 'v', showlegend: true,
+                    textposition: 'auto', xaxis: 'x', yaxis: 'y',
+                    marker: {color: chart.colors[category], pattern: {shape: ''}},
+                    hovertemplate: 'In_Flood_Period=' + category + '<br>DAY=%{x}<br>' + labels.y + '=%{y}<br>'
+                        + 'Ereignisse=%{customdata[0]}<extra></extra>'
+                };
+                traces.push(byCategory[category]);
+            }
+            var trace = byCategory[category];
+            trace.x.push(day);
+            trace.y.push(series.means[i]);
+            trace.customdata.push([events.map(function (flood) { return flood[2]; }).join('; ')]);
+        });
+
+        if (chart.rolling) {
+            traces.push(Object.assign({type: 'scatter', x: series.days,
+                                       y: rollingMean(series.means, chart.rolling.window)}, chart.rolling.trace));
+        }
+
+        var layout = JSON.parse(JSON.stringify(chart.layout));
+        layout.title = {text: fill(labels.title)};
+        layout.yaxis = Object.assign(layout.yaxis || {}, {title: {text: labels.y}});
+        if (layout.annotations && layout.annotations.length && labels.subtitle) {
+            layout.annotations[0].text = fill(labels.subtitle);
+        }
+        return {data: traces, layout: layout};
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        precipitation: {figure: figure}
+    });
+})();
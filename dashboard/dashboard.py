@@ -1,44 +1,47 @@
 import dash
+import flask
 from dash import dcc, html, dash_table
+from dash.dash_table.Format import Format
 import plotly.express as px
 import plotly.graph_objects as go
-import pandas as pd
-import numpy as np
-from dash.dependencies import Input, Output
+from dash.dependencies import ClientsideFunction, Input, Output, State
 import dash_bootstrap_components as dbc
+import os
+import sys
 
-# Load data
-flood_data = pd.read_csv('../data/generated/flood_data.csv', sep=',')
-rain_data = pd.read_csv('../data/generated/rain_data.csv', sep=',')
-regions_data = pd.read_csv('../data/generated/regions_ch.csv', sep=',')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from climate_data import config, profiling, views
+from climate_data.cache import FigureCache
+from climate_data.dataset import get_dataset
 
-# Print column names to verify them
-print("Flood Data Columns:", flood_data.columns)
-print("Rain Data Columns:", flood_data.columns)
-print("Regions Data Columns:", regions_data.columns)
+# Flood events and the precipitation rollup come from the shared read-only dataset (climate_data/dataset.py)
+dataset = get_dataset('ch')
+flood_data = dataset.flood_data
 
-# Display the first few rows of the flood_data
-print(flood_data.head())
+# Callback results only depend on (year, country, timeframe), so they are cached (see climate_data/cache.py)
+figure_cache = FigureCache.from_config('ch')
 
-# Convert 'DAY' column to datetime
-rain_data['DAY'] = pd.to_datetime(rain_data['DAY'], format='%d.%m.%Y')
+Y_LABELS = {'D': 'Niederschlag (mm/Tag)', 'W': 'Niederschlag (mm/Woche)', 'M': 'Niederschlag (mm/Monat)'}
 
-# Convert 'Start date' and 'End date' columns to datetime
-flood_data['Start date'] = pd.to_datetime(flood_data['Start date'], format='%d.%m.%Y')
-flood_data['End date'] = pd.to_datetime(flood_data['End date'], format='%d.%m.%Y')
 
-# Extract Latitude and Longitude from the 'regions' column in flood_data
-flood_data[['Latitude', 'Longitude']] = flood_data['regions'].str.strip('[]()').str.split(',', expand=True)
-flood_data['Latitude'] = flood_data['Latitude'].astype(float)
-flood_data['Longitude'] = flood_data['Longitude'].astype(float)
-
-# Extract Latitude and Longitude from the 'Coordinates' column in regions_data
-regions_data[['Latitude', 'Longitude']] = regions_data['Coordinates'].str.strip('[]()').str.split(',', expand=True)
-regions_data['Latitude'] = regions_data['Latitude'].astype(float)
-regions_data['Longitude'] = regions_data['Longitude'].astype(float)
+def precipitation_chart():
+    # Fixed part of the precipitation chart, the bars are drawn in the browser (assets/precipitation.js)
+    figure = go.Figure()
+    figure.update_layout(
+        plot_bgcolor='#FFFFFF',
+        paper_bgcolor='#fef3c7',
+        barmode='relative',
+        xaxis=dict(title='DAY', showgrid=True, gridcolor='grey'),
+        yaxis=dict(showgrid=True, gridcolor='grey'),
+        legend=dict(title_text='In_Flood_Period', tracegroupgap=0)
+    )
+    labels = {timeframe: {'y': y_label, 'title': f'{timeframe}-Niederschlag'} for timeframe, y_label in Y_LABELS.items()}
+    return views.precipitation_chart(
+        figure, labels,
+        categories=['Niederschläge', 'Überschwemmung'],
+        colors={'Überschwemmung': 'red', 'Niederschläge': '#000080'}  # Red for flood periods, navy blue otherwise
+    )
 
-# Merge flood_data with regions_data based on Latitude and Longitude
-flood_data = pd.merge(flood_data, regions_data, on=['Latitude', 'Longitude'], how='left', suffixes=('', '_region'))
 
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
 
@@ -99,8 +102,8 @@ app.layout = html.Div(
                         id='damage-table',
                         columns=[
                             {'name': 'Location', 'id': 'location'},
-                            {'name': 'Fatalities', 'id': 'Fatalities', 'type': 'numeric'},
-                            {'name': 'Losses (mln EUR, 2020)', 'id': 'Losses (mln EUR, 2020)', 'type': 'numeric'}
+                            {'name': 'Fatalities', 'id': 'Fatalities', 'type': 'numeric', 'format': Format(nully='None')},
+                            {'name': 'Losses (mln EUR, 2020)', 'id': 'Losses (mln EUR, 2020)', 'type': 'numeric', 'format': Format(nully='< 1 mln EUR')}
                         ],
                         style_table={'overflowX': 'auto', 'border': '1px solid black'},
                         style_cell={'textAlign': 'center', 'backgroundColor': '#fef3c7', 'color': 'black', 'border': '1px solid black'},
@@ -150,7 +153,11 @@ app.layout = html.Div(
                         )
                     ]),
                     dbc.Row(
-                        dbc.Col(dcc.Graph(id='precipitation-plot', style={'background-color': '#fef3c7', 'border-radius': '10px', 'padding': '10px'}), width=12),
+                        dbc.Col([
+                            dcc.Graph(id='precipitation-plot', style={'background-color': '#fef3c7', 'border-radius': '10px', 'padding': '10px'}),
+                            dcc.Store(id='precipitation-data'),  # Tageswerte des Jahres, Wochen/Monate rechnet der Browser
+                            dcc.Store(id='precipitation-chart', data=precipitation_chart())
+                        ], width=12),
                     )
                 ], width=6, lg=6)  # Grafen rechts
             ]),
@@ -178,13 +185,11 @@ app.layout = html.Div(
     Input('year-slider', 'value'),
     Input('country-dropdown', 'value')
 )
+@figure_cache.memoize
 def update_map(year, country):
-    # Filter data only by the selected year
-    filtered_data = flood_data[flood_data['Year'] == year]
-    
-    # Check if a country is selected and filter accordingly
-    if country:
-        filtered_data = filtered_data[filtered_data['Country name'] == country]
+    # Filter data by the selected year and, if selected, the country
+    with profiling.span('floods'):
+        filtered_data = dataset.floods(year, country)
     
     # Define map center and zoom level based on the selected country
     if country == 'Switzerland':
@@ -195,103 +200,90 @@ def update_map(year, country):
         map_center = {'lat': 50.1109, 'lon': 8.6821}
         zoom_level = 3 if not country else 6
     
-    # Replace NaN values in 'Losses (mln EUR, 2020)' with a placeholder for losses under 1 million EUR
-    filtered_data['Losses (mln EUR, 2020)'] = filtered_data['Losses (mln EUR, 2020)'].fillna('< 1 mln EUR')
-    
-    # Determine marker size based on losses
-    filtered_data['marker_size'] = filtered_data.apply(lambda row: max(10, row['Losses (mln EUR, 2020)'] / 10) if row['Losses (mln EUR, 2020)'] != '< 1 mln EUR' else 10, axis=1)
+    with profiling.span('figure'):
+        # Check if there is data to plot
+        if (filtered_data.empty) or ('Name' not in filtered_data.columns):
+            fig = go.Figure()
+            fig.update_layout(mapbox_style="carto-darkmatter")
+            fig.update_layout(margin={"r":0,"t":0,"l":0,"b":0})
+            fig.update_layout(mapbox=dict(center=map_center, zoom=zoom_level))
+            fig.add_annotation(
+                x=0.5, y=0.5, text="No data available for this selection",
+                showarrow=False, font=dict(size=20, color="white"),
+                xref="paper", yref="paper"
+            )
+            flood_table_data = []
+            damage_table_data = []
+        else:
+            # Marker size from the numeric losses; losses under 1 million EUR (NaN) are shown as '< 1 mln EUR' by the table format
+            map_data = views.map_frame(filtered_data)
 
-    # Check if there is data to plot
-    if (filtered_data.empty) or ('Name' not in filtered_data.columns):
-        fig = go.Figure()
-        fig.update_layout(mapbox_style="carto-darkmatter")
-        fig.update_layout(margin={"r":0,"t":0,"l":0,"b":0})
-        fig.update_layout(mapbox=dict(center=map_center, zoom=zoom_level))
-        fig.add_annotation(
-            x=0.5, y=0.5, text="No data available for this selection",
-            showarrow=False, font=dict(size=20, color="white"),
-            xref="paper", yref="paper"
-        )
-        flood_table_data = []
-        damage_table_data = []
-    else:
-        # Plot data if available
-        fig = px.scatter_mapbox(
-            filtered_data, 
-            lat="Latitude", 
-            lon="Longitude", 
-            hover_name="Name",  # Use the region name for hover info
-            size='marker_size' if country else None,  # Adjust size only if a country is selected
-            size_max=30,
-            color_discrete_sequence=["black"], 
-            zoom=zoom_level, 
-            height=500
-        )
-        # Remove latitude and longitude from hover data
-        fig.update_traces(marker=dict(opacity=0.5 if country else 1.0))  # Adjust opacity only if a country is selected
-        fig.update_traces(hovertemplate='<b>%{hovertext}</b>')
-        fig.update_layout(mapbox_style="carto-positron")
-        fig.update_layout(margin={"r":0,"t":0,"l":0,"b":0})
-        fig.update_layout(mapbox=dict(center=map_center, zoom=zoom_level))
-        
-        # Prepare flood table data
-        flood_table_data = filtered_data[['Name', 'Start date', 'End date']].copy()
-        flood_table_data['Start date'] = flood_table_data['Start date'].dt.strftime('%d.%m.%Y')
-        flood_table_data['End date'] = flood_table_data['End date'].dt.strftime('%d.%m.%Y')
-        flood_table_data = flood_table_data.rename(columns={'Name': 'location', 'Start date': 'Start date', 'End date': 'End date'}).to_dict('records')
+            # Plot data if available
+            fig = px.scatter_mapbox(
+                map_data, 
+                lat="Latitude", 
+                lon="Longitude", 
+                hover_name="Name",  # Use the region name for hover info
+                size='marker_size' if country else None,  # Adjust size only if a country is selected
+                size_max=30,
+                color_discrete_sequence=["black"], 
+                zoom=zoom_level, 
+                height=500
+            )
+            # Remove latitude and longitude from hover data
+            fig.update_traces(marker=dict(opacity=0.5 if country else 1.0))  # Adjust opacity only if a country is selected
+            fig.update_traces(hovertemplate='<b>%{hovertext}</b>')
+            fig.update_layout(mapbox_style="carto-positron")
+            fig.update_layout(margin={"r":0,"t":0,"l":0,"b":0})
+            fig.update_layout(mapbox=dict(center=map_center, zoom=zoom_level))
         
-        # Prepare damage table data
-        damage_data = filtered_data[['Name', 'Fatalities', 'Losses (mln EUR, 2020)']].copy()
-        damage_data['Fatalities'] = damage_data['Fatalities'].fillna('None')
-        damage_grouped = damage_data.groupby(['Fatalities', 'Losses (mln EUR, 2020)']).agg({'Name': ', '.join}).reset_index()
-        damage_grouped = damage_grouped.rename(columns={'Name': 'location'})
-        damage_table_data = damage_grouped.to_dict('records')
+            # Prepare table data
+            flood_table_data = views.flood_table_records(filtered_data)
+            damage_table_data = views.damage_table_records(filtered_data)
     
     return fig, flood_table_data, damage_table_data
 
 @app.callback(
+    Output('precipitation-data', 'data'),
+    Input('year-slider', 'value')
+)
+@figure_cache.memoize
+def update_chart_data(year):
+    # Daily sums come precomputed from the rollup (data_wrangling/rain_rollup.py), all floods are marked
+    with profiling.span('rollup'):
+        precip_sums = dataset.precip_sums(year)
+    with profiling.span('intervals'):
+        flood_intervals = dataset.flood_intervals()
+    with profiling.span('store'):
+        return views.precipitation_store(precip_sums, flood_intervals, year, config.TIMEFRAME_RULES['ch']['W'])
+
+
+app.clientside_callback(
+    ClientsideFunction(namespace='precipitation', function_name='figure'),
     Output('precipitation-plot', 'figure'),
-    Input('year-slider', 'value'),
-    Input('timeframe-dropdown', 'value')
+    Input('precipitation-data', 'data'),
+    Input('timeframe-dropdown', 'value'),
+    State('precipitation-chart', 'data')
 )
-def update_charts(year, timeframe):
-    filtered_data = rain_data[rain_data['DAY'].dt.year == year]
-    
-    if timeframe == 'D':
-        filtered_data = filtered_data.groupby('DAY').mean().reset_index()
-        y_label = 'Niederschlag (mm/Tag)'
-    elif timeframe == 'W':
-        filtered_data = filtered_data.resample('W-Mon', on='DAY').mean().reset_index()
-        y_label = 'Niederschlag (mm/Woche)'
-    elif timeframe == 'M':
-        filtered_data = filtered_data.resample('M', on='DAY').mean().reset_index()
-        y_label = 'Niederschlag (mm/Monat)'
 
-    # Add a column to indicate if the date falls within any flood event
-    flood_periods = flood_data[['Start date', 'End date']].dropna()
-    filtered_data['In_Flood_Period'] = filtered_data['DAY'].apply(lambda day: any((day >= start) and (day <= end) for start, end in zip(flood_periods['Start date'], flood_periods['End date'])))
 
-    # Map True/False to 'Überschwemmung'/'Niederschläge'
-    filtered_data['In_Flood_Period'] = filtered_data['In_Flood_Period'].map({True: 'Überschwemmung', False: 'Niederschläge'})
+def warm_cache():
+    # Pre-compute the default views (latest years, every timeframe, no country selected) before the first request
+    if config.CACHE_WARM_YEARS <= 0:
+        return
+    years = dataset.years()[-config.CACHE_WARM_YEARS:]
+    figure_cache.warm(update_map, [(year, None) for year in years])
+    figure_cache.warm(update_chart_data, [(year,) for year in years])
 
-    # Precipitation bar plot
-    precipitation_fig = px.bar(
-        filtered_data, 
-        x='DAY', 
-        y='PRECIPITATION', 
-        title=f'{timeframe}-Niederschlag', 
-        labels={'PRECIPITATION': y_label},  # Dynamische Achsenbeschriftung
-        color='In_Flood_Period',  # Color based on whether it's in a flood period
-        color_discrete_map={'Überschwemmung': 'red', 'Niederschläge': '#000080'}  # Red for flood periods, navy blue otherwise
-    )
-    precipitation_fig.update_layout(
-        plot_bgcolor='#FFFFFF', 
-        paper_bgcolor='#fef3c7',
-        xaxis=dict(showgrid=True, gridcolor='grey'),
-        yaxis=dict(showgrid=True, gridcolor='grey')
-    )
-    
-    return precipitation_fig
+
+@app.server.route('/cache-stats')
+def cache_stats():
+    return flask.jsonify(figure_cache.stats())
+
+
+# Timings, stages (profiling.span), payload sizes and memory of every callback on /metrics
+profiling.instrument(app, caches=[figure_cache])
+warm_cache()
 
 if __name__ == '__main__':
     app.run_server(debug=True)
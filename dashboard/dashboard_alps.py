@@ -1,218 +1,375 @@
 import dash
-from dash import dcc, html, dash_table
+import flask
+from dash import DiskcacheManager, ctx, dcc, html, dash_table
 import plotly.express as px
+import plotly.graph_objects as go
 import pandas as pd
-import geopandas as gpd
-from dash.dependencies import Input, Output
+from dash.dependencies import ClientsideFunction, Input, Output, State
+from dash.exceptions import MissingCallbackContextException
 import dash_bootstrap_components as dbc
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from climate_data import config, downsample, profiling, raster, views
+from climate_data.cache import FigureCache
+from climate_data.dataset import get_dataset
+
+# Flood events and the precipitation rollup come from the shared read-only dataset (climate_data/dataset.py)
+dataset = get_dataset('alps').load()
+flood_data = dataset.flood_data
+
+# Maximum number of bars (and line points) sent for the cumulative 1979-year chart
+CUMULATIVE_POINT_BUDGET = 2000
+
+# Callback results only depend on (year, country, timeframe), so they are cached (see climate_data/cache.py)
+figure_cache = FigureCache.from_config('alps')
+
+# The cumulative chart is a normal callback: from the rollup or the cube it takes about 110 ms, while a background
+# job adds a process start and polling every 500 ms (about 1.2 s per new job in the browser). With
+# CDK_BACKGROUND_JOBS=1 it runs as a job in its own process with a progress bar, for slow data paths. The data is
+# loaded above, before the job processes are forked; Dash caches the job results per server start.
+CUMULATIVE_STEPS = 4
+if config.BACKGROUND_JOBS:
+    # diskcache is only needed for the jobs (and CDK_CACHE_DIR), like in climate_data/cache.py
+    import diskcache
+    LAUNCH_ID = f'{os.getpid()}-{pd.Timestamp.now().value}'
+    background_manager = DiskcacheManager(diskcache.Cache(config.JOBS_DIR), cache_by=[lambda: LAUNCH_ID],
+                                          expire=3600)
+
+# Line of the 5-day moving average, in the yearly chart (drawn in the browser) and the cumulative chart
+MOVING_AVERAGE_TRACE = {
+    'mode': 'lines',
+    'line': {'color': '#800080', 'width': 2},
+    'name': 'Gleitender Durchschnitt (5 Tage)',
+    'hovertemplate': 'Gleitender Durchschnitt: %{y:.2f} mm<extra></extra>'
+}
+
+# Monthly precipitation maps below the flood markers (climate_data/raster.py), colour scale 0..config.RASTER_MAX
+RASTER_LABELS = {'sum': 'Monatssumme (mm)', 'mean': 'Tagesmittel (mm/Tag)', 'max': 'Tagesmaximum (mm/Tag)'}
+# Yearly maps of the extreme indices (climate_data/indices.py), offered once data_wrangling/extreme_indices.py has run
+INDEX_LABELS = {
+    'rx1day': 'Rx1day: grösster Tagesniederschlag (mm)',
+    'rx5day': 'Rx5day: grösste 5-Tages-Summe (mm)',
+    'r95p': 'R95p: Niederschlag an sehr nassen Tagen (mm)',
+    'r20mm': 'R20mm: Tage mit mindestens 20 mm',
+}
+# Maps without year from data_wrangling/precipitation_trends.py (climate_data/trends.py): Sen's slope of the yearly
+# precipitation and scaling of the 99th percentile of wet days with temperature, the Clausius-Clapeyron rate is ~7 %/°C
+TREND_LABELS = {
+    'trend': 'Trend Jahresniederschlag (Sen, mm/Jahrzehnt)',
+    'cc_tmax': 'Skalierung P99 mit Tagesmaximum (%/°C)',
+    'cc_tmin': 'Skalierung P99 mit Tagesminimum (%/°C)',
+}
+TREND_SOURCES = {'trend': config.precipitation_trends_path, 'cc_tmax': config.cc_scaling_path,
+                 'cc_tmin': config.cc_scaling_path}
+MONTHS = ['Januar', 'Februar', 'März', 'April', 'Mai', 'Juni', 'Juli', 'August', 'September', 'Oktober',
+          'November', 'Dezember']
+
+EVENT_HINT = "Klicken Sie auf eine Überschwemmung in der Karte, um den Niederschlag in der betroffenen Region zu sehen."
+
+
+@figure_cache.memoize
+def event_figure(event_id, code):
+    # Niederschlag über den Zellen der angeklickten Region, von einigen Tagen vorher bis zum Ende der Überschwemmung
+    with profiling.span('event_precipitation'):
+        event_data = dataset.event_precipitation(event_id, code)
+    event_data['Kategorie'] = event_data['IN_EVENT'].map({True: 'Niederschläge während Überschwemmungen',
+                                                          False: 'Niederschläge davor'})
+    figure = px.bar(
+        event_data,
+        x='DAY',
+        y='PRECIPITATION',
+        color='Kategorie',
+        labels={'DAY': 'Tag', 'PRECIPITATION': 'Niederschlag (mm/Tag)', 'Kategorie': 'Niederschlagskategorien'},
+        color_discrete_map={'Niederschläge während Überschwemmungen': '#E69F00', 'Niederschläge davor': '#56B4E9'}
+    )
+    figure.update_layout(plot_bgcolor='#FFFFFF', paper_bgcolor='#fef3c7', margin={'t': 30},
+                         xaxis=dict(showgrid=True, gridcolor='grey'), yaxis=dict(showgrid=True, gridcolor='grey'))
+    if event_id is None:
+        return figure, EVENT_HINT
+
+    event = flood_data[(flood_data['ID'] == event_id)
+                       & (flood_data['Code'].astype(object).fillna('') == code)].iloc[:1]
+    during = event_data.loc[event_data['IN_EVENT'], 'PRECIPITATION'].sum()
+    before = event_data.loc[~event_data['IN_EVENT'], 'PRECIPITATION'].sum()
+    title = (f"{event['Name'].iloc[0] if len(event) else code}, {event['Start label'].iloc[0] if len(event) else ''}"
+             f" – {event['End label'].iloc[0] if len(event) else ''}: {during:.0f} mm während der Überschwemmung, "
+             f"{before:.0f} mm in den {(~event_data['IN_EVENT']).sum()} Tagen davor")
+    return figure, title
+
+
+def chart_labels(year, timeframe):
+    if timeframe == 'D':
+        y_label = 'Niederschlag (mm/Tag)'
+        title = 'Tägliche Niederschläge'
+        subtitle = f"Niederschlagsdaten für das Jahr {year}"
+    elif timeframe == 'W':
+        y_label = 'Niederschlag (mm/Woche)'
+        title = 'Wöchentliche Niederschläge'
+        subtitle = f"Wöchentliche Niederschlagsdaten für das Jahr {year}"
+    elif timeframe == 'M':
+        y_label = 'Niederschlag (mm/Monat)'
+        title = 'Monatliche Niederschläge'
+        subtitle = f"Monatliche Niederschlagsdaten für das Jahr {year}"
+    return y_label, title, subtitle
 
-# Load data
-flood_data = pd.read_csv('../data/generated/flood_data_fixed.csv', sep=',')
-rain_data = pd.read_csv('../data/generated/rain_data_alps.csv', sep=',')
-regions_data = pd.read_csv('../data/generated/regionswithcords.csv', sep=',')
-
-# Load country boundaries using geopandas
-countries = gpd.read_file(gpd.datasets.get_path('naturalearth_lowres'))
-
-
-# Function to parse dates with multiple formats
-def parse_dates(date_series, formats):
-    for fmt in formats:
-        try:
-            parsed_dates = pd.to_datetime(date_series, format=fmt, errors='coerce', dayfirst=True)
-            if parsed_dates.notna().all():
-                return parsed_dates
-        except (ValueError, TypeError):
-            continue
-    return pd.to_datetime(date_series, errors='coerce', dayfirst=True)  # Fallback to default parsing
-
-
-# Parse 'Start date' and 'End date' columns in flood_data with multiple formats
-flood_data['Start date'] = parse_dates(flood_data['Start date'], ['%d.%m.%Y', '%Y-%m-%d'])
-flood_data['End date'] = parse_dates(flood_data['End date'], ['%d.%m.%Y', '%Y-%m-%d'])
-
-# Parse 'DAY' column in rain_data with mixed formats
-rain_data['DAY'] = parse_dates(rain_data['DAY'], ['%d.%m.%Y', '%Y-%m-%d', '%Y%m%d'])
-
-# Extract Latitude and Longitude from the 'regions' column in flood_data
-flood_data[['Latitude', 'Longitude']] = flood_data['regions'].str.strip('[]()').str.split(',', expand=True)
-flood_data['Latitude'] = flood_data['Latitude'].astype(float)
-flood_data['Longitude'] = flood_data['Longitude'].astype(float)
 
-# Extract Latitude and Longitude from the 'Coordinates' column in regions_data
-regions_data[['Latitude', 'Longitude']] = regions_data['Coordinates'].str.strip('[]()').str.split(',', expand=True)
-regions_data['Latitude'] = regions_data['Latitude'].astype(float)
-regions_data['Longitude'] = regions_data['Longitude'].astype(float)
+def precipitation_chart():
+    # Everything of the yearly chart that does not depend on the data. The bars are drawn in the browser
+    # (assets/precipitation.js), so switching the timeframe does not need the server.
+    figure = go.Figure()
+    figure.update_layout(
+        plot_bgcolor='#FFFFFF',
+        paper_bgcolor='#fef3c7',
+        barmode='relative',
+        xaxis=dict(title='DAY', showgrid=True, gridcolor='grey'),
+        yaxis=dict(showgrid=True, gridcolor='grey'),
+        legend=dict(title_text='Niederschlagskategorien', tracegroupgap=0),
+        annotations=[dict(
+            xref='paper',
+            yref='paper',
+            x=0.5,
+            y=1.1,
+            xanchor='center',
+            yanchor='top',
+            text='',
+            showarrow=False,
+            font=dict(size=14)
+        )]
+    )
+    labels = {timeframe: dict(zip(['y', 'title', 'subtitle'], chart_labels('{year}', timeframe)))
+              for timeframe in ['D', 'W', 'M']}
+    return views.precipitation_chart(
+        figure, labels,
+        categories=['Niederschläge', 'Niederschläge während Überschwemmungen'],
+        colors={'Niederschläge während Überschwemmungen': '#E69F00', 'Niederschläge': '#56B4E9'},
+        rolling={'window': 5, 'trace': MOVING_AVERAGE_TRACE}
+    )
 
-# Merge flood_data with regions_data based on Latitude and Longitude
-flood_data = pd.merge(flood_data, regions_data, on=['Latitude', 'Longitude'], how='left', suffixes=('', '_region'))
 
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
 
-app.layout = html.Div(
-    style={'position': 'relative', 'height': '100vh', 'width': '100vw', 'overflow': 'hidden',
-           'background-color': 'gray'},
-    children=[
-        dbc.Container([
-            dbc.Row([
-                dbc.Col(html.H1("Dashboard über Niederschläge und Überschwemmungen",
-                                className="text-center mt-3", style={'color': '#fef3c7'}), width=12),
-                dbc.Col(html.H3("Klimadaten Challenge 2024", className="text-center text-muted",
-                                style={'color': '#fef3c7'}), width=12),
-                dbc.Col(html.H4("Benjamin, Boran und Murat", className="text-center text-muted mb-4",
-                                style={'color': '#fef3c7'}), width=12)
-            ]),
-            dbc.Row([
-                dbc.Col(html.P(
-                    "Willkommen zu unserem Dashboard, das die Auswirkungen der Klimakrise auf die Hochwassergefahr untersucht. "
-                    "Hier finden Sie interaktive Visualisierungen von Niederschlagsdaten und Hochwasserschäden der Alpenräume in Europa.",
-                    className="text-center mt-3", style={'color': '#fef3c7'}
-                ), width=12),
-                dbc.Col(html.P(
-                    "Verwenden Sie die Dropdown-Menüs und den Schieberegler, um die Daten nach Jahr, Land und Zeitraum zu filtern. "
-                    "Die Karten und Diagramme werden entsprechend Ihrer Auswahl aktualisiert.",
-                    className="text-center mt-3", style={'color': '#fef3c7'}
-                ), width=12)
-            ]),
-            dbc.Row([
-                dbc.Col([
-                    dcc.Dropdown(
-                        id='country-dropdown',
-                        options=[],
-                        value=None,  # No default value
-                        clearable=True,
-                        placeholder="Select a country",
-                        style={'background-color': '#fef3c7'}
-                    ),
-                ], width=6),
-                dbc.Col([
-                    dcc.Dropdown(
-                        id='timeframe-dropdown',
-                        options=[
-                            {'label': 'Täglich', 'value': 'D'},
-                            {'label': 'Wöchentlich', 'value': 'W'},
-                            {'label': 'Monatlich', 'value': 'M'}
-                        ],
-                        value='D',  # Standardwert
-                        clearable=False,
-                        style={'background-color': '#fef3c7'}
-                    ),
-                ], width=6)
-            ]),
-            dbc.Row([
-                dbc.Col(
-                    dcc.Slider(
-                        id='year-slider',
-                        min=flood_data['Year'].min(),
-                        max=flood_data['Year'].max(),
-                        value=flood_data['Year'].max(),
-                        marks={str(year): {'label': str(year),
-                                           'style': {'transform': 'rotate(45deg)', 'white-space': 'nowrap',
-                                                     'color': '#fef3c7'}} for year in flood_data['Year'].unique()},
-                        step=None
-                    ),
-                    width=12, style={'margin-top': '20px', 'margin-bottom': '20px'}),
-            ]),
-            dbc.Row([
-                dbc.Col(dcc.Graph(id='precipitation-plot',
-                                  style={'background-color': '#fef3c7', 'border-radius': '10px', 'padding': '10px',
-                                         'height': '60vh'}), width=12),
-            ]),
-            dbc.Row([
-                dbc.Col(
-                    html.Div(
-                        dcc.Graph(id='cumulative-precipitation-plot',
-                                  style={'background-color': '#fef3c7', 'border-radius': '10px', 'padding': '10px',
-                                         'height': '60vh', 'width': '800vw', 'display': 'inline-block'}),
-                        style={'overflowX': 'scroll', 'width': '100%'}
+def statistic_options():
+    # Indizes und Trends nur, wenn pipeline.py sie schon erzeugt hat; wird bei jedem Seitenaufruf neu geprüft
+    return ([{'label': label, 'value': statistic} for statistic, label in RASTER_LABELS.items()]
+            + [{'label': label, 'value': statistic} for statistic, label in INDEX_LABELS.items()
+               if os.path.exists(config.extreme_indices_path(dataset.name))]
+            + [{'label': label, 'value': statistic} for statistic, label in TREND_LABELS.items()
+               if os.path.exists(TREND_SOURCES[statistic](dataset.name))])
+
+
+def serve_layout():
+    return html.Div(
+        style={'position': 'relative', 'height': '100vh', 'width': '100vw', 'overflow': 'hidden',
+               'background-color': 'gray'},
+        children=[
+            dbc.Container([
+                dbc.Row([
+                    dbc.Col(html.H1("Dashboard über Niederschläge und Überschwemmungen",
+                                    className="text-center mt-3", style={'color': '#fef3c7'}), width=12),
+                    dbc.Col(html.H3("Klimadaten Challenge 2024", className="text-center text-muted",
+                                    style={'color': '#fef3c7'}), width=12),
+                    dbc.Col(html.H4("Benjamin, Boran und Murat", className="text-center text-muted mb-4",
+                                    style={'color': '#fef3c7'}), width=12)
+                ]),
+                dbc.Row([
+                    dbc.Col(html.P(
+                        "Willkommen zu unserem Dashboard, das die Auswirkungen der Klimakrise auf die Hochwassergefahr untersucht. "
+                        "Hier finden Sie interaktive Visualisierungen von Niederschlagsdaten und Hochwasserschäden der Alpenräume in Europa.",
+                        className="text-center mt-3", style={'color': '#fef3c7'}
                     ), width=12),
-            ]),
-            dbc.Row([
-                dbc.Col(dcc.Graph(id='map-plot',
+                    dbc.Col(html.P(
+                        "Verwenden Sie die Dropdown-Menüs und den Schieberegler, um die Daten nach Jahr, Land und Zeitraum zu filtern. "
+                        "Die Karten und Diagramme werden entsprechend Ihrer Auswahl aktualisiert.",
+                        className="text-center mt-3", style={'color': '#fef3c7'}
+                    ), width=12)
+                ]),
+                dbc.Row([
+                    dbc.Col([
+                        dcc.Dropdown(
+                            id='country-dropdown',
+                            options=[],
+                            value=None,  # No default value
+                            clearable=True,
+                            placeholder="Select a country",
+                            style={'background-color': '#fef3c7'}
+                        ),
+                    ], width=6),
+                    dbc.Col([
+                        dcc.Dropdown(
+                            id='timeframe-dropdown',
+                            options=[
+                                {'label': 'Täglich', 'value': 'D'},
+                                {'label': 'Wöchentlich', 'value': 'W'},
+                                {'label': 'Monatlich', 'value': 'M'}
+                            ],
+                            value='D',  # Standardwert
+                            clearable=False,
+                            style={'background-color': '#fef3c7'}
+                        ),
+                    ], width=6)
+                ]),
+                dbc.Row([
+                    dbc.Col(
+                        dcc.Slider(
+                            id='year-slider',
+                            min=flood_data['Year'].min(),
+                            max=flood_data['Year'].max(),
+                            value=flood_data['Year'].max(),
+                            marks={str(year): {'label': str(year),
+                                               'style': {'transform': 'rotate(45deg)', 'white-space': 'nowrap',
+                                                         'color': '#fef3c7'}} for year in flood_data['Year'].unique()},
+                            step=None
+                        ),
+                        width=12, style={'margin-top': '20px', 'margin-bottom': '20px'}),
+                ]),
+                dbc.Row([
+                    dbc.Col([
+                        dcc.Graph(id='precipitation-plot',
                                   style={'background-color': '#fef3c7', 'border-radius': '10px', 'padding': '10px',
-                                         'height': '60vh'}), width=12),
-            ]),
-            dbc.Row([
-                dbc.Col([
-                    html.H5("Überschwemmungen", style={'color': '#fef3c7'}),
-                    dash_table.DataTable(
-                        id='flood-table',
-                        columns=[
-                            {'name': 'Location', 'id': 'location'},
-                            {'name': 'Start Date', 'id': 'Start date'},
-                            {'name': 'End Date', 'id': 'End date'}
-                        ],
-                        style_table={'overflowX': 'auto', 'border': '1px solid black'},
-                        style_cell={'textAlign': 'left', 'backgroundColor': '#fef3c7', 'color': 'black',
-                                    'border': '1px solid black'},
-                        style_header={'backgroundColor': '#fef3c7', 'border': '1px solid black'},
-                        style_data={'backgroundColor': '#fef3c7', 'border': '1px solid black'},
-                        style_as_list_view=True
-                    ),
-                ], width=6),
-                dbc.Col([
-                    html.H5("Schäden und Verluste", style={'color': '#fef3c7'}),
-                    dash_table.DataTable(
-                        id='damage-table',
-                        columns=[
-                            {'name': 'Location', 'id': 'location'},
-                            {'name': 'Fatalities', 'id': 'Fatalities', 'type': 'numeric'},
-                            {'name': 'Losses (EUR, 2020)', 'id': 'Losses (EUR, 2020)', 'type': 'numeric'}
-                        ],
-                        style_table={'overflowX': 'auto', 'border': '1px solid black'},
-                        style_cell={'textAlign': 'center', 'backgroundColor': '#fef3c7', 'color': 'black',
-                                    'border': '1px solid black'},
-                        style_header={'backgroundColor': '#fef3c7', 'border': '1px solid black'},
-                        style_data_conditional=[
-                            {'if': {'column_id': 'Fatalities'}, 'textAlign': 'center'},
-                            {'if': {'column_id': 'Losses (EUR, 2020)'}, 'textAlign': 'center'},
-                            {'if': {'column_id': 'location'}, 'border-left': '1px solid black',
-                             'border-right': '1px solid black'},
-                            {'if': {'column_id': 'Fatalities'}, 'border-left': '1px solid black',
-                             'border-right': '1px solid black'},
-                            {'if': {'column_id': 'Losses (EUR, 2020)'}, 'border-left': '1px solid black',
-                             'border-right': '1px solid black'}
-                        ],
-                        style_header_conditional=[
-                            {'if': {'column_id': 'location'}, 'border-left': '1px solid black',
-                             'border-right': '1px solid black'},
-                            {'if': {'column_id': 'Fatalities'}, 'border-left': '1px solid black',
-                             'border-right': '1px solid black'},
-                            {'if': {'column_id': 'Losses (EUR, 2020)'}, 'border-left': '1px solid black',
-                             'border-right': '1px solid black'}
-                        ]
-                    )
-                ], width=6)
-            ]),
-            dbc.Row([
-                dbc.Col(
-                    html.Div(
-                        [
-                            html.H6("Quellen:", style={'color': '#fef3c7'}),
-                            html.A("Natural Hazards Europe", href="https://naturalhazards.eu/", target="_blank",
-                                   style={'color': '#fef3c7'}),
-                            html.Br(),
-                            html.A("European Commission Authentication Service",
-                                   href="https://ecas.ec.europa.eu/cas/login?loginRequestId=ECAS_LR-22393326-Lssax9p7FwCWzIt1zx7JwFBWmUqNZEJaTzzfKZNbKRV0rVaStudi9zdBPQsZ7Xkw58VlITEgaf8rpeXfGnUHvXZ-yntOf97TTHqxVxzLXeLDP6-Jb1Kl6AzMyAzXYuaIzmyg5uCkZSpbzezx2Big1GzIcQetJDGTrumP0hQcm7SdYfHO8ao5HDpjJDY6zsTrcbCXrN8",
-                                   target="_blank", style={'color': '#fef3c7'})
-                        ],
-                        className="text-center mt-3"
+                                         'height': '60vh'}),
+                        # Daily series of the selected year (server) and the fixed chart layout, drawn in the browser
+                        dcc.Store(id='precipitation-data'),
+                        dcc.Store(id='precipitation-chart', data=precipitation_chart()),
+                    ], width=12),
+                ]),
+                dbc.Row([
+                    dbc.Col([
+                        html.Div(id='cumulative-status', style={'color': '#fef3c7'}),
+                        dbc.Progress(id='cumulative-progress', value=0, max=CUMULATIVE_STEPS, striped=True,
+                                     animated=True, style={'visibility': 'hidden'}),
+                    ], width=12),
+                ]),
+                dbc.Row([
+                    dbc.Col(
+                        html.Div(
+                            dcc.Graph(id='cumulative-precipitation-plot',
+                                      style={'background-color': '#fef3c7', 'border-radius': '10px', 'padding': '10px',
+                                             'height': '60vh', 'width': '800vw', 'display': 'inline-block'}),
+                            style={'overflowX': 'scroll', 'width': '100%'}
+                        ), width=12),
+                ]),
+                dbc.Row([
+                    dbc.Col([
+                        dcc.Dropdown(
+                            id='raster-statistic',
+                            options=statistic_options(),
+                            value=None,
+                            clearable=True,
+                            placeholder="Niederschlagskarte",
+                            style={'background-color': '#fef3c7'}
+                        ),
+                    ], width=6),
+                    dbc.Col([
+                        dcc.Dropdown(
+                            id='raster-month',
+                            options=[{'label': name, 'value': month} for month, name in enumerate(MONTHS, start=1)],
+                            value=1,
+                            clearable=False,
+                            style={'background-color': '#fef3c7'}
+                        ),
+                    ], width=6)
+                ], style={'margin-bottom': '10px'}),
+                dbc.Row([
+                    dbc.Col(dcc.Graph(id='map-plot',
+                                      style={'background-color': '#fef3c7', 'border-radius': '10px', 'padding': '10px',
+                                             'height': '60vh'}), width=12),
+                ]),
+                dbc.Row([
+                    dbc.Col([
+                        html.H5(EVENT_HINT, id='event-title', style={'color': '#fef3c7', 'margin-top': '10px'}),
+                        dcc.Graph(id='event-precipitation-plot',
+                                  style={'background-color': '#fef3c7', 'border-radius': '10px', 'padding': '10px',
+                                         'height': '40vh'}),
+                    ], width=12),
+                ]),
+                dbc.Row([
+                    dbc.Col([
+                        html.H5("Überschwemmungen", style={'color': '#fef3c7'}),
+                        dash_table.DataTable(
+                            id='flood-table',
+                            columns=[
+                                {'name': 'Location', 'id': 'location'},
+                                {'name': 'Start Date', 'id': 'Start date'},
+                                {'name': 'End Date', 'id': 'End date'}
+                            ],
+                            style_table={'overflowX': 'auto', 'border': '1px solid black'},
+                            style_cell={'textAlign': 'left', 'backgroundColor': '#fef3c7', 'color': 'black',
+                                        'border': '1px solid black'},
+                            style_header={'backgroundColor': '#fef3c7', 'border': '1px solid black'},
+                            style_data={'backgroundColor': '#fef3c7', 'border': '1px solid black'},
+                            style_as_list_view=True
+                        ),
+                    ], width=6),
+                    dbc.Col([
+                        html.H5("Schäden und Verluste", style={'color': '#fef3c7'}),
+                        dash_table.DataTable(
+                            id='damage-table',
+                            columns=[
+                                {'name': 'Location', 'id': 'location'},
+                                {'name': 'Fatalities', 'id': 'Fatalities', 'type': 'numeric',
+                                 'format': views.number_format(nully='None')},
+                                {'name': 'Losses (EUR, 2020)', 'id': 'Losses (EUR, 2020)', 'type': 'numeric',
+                                 'format': views.number_format()}
+                            ],
+                            style_table={'overflowX': 'auto', 'border': '1px solid black'},
+                            style_cell={'textAlign': 'center', 'backgroundColor': '#fef3c7', 'color': 'black',
+                                        'border': '1px solid black'},
+                            style_header={'backgroundColor': '#fef3c7', 'border': '1px solid black'},
+                            style_data_conditional=[
+                                {'if': {'column_id': 'Fatalities'}, 'textAlign': 'center'},
+                                {'if': {'column_id': 'Losses (EUR, 2020)'}, 'textAlign': 'center'},
+                                {'if': {'column_id': 'location'}, 'border-left': '1px solid black',
+                                 'border-right': '1px solid black'},
+                                {'if': {'column_id': 'Fatalities'}, 'border-left': '1px solid black',
+                                 'border-right': '1px solid black'},
+                                {'if': {'column_id': 'Losses (EUR, 2020)'}, 'border-left': '1px solid black',
+                                 'border-right': '1px solid black'}
+                            ],
+                            style_header_conditional=[
+                                {'if': {'column_id': 'location'}, 'border-left': '1px solid black',
+                                 'border-right': '1px solid black'},
+                                {'if': {'column_id': 'Fatalities'}, 'border-left': '1px solid black',
+                                 'border-right': '1px solid black'},
+                                {'if': {'column_id': 'Losses (EUR, 2020)'}, 'border-left': '1px solid black',
+                                 'border-right': '1px solid black'}
+                            ]
+                        )
+                    ], width=6)
+                ]),
+                dbc.Row([
+                    dbc.Col(
+                        html.Div(
+                            [
+                                html.H6("Quellen:", style={'color': '#fef3c7'}),
+                                html.A("Natural Hazards Europe", href="https://naturalhazards.eu/", target="_blank",
+                                       style={'color': '#fef3c7'}),
+                                html.Br(),
+                                html.A("European Commission Authentication Service",
+                                       href="https://ecas.ec.europa.eu/cas/login?loginRequestId=ECAS_LR-22393326-Lssax9p7FwCWzIt1zx7JwFBWmUqNZEJaTzzfKZNbKRV0rVaStudi9zdBPQsZ7Xkw58VlITEgaf8rpeXfGnUHvXZ-yntOf97TTHqxVxzLXeLDP6-Jb1Kl6AzMyAzXYuaIzmyg5uCkZSpbzezx2Big1GzIcQetJDGTrumP0hQcm7SdYfHO8ao5HDpjJDY6zsTrcbCXrN8",
+                                       target="_blank", style={'color': '#fef3c7'})
+                            ],
+                            className="text-center mt-3"
+                        )
                     )
-                )
-            ])
-        ], fluid=True, style={'height': '90vh', 'overflowY': 'auto'})
-    ]
-)
+                ])
+            ], fluid=True, style={'height': '90vh', 'overflowY': 'auto'})
+        ]
+    )
+
+
+# A function, so each page load sees the artifacts built since the server started (preload_app=True in gunicorn)
+app.layout = serve_layout
 
 
 @app.callback(
     Output('country-dropdown', 'options'),
     Input('year-slider', 'value')
 )
+@figure_cache.memoize
 def update_country_options(selected_year):
-    filtered_data = flood_data[flood_data['Year'] == selected_year]
-    countries = filtered_data['Country name'].unique()
-    return [{'label': country, 'value': country} for country in countries]
+    return [{'label': country, 'value': country} for country in dataset.countries(selected_year)]
 
 
 @app.callback(
@@ -220,15 +377,15 @@ def update_country_options(selected_year):
     Output('flood-table', 'data'),
     Output('damage-table', 'data'),
     Input('year-slider', 'value'),
-    Input('country-dropdown', 'value')
+    Input('country-dropdown', 'value'),
+    Input('raster-statistic', 'value'),
+    Input('raster-month', 'value')
 )
-def update_map(year, country):
-    # Filter data only by the selected year
-    filtered_data = flood_data[flood_data['Year'] == year]
-
-    # Check if a country is selected and filter accordingly
-    if country:
-        filtered_data = filtered_data[filtered_data['Country name'] == country]
+@figure_cache.memoize
+def update_map(year, country, statistic=None, month=None):
+    # Filter data by the selected year and, if selected, the country
+    with profiling.span('floods'):
+        filtered_data = dataset.floods(year, country)
 
     # Define map center and zoom level based on the selected country
     country_centers = {
@@ -254,184 +411,269 @@ def update_map(year, country):
     map_center = country_centers.get(country, {'lat': 50.1109, 'lon': 8.6821})
     zoom_level = country_zoom_levels.get(country, 3)
 
-    # Replace NaN values in 'Losses (mln EUR, 2020)' with 0 for losses under 1 million EUR
-    filtered_data['Losses (EUR, 2020)'] = filtered_data['Losses (mln EUR, 2020)'].fillna(0)
-
-    # Determine marker size based on losses
-    filtered_data['marker_size'] = filtered_data.apply(
-        lambda row: max(10, row['Losses (EUR, 2020)'] / 10) if row['Losses (EUR, 2020)'] != 0 else 10, axis=1)
-
-    # Plot data if available, otherwise show a message
-    fig = px.scatter_mapbox(
-        filtered_data,
-        lat="Latitude",
-        lon="Longitude",
-        hover_name="Name",  # Use the region name for hover info
-        size='marker_size' if country else None,  # Adjust size only if a country is selected
-        size_max=30,
-        color_discrete_sequence=["black"],
-        zoom=zoom_level,
-        height=500
-    )
-    fig.update_traces(marker=dict(opacity=0.5 if country else 1.0))  # Adjust opacity only if a country is selected
-    fig.update_traces(hovertemplate='<b>%{hovertext}</b>')
-    fig.update_layout(mapbox_style="carto-positron")
-    fig.update_layout(margin={"r": 0, "t": 0, "l": 0, "b": 0})
-    fig.update_layout(mapbox=dict(center=map_center, zoom=zoom_level))
-
-    # Prepare flood table data
-    flood_table_data = filtered_data[['Name', 'Start date', 'End date']].copy()
-    flood_table_data['Start date'] = flood_table_data['Start date'].dt.strftime('%d.%m.%Y')
-    flood_table_data['End date'] = flood_table_data['End date'].dt.strftime('%d.%m.%Y')
-    flood_table_data = flood_table_data.rename(
-        columns={'Name': 'location', 'Start date': 'Start date', 'End date': 'End date'}).to_dict('records')
-
-    # Prepare damage table data
-    damage_data = filtered_data[['Name', 'Fatalities', 'Losses (EUR, 2020)']].copy()
-    damage_data['Fatalities'] = damage_data['Fatalities'].fillna('None')
-    damage_data['Losses (EUR, 2020)'] = damage_data['Losses (EUR, 2020)'].apply(
-        lambda x: '{:,.0f}'.format(x).replace(',', "'") if isinstance(x, (int, float)) else x)
-    damage_data['Name'] = damage_data['Name'].fillna('').astype(str)
-    damage_grouped = damage_data.groupby(['Fatalities', 'Losses (EUR, 2020)']).agg({'Name': ', '.join}).reset_index()
-    damage_grouped = damage_grouped.rename(columns={'Name': 'location'})
-    damage_table_data = damage_grouped.to_dict('records')
+    with profiling.span('figure'):
+        # Marker size from the losses, computed on the numeric column (climate_data/views.py)
+        map_data = views.map_frame(filtered_data)
+
+        # Plot data if available, otherwise show a message
+        fig = px.scatter_mapbox(
+            map_data,
+            lat="Latitude",
+            lon="Longitude",
+            hover_name="Name",  # Use the region name for hover info
+            custom_data=['ID', 'Code'],  # Identifies the event for the drill-down panel
+            size='marker_size' if country else None,  # Adjust size only if a country is selected
+            size_max=30,
+            color_discrete_sequence=["black"],
+            zoom=zoom_level,
+            height=500
+        )
+        fig.update_traces(marker=dict(opacity=0.5 if country else 1.0))  # Adjust opacity only if a country is selected
+        fig.update_traces(hovertemplate='<b>%{hovertext}</b>')
+        fig.update_layout(mapbox_style="carto-positron")
+        fig.update_layout(margin={"r": 0, "t": 0, "l": 0, "b": 0})
+        fig.update_layout(mapbox=dict(center=map_center, zoom=zoom_level))
+
+        # The precipitation field is a PNG of a few kB (raster_image), not one point per grid cell;
+        # the extreme indices are yearly, trends and scaling cover all years, the month is ignored for them
+        rain_raster = dataset.raster()
+        if statistic in TREND_LABELS:
+            source = f'/raster/{statistic}.png'
+        elif statistic in INDEX_LABELS:
+            source = f'/raster/{statistic}/{year}.png'
+        else:
+            source = f'/raster/{statistic}/{year}/{month}.png'
+        if statistic and month and rain_raster is not None:
+            fig.update_layout(mapbox_layers=[{
+                'sourcetype': 'image',
+                'source': app.get_relative_path(source),
+                'coordinates': rain_raster.coordinates,
+                'opacity': 0.7,
+                'below': 'traces'
+            }])
+            fig.add_trace(raster_colorbar(statistic))
+
+    # Prepare table data; losses under 1 million EUR (NaN) count as 0 as before
+    with profiling.span('tables'):
+        flood_table_data = views.flood_table_records(filtered_data)
+        damage_table_data = views.damage_table_records(filtered_data, losses_id='Losses (EUR, 2020)',
+                                                       fill_losses=0)
 
     return fig, flood_table_data, damage_table_data
 
 
+def raster_colorbar(statistic):
+    # Trace without points, only shows the colour scale of the precipitation map
+    return go.Scattermapbox(
+        lat=[None], lon=[None], mode='markers', hoverinfo='skip', showlegend=False,
+        marker=dict(color=[0], cmin=config.RASTER_MIN.get(statistic, 0), cmax=config.RASTER_MAX[statistic],
+                    colorscale=raster.colorscale(statistic), showscale=True,
+                    colorbar=dict(title={**RASTER_LABELS, **INDEX_LABELS, **TREND_LABELS}[statistic],
+                                  bgcolor='#fef3c7'))
+    )
+
+
+@app.server.route('/raster/<statistic>/<int:year>/<int:month>.png')
+def raster_image(statistic, year, month):
+    # Rendered once from the rain cube and cached on disk, the browser caches it like any image
+    rain_raster = dataset.raster()
+    if rain_raster is None or statistic not in RASTER_LABELS or not 1 <= month <= 12:
+        return flask.Response(status=404)
+    return flask.send_file(rain_raster.png_path(year, month, statistic), mimetype='image/png', max_age=86400)
+
+
+@app.server.route('/raster/<statistic>/<int:year>.png')
+def index_image(statistic, year):
+    rain_raster = dataset.raster()
+    path = None
+    if rain_raster is not None and statistic in INDEX_LABELS:
+        path = rain_raster.index_png_path(year, statistic)
+    if path is None:
+        return flask.Response(status=404)
+    return flask.send_file(path, mimetype='image/png', max_age=86400)
+
+
+@app.server.route('/raster/<statistic>.png')
+def trend_image(statistic):
+    rain_raster = dataset.raster()
+    path = None
+    if rain_raster is not None and statistic in TREND_LABELS:
+        path = rain_raster.layer_png_path(statistic)
+    if path is None:
+        return flask.Response(status=404)
+    return flask.send_file(path, mimetype='image/png', max_age=86400)
+
+
 @app.callback(
-    Output('precipitation-plot', 'figure'),
-    Output('cumulative-precipitation-plot', 'figure'),
-    Input('year-slider', 'value'),
-    Input('timeframe-dropdown', 'value'),
-    Input('country-dropdown', 'value')
+    Output('event-precipitation-plot', 'figure'),
+    Output('event-title', 'children'),
+    Input('map-plot', 'clickData')
 )
-def update_charts(year, timeframe, country):
-    filtered_data = rain_data[rain_data['DAY'].dt.year == year]
-    cumulative_data = rain_data[(rain_data['DAY'].dt.year >= 1979) & (rain_data['DAY'].dt.year <= year)]
-
-    # Falls ein Land ausgewählt wurde, filtern Sie die Daten nach diesem Land
-    if country:
-        selected_country = countries[countries['name'] == country]
-        gdf = gpd.GeoDataFrame(
-            filtered_data, geometry=gpd.points_from_xy(filtered_data.LONGITUDE, filtered_data.LATITUDE))
-        filtered_data = gpd.sjoin(gdf, selected_country, how="inner", op='within')
-        filtered_data = pd.DataFrame(filtered_data.drop(columns=['geometry', 'index_right']))
-
-        gdf_cumulative = gpd.GeoDataFrame(
-            cumulative_data, geometry=gpd.points_from_xy(cumulative_data.LONGITUDE, cumulative_data.LATITUDE))
-        cumulative_data = gpd.sjoin(gdf_cumulative, selected_country, how="inner", op='within')
-        cumulative_data = pd.DataFrame(cumulative_data.drop(columns=['geometry', 'index_right']))
-
-    # Berechnung von Mittelwerten für Niederschlag, gruppiert nach dem gewünschten Zeitrahmen
-    if timeframe == 'D':
-        filtered_data = filtered_data.groupby('DAY').mean(numeric_only=True).reset_index()
-        cumulative_data = cumulative_data.groupby('DAY').mean(numeric_only=True).reset_index()
-        y_label = 'Niederschlag (mm/Tag)'
-        title = 'Tägliche Niederschläge'
-        subtitle = f"Niederschlagsdaten für das Jahr {year}"
-    elif timeframe == 'W':
-        filtered_data = filtered_data.resample('W', on='DAY').mean(numeric_only=True).reset_index()
-        cumulative_data = cumulative_data.resample('W', on='DAY').mean(numeric_only=True).reset_index()
-        y_label = 'Niederschlag (mm/Woche)'
-        title = 'Wöchentliche Niederschläge'
-        subtitle = f"Wöchentliche Niederschlagsdaten für das Jahr {year}"
-    elif timeframe == 'M':
-        filtered_data = filtered_data.resample('M', on='DAY').mean(numeric_only=True).reset_index()
-        cumulative_data = cumulative_data.resample('M', on='DAY').mean(numeric_only=True).reset_index()
-        y_label = 'Niederschlag (mm/Monat)'
-        title = 'Monatliche Niederschläge'
-        subtitle = f"Monatliche Niederschlagsdaten für das Jahr {year}"
+def update_event_panel(click_data):
+    if not click_data:
+        return event_figure(None, None)
+    event_id, code = click_data['points'][0]['customdata'][:2]
+    return event_figure(event_id, code)
+
 
-    # Add a column to indicate if the date falls within any flood event
-    if country:
-        flood_periods = flood_data[(flood_data['Year'] == year) & (flood_data['Country name'] == country)][
-            ['Start date', 'End date']].dropna()
-    else:
-        flood_periods = flood_data[flood_data['Year'] == year][['Start date', 'End date']].dropna()
+def triggered_id():
+    # Callbacks are also called directly (benchmarks), where no callback context exists
+    try:
+        return ctx.triggered_id
+    except MissingCallbackContextException:
+        return None
 
-    filtered_data['In_Flood_Period'] = filtered_data['DAY'].apply(lambda day: any(
-        (day >= start) and (day <= end) for start, end in zip(flood_periods['Start date'], flood_periods['End date'])))
-    cumulative_data['In_Flood_Period'] = cumulative_data['DAY'].apply(lambda day: any(
-        (day >= start) and (day <= end) for start, end in zip(flood_periods['Start date'], flood_periods['End date'])))
 
+def tag_flood_periods(data, year, country):
+    # Add a column to indicate if the date falls within any flood event, and which events cover it
+    flood_intervals = dataset.flood_intervals(year, country)
+
+    data['In_Flood_Period'] = flood_intervals.contains(data['DAY'])
+    data['Flood_Events'] = flood_intervals.describe(data['DAY'])
+    return data
+
+
+def flood_period_labels(in_flood_period):
     # Map True/False to 'Niederschläge während Überschwemmungen'/'Niederschläge'
-    filtered_data['In_Flood_Period'] = filtered_data['In_Flood_Period'].map(
-        {True: 'Niederschläge während Überschwemmungen', False: 'Niederschläge'})
-    cumulative_data['In_Flood_Period'] = cumulative_data['In_Flood_Period'].map(
-        {True: 'Niederschläge während Überschwemmungen', False: 'Niederschläge'})
-
-    # Precipitation bar plot for selected year
-    precipitation_fig = px.bar(
-        filtered_data,
-        x='DAY',
-        y='PRECIPITATION',
-        title=title,
-        labels={'PRECIPITATION': y_label},
-        color='In_Flood_Period',
-        color_discrete_map={'Niederschläge während Überschwemmungen': '#E69F00', 'Niederschläge': '#56B4E9'}
-    )
+    return in_flood_period.map({True: 'Niederschläge während Überschwemmungen', False: 'Niederschläge'})
 
-    # Add moving average as a line
-    precipitation_fig.add_trace({
-        'x': filtered_data['DAY'],
-        'y': filtered_data['PRECIPITATION'].rolling(window=5, min_periods=1).mean(),
-        'mode': 'lines',
-        'line': {'color': '#800080', 'width': 2},
-        'name': 'Gleitender Durchschnitt (5 Tage)',
-        'hovertemplate': 'Gleitender Durchschnitt: %{y:.2f} mm<extra></extra>'
-    })
-
-    precipitation_fig.update_layout(
-        plot_bgcolor='#FFFFFF',
-        paper_bgcolor='#fef3c7',
-        xaxis=dict(showgrid=True, gridcolor='grey'),
-        yaxis=dict(showgrid=True, gridcolor='grey'),
-        legend_title_text='Niederschlagskategorien',
-        annotations=[dict(
-            xref='paper',
-            yref='paper',
-            x=0.5,
-            y=1.1,
-            xanchor='center',
-            yanchor='top',
-            text=subtitle,
-            showarrow=False,
-            font=dict(size=14)
-        )]
+
+@app.callback(
+    Output('precipitation-data', 'data'),
+    Input('year-slider', 'value'),
+    Input('country-dropdown', 'value')
+)
+@figure_cache.memoize
+def update_chart_data(year, country):
+    # Daily sums per country come precomputed from the rollup (data_wrangling/rain_rollup.py). They are sent once
+    # per year and country, weeks, months and the moving average are computed in the browser.
+    with profiling.span('rollup'):
+        precip_sums = dataset.precip_sums(year, country)
+    with profiling.span('intervals'):
+        flood_intervals = dataset.flood_intervals(year, country)
+    with profiling.span('store'):
+        return views.precipitation_store(precip_sums, flood_intervals, year, config.TIMEFRAME_RULES['alps']['W'])
+
+
+app.clientside_callback(
+    ClientsideFunction(namespace='precipitation', function_name='figure'),
+    Output('precipitation-plot', 'figure'),
+    Input('precipitation-data', 'data'),
+    Input('timeframe-dropdown', 'value'),
+    State('precipitation-chart', 'data')
+)
+
+
+CUMULATIVE_INPUTS = [
+    Input('year-slider', 'value'),
+    Input('timeframe-dropdown', 'value'),
+    Input('country-dropdown', 'value'),
+    Input('cumulative-precipitation-plot', 'relayoutData'),
+]
+
+
+def update_cumulative_chart(year, timeframe, country, relayout_data, set_progress=None):
+    visible = downsample.visible_range(relayout_data) if triggered_id() == 'cumulative-precipitation-plot' else None
+    if set_progress is None:
+        return cumulative_figure(year, timeframe, country, visible)
+    # In a job process the in-memory cache is lost with the process, only a shared disk cache (CDK_CACHE_DIR) helps
+    figure_function = cumulative_figure if config.CACHE_DIR else cumulative_figure.uncached
+    figure = figure_function(year, timeframe, country, visible, progress=set_progress)
+    set_progress((CUMULATIVE_STEPS, ''))
+    return figure
+
+
+if config.BACKGROUND_JOBS:
+    @app.callback(
+        Output('cumulative-precipitation-plot', 'figure'),
+        *CUMULATIVE_INPUTS,
+        background=True,
+        manager=background_manager,
+        interval=500,
+        progress=[Output('cumulative-progress', 'value'), Output('cumulative-status', 'children')],
+        running=[(Output('cumulative-progress', 'style'), {'visibility': 'visible'}, {'visibility': 'hidden'})]
     )
+    def update_cumulative_chart_job(set_progress, year, timeframe, country, relayout_data):
+        # A running job is terminated by Dash as soon as the same callback is triggered again (slider moved),
+        # the single-year chart above is a normal callback and does not wait for this one
+        return update_cumulative_chart(year, timeframe, country, relayout_data, set_progress)
+else:
+    app.callback(Output('cumulative-precipitation-plot', 'figure'), *CUMULATIVE_INPUTS)(update_cumulative_chart)
+
+
+@figure_cache.memoize
+def cumulative_figure(year, timeframe, country, visible, progress=None):
+    def report(step, text):
+        if progress is not None:
+            progress((step, text))
+
+    report(0, f"Niederschlag 1979-{year} wird geladen …")
+    cumulative_data = dataset.precip_range(1979, year, country, timeframe)
+    y_label, _, _ = chart_labels(year, timeframe)
+
+    report(1, f"{len(cumulative_data)} Werte geladen, Überschwemmungen werden markiert …")
+    cumulative_data = tag_flood_periods(cumulative_data, year, country)
+    cumulative_data['Rolling_Mean'] = cumulative_data['PRECIPITATION'].rolling(window=5, min_periods=1).mean()
+
+    if visible:
+        cumulative_data = cumulative_data[cumulative_data['DAY'].between(*visible)]
+
+    # Send at most CUMULATIVE_POINT_BUDGET bars/line points to the browser, days in flood periods are always kept
+    report(2, f"{len(cumulative_data)} Werte werden ausgedünnt …")
+    bars = downsample.downsample(cumulative_data, 'DAY', 'PRECIPITATION', CUMULATIVE_POINT_BUDGET,
+                                 keep=cumulative_data['In_Flood_Period'])
+    line = downsample.downsample(cumulative_data, 'DAY', 'Rolling_Mean', CUMULATIVE_POINT_BUDGET)
+    bars = bars.assign(In_Flood_Period=flood_period_labels(bars['In_Flood_Period']))
+
+    report(3, "Diagramm wird erstellt …")
 
     # Cumulative precipitation bar plot
     cumulative_precipitation_fig = px.bar(
-        cumulative_data,
+        bars,
         x='DAY',
         y='PRECIPITATION',
         title=f'Niederschlag (1979-{year})',
-        labels={'PRECIPITATION': y_label},
+        labels={'PRECIPITATION': y_label, 'Flood_Events': 'Ereignisse'},
         color='In_Flood_Period',
+        hover_data={'Flood_Events': True},
         color_discrete_map={'Niederschläge während Überschwemmungen': '#E69F00', 'Niederschläge': '#56B4E9'}
     )
 
     # Add moving average as a line
-    cumulative_precipitation_fig.add_trace({
-        'x': cumulative_data['DAY'],
-        'y': cumulative_data['PRECIPITATION'].rolling(window=5, min_periods=1).mean(),
-        'mode': 'lines',
-        'line': {'color': '#800080', 'width': 2},
-        'name': 'Gleitender Durchschnitt (5 Tage)',
-        'hovertemplate': 'Gleitender Durchschnitt: %{y:.2f} mm<extra></extra>'
-    })
+    cumulative_precipitation_fig.add_trace({'x': line['DAY'], 'y': line['Rolling_Mean'], **MOVING_AVERAGE_TRACE})
 
     cumulative_precipitation_fig.update_layout(
         plot_bgcolor='#FFFFFF',
         paper_bgcolor='#fef3c7',
         xaxis=dict(showgrid=True, gridcolor='grey'),
         yaxis=dict(showgrid=True, gridcolor='grey'),
-        legend_title_text='Niederschlagskategorien'
+        legend_title_text='Niederschlagskategorien',
+        uirevision=f'{year}-{timeframe}-{country}'
     )
 
-    return precipitation_fig, cumulative_precipitation_fig
+    return cumulative_precipitation_fig
+
+
+def warm_cache():
+    # Pre-compute the default views (latest years, every timeframe, no country selected) before the first request
+    if config.CACHE_WARM_YEARS <= 0:
+        return
+    years = dataset.years()[-config.CACHE_WARM_YEARS:]
+    figure_cache.warm(update_country_options, [(year,) for year in years])
+    figure_cache.warm(update_map, [(year, None, None, 1) for year in years])
+    figure_cache.warm(update_chart_data, [(year, None) for year in years])
+    if not config.BACKGROUND_JOBS or config.CACHE_DIR:
+        figure_cache.warm(cumulative_figure, [(year, 'D', None, None) for year in years])
+
+
+@app.server.route('/cache-stats')
+def cache_stats():
+    return flask.jsonify(figure_cache.stats())
+
 
+# Timings, stages (profiling.span), payload sizes and memory of every callback on /metrics
+profiling.instrument(app, caches=[figure_cache])
+warm_cache()
 
 if __name__ == '__main__':
     app.run_server(debug=True, port=8051)
@@ -0,0 +1,19 @@
+import multiprocessing
+import os
+
+# gunicorn-Konfiguration für wsgi.py, alle Werte über Umgebungsvariablen anpassbar
+bind = os.environ.get('CDK_BIND', '0.0.0.0:8050')
+workers = int(os.environ.get('CDK_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('CDK_THREADS', 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = int(os.environ.get('CDK_TIMEOUT', 60))
+
+# App (und damit Flutdaten, Rollup und vorberechnete Figuren) vor dem fork laden, die Worker teilen sich den Speicher
+preload_app = True
+
+# Worker nach einer Anzahl Requests neu starten, damit Speicher durch Copy-on-Write nicht unbegrenzt wächst
+max_requests = int(os.environ.get('CDK_MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
+
+# Zugriffslog nach stdout mit CDK_ACCESS_LOG=-
+accesslog = os.environ.get('CDK_ACCESS_LOG')
@@ -0,0 +1,42 @@
+import importlib
+import os
+import sys
+import time
+
+import flask
+
+# Einstiegspunkt für den Produktivbetrieb, z.B.: cd dashboard && gunicorn -c gunicorn.conf.py wsgi:server
+# Welches Dashboard ausgeliefert wird, bestimmt CDK_DASHBOARD ('ch' oder 'alps').
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from climate_data import config
+from climate_data.dataset import get_dataset
+
+DASHBOARDS = {
+    'ch': 'dashboard',
+    'alps': 'dashboard_alps',
+}
+
+if config.DASHBOARD not in DASHBOARDS:
+    raise ValueError(f"Unknown CDK_DASHBOARD '{config.DASHBOARD}', expected one of {sorted(DASHBOARDS)}")
+
+# Daten und Cache-Vorberechnung einmal im Master laden (gunicorn preload_app), die Worker erben die Seiten beim fork
+started = time.perf_counter()
+dataset = get_dataset(config.DASHBOARD).load()
+module = importlib.import_module(DASHBOARDS[config.DASHBOARD])
+load_seconds = time.perf_counter() - started
+
+app = module.app
+server = app.server
+
+
+@server.route('/health')
+def health():
+    return flask.jsonify({
+        'status': 'ok',
+        'dashboard': config.DASHBOARD,
+        'pid': os.getpid(),
+        'flood_rows': len(dataset.flood_data),
+        'years': [dataset.years()[0], dataset.years()[-1]] if len(dataset.flood_data) else [],
+        'load_seconds': round(load_seconds, 2),
+    })
@@ -0,0 +1,38 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from climate_data import config, cube, events, loader
+
+
+def build(dataset, days_before):
+    start = time.perf_counter()
+    floods_name, regions_name = config.FLOOD_SOURCES[dataset]
+    floods = loader.load_floods(floods_name, regions_name)
+    rain_cube = cube.open_cube(dataset)
+
+    table = events.event_precipitation(rain_cube, floods, days_before)
+    path = config.event_precipitation_path(dataset)
+    table.to_parquet(path + '.tmp', index=False, compression='zstd')
+    os.replace(path + '.tmp', path)
+
+    windows = table.groupby(['ID', 'Code']).ngroups
+    without_cells = table.groupby(['ID', 'Code'])['N'].max().eq(0).sum()
+    print(f"{dataset}: {windows} flood regions ({without_cells} without rain data), {len(table)} rows "
+          f"in {time.perf_counter() - start:.1f}s, written to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precipitation over the affected regions around every flood event.')
+    parser.add_argument('datasets', nargs='*', help=f'one of {sorted(config.EVENT_PRECIPITATION)}, default: all')
+    parser.add_argument('--days-before', type=int, default=config.EVENT_DAYS_BEFORE)
+    args = parser.parse_args()
+
+    for dataset in args.datasets or sorted(config.EVENT_PRECIPITATION):
+        build(dataset, args.days_before)
+
+
+if __name__ == '__main__':
+    main()
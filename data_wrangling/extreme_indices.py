@@ -0,0 +1,37 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from climate_data import config, cube, indices
+
+
+def build(dataset, base_years, workers):
+    start = time.perf_counter()
+    rain_cube = cube.open_cube(dataset)
+    table = indices.extreme_indices(rain_cube, tuple(base_years), workers)
+    path = config.extreme_indices_path(dataset)
+    table.to_parquet(path + '.tmp', index=False, compression='zstd')
+    os.replace(path + '.tmp', path)
+
+    n_days, n_cells = rain_cube.precipitation.shape
+    incomplete = table['RX1DAY'].isna().sum()
+    print(f"{dataset}: {n_cells} cells x {table['YEAR'].nunique()} years ({n_days} days, {incomplete} cell years "
+          f"incomplete) in {time.perf_counter() - start:.1f}s, written to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ETCCDI extreme precipitation indices per grid cell and year.')
+    parser.add_argument('datasets', nargs='*', help=f'one of {sorted(config.EXTREME_INDICES)}, default: all')
+    parser.add_argument('--base-years', type=int, nargs=2, default=list(config.EXTREME_BASE_YEARS),
+                        metavar=('FIRST', 'LAST'), help='base period of the R95p threshold')
+    parser.add_argument('--workers', type=int, help='processes, default: one per CPU')
+    args = parser.parse_args()
+
+    for dataset in args.datasets or sorted(config.EXTREME_INDICES):
+        build(dataset, args.base_years, args.workers)
+
+
+if __name__ == '__main__':
+    main()
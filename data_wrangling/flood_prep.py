@@ -1,16 +1,16 @@
-import geopandas as gpd
-import contextily as ctx
-from geopy.geocoders import Nominatim
-from geopy.extra.rate_limiter import RateLimiter
+import os
+import sys
 import pandas as pd
-import ast  # Zum sicheren Umwandeln von Strings in Listen/Tuples
-from opencage.geocoder import OpenCageGeocode
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from climate_data import config, dates
+import geocoding
 
 pd.set_option('display.width', 2000)
 
 # Daten einlesen
-hanze = pd.read_csv(r'../data/source/hanze_all.csv', sep=',')
-hanze_regions = pd.read_csv(r'../data/source/regioncodes.csv', sep=',')
+hanze = pd.read_csv(config.source_path('hanze_all.csv'), sep=',')
+hanze_regions = pd.read_csv(config.source_path('regioncodes.csv'), sep=',')
 
 
 # Unnötige Spalten löschen
@@ -32,6 +32,12 @@ countries = ['France', 'Switzerland', 'Liechtenstein', 'Monaco', 'Slovenia', 'Au
 hanze_filtered = hanze[hanze['Country name'].isin(countries)]
 hanze_filtered = hanze_filtered[(hanze_filtered['Year'] >= 1979) & (hanze_filtered['Year'] <= 2023)]
 
+# Datumsspalten einmal hier parsen (gemischte Formate werden pro Wert erkannt), geschrieben wird ISO %Y-%m-%d
+for column in ['Start date', 'End date']:
+    parsed, unparsed = dates.normalize_dates(hanze_filtered[column])
+    print(dates.unparsed_report(hanze_filtered[column], unparsed))
+    hanze_filtered = hanze_filtered.assign(**{column: parsed})
+
 # Regionen filtern
 countries_diff = ['FR', 'CH', 'LI', 'MC', 'SI', 'AT', 'DE', 'IT']
 regions_filtered = hanze_regions[hanze_regions['Code'].str[:2].isin(countries_diff)]
@@ -40,110 +46,53 @@ print(hanze_filtered)
 print(regions_filtered)
 ################################################################### Koordinaten einfügen
 
-key = 'e6b40f80dcff475dae09c9c4d1e7985e'  # Replace with your actual OpenCage API key
-geocoder = OpenCageGeocode(key)
-
-# Function to get coordinates
-def get_coordinates(place_name):
-    result = geocoder.geocode(place_name)
-    if result:
-        return result[0]['geometry']['lat'], result[0]['geometry']['lng']
-    else:
-        return None, None
-    
-
-# Apply the get_coordinates function to the 'Name' column
-regions_filtered['Coordinates'] = regions_filtered['Name'].apply(lambda x: get_coordinates(x))
-
+# Koordinaten aus dem lokalen Cache (data/generated/geocode_cache.csv); fehlende Codes über das konfigurierte Backend
+# (CDK_GEOCODER=shapefile|opencage|nominatim), damit der Build ohne Netzwerk reproduzierbar ist
+geocoder = geocoding.from_config()
+coordinates = geocoder.locate_all(regions_filtered)
+print(geocoder.report())
 
+# Koordinaten als numerische Spalten statt als Tupel-String speichern
+regions_filtered['Latitude'] = pd.to_numeric([latitude for latitude, _ in coordinates])
+regions_filtered['Longitude'] = pd.to_numeric([longitude for _, longitude in coordinates])
 
 print(regions_filtered.head)
 
-output_path = r"C:\Users\Murat Kayhan\OneDrive - FHNW\Documents\FHNW\ckd\Data\regionswithcords.csv"
+output_path = config.generated_path('regionswithcords.csv')
 regions_filtered.to_csv(output_path, index=False)
 
 ###########################################################################################################################
-#Codes durch Koordinaten ersetzen
-
-regions_filtered = pd.read_csv(r'C:\Users\Murat Kayhan\OneDrive - FHNW\Documents\FHNW\ckd\Data\regionswithcords.csv')
+# Neue Zeilen für jede Region erstellen, der NUTS-Code bleibt als Schlüssel erhalten
 
-print(regions_filtered)
-regions_mapping = regions_filtered.set_index('Code')['Coordinates'].to_dict()
-
-# Define a function to replace region codes with their corresponding coordinates
-def replace_codes_with_coordinates(codes):
-    if pd.isna(codes):
-        return codes
-    codes_list = codes.split(';')
-    coordinates_list = [regions_mapping.get(code, code) for code in codes_list]
-    return ';'.join(coordinates_list)
-
-# Apply this function to the 'Regions affected (v2021)' column in the hanze dataset
-hanze_filtered['regions'] = hanze_filtered['regions'].apply(replace_codes_with_coordinates)
-
-# Display the first few rows of the updated 'Regions affected (v2021)' column to verify the changes
-print(hanze_filtered[['regions']].head())
-
-
-output_path = r"C:\Users\Murat Kayhan\OneDrive - FHNW\Documents\FHNW\ckd\Data\hanze_without_cords.csv"
-hanze_filtered.to_csv(output_path, index=False)
+expanded_data = hanze_filtered.assign(Code=hanze_filtered['regions'].str.split(';')).explode('Code')
+expanded_data = expanded_data.drop(columns=['regions'])
+expanded_data['Code'] = expanded_data['Code'].astype('category')
+print(expanded_data[['ID', 'Code']].head())
 
 ###########################################################################################################################
-# Neue Zeilen für jede Region erstellen
-
-hanze_filtered = pd.read_csv(r'C:\Users\Murat Kayhan\OneDrive - FHNW\Documents\FHNW\ckd\Data\hanze_without_cords.csv')
-
-
-expanded_data = hanze_filtered.assign(regions=hanze_filtered['regions'].str.split(';')).explode('regions')
-print(expanded_data[['ID', 'regions']].head())
-
-output_path = r"C:\Users\Murat Kayhan\OneDrive - FHNW\Documents\FHNW\ckd\Data\hanze_with_cords.csv"
-expanded_data.to_csv(output_path, index=False)
-##########################################################################################################################
-hanzewithcords = pd.read_csv(r'C:\Users\Murat Kayhan\OneDrive - FHNW\Documents\FHNW\ckd\Data\hanze_with_cords.csv')
-print(hanzewithcords[['regions']].head())
-
-rain_related = hanzewithcords[hanzewithcords['Cause'].str.contains('rain', case=False, na=False)]
-print(hanzewithcords[['Cause']].head())
-print(hanzewithcords)
-
-output_path = r"C:\Users\Murat Kayhan\OneDrive - FHNW\Documents\FHNW\ckd\Data\flood_data_fixed_everything.csv"
-hanzewithcords.to_csv(output_path, index=False)
-
-#########################################################################################################################
 #Spalte Latitude und Longitude
 
-import pandas as pd
-
-# Load the provided CSV file
-flood_data = pd.read_csv(r'C:\Users\Murat Kayhan\OneDrive - FHNW\Documents\FHNW\ckd\Data\flood_data_fixed_everything.csv')
-
-print(flood_data)
-
-# Identify and filter out invalid entries in the 'regions' column
-valid_entries = flood_data[flood_data['regions'].str.contains('^\d+\.\d+,\s*\d+\.\d+$', regex=True)].copy()
-
-# Split the valid 'regions' column into 'Latitude' and 'Longitude' columns
-valid_entries[['Latitude', 'Longitude']] = valid_entries['regions'].str.split(',', expand=True)
-
-# Convert to numeric values
-valid_entries['Latitude'] = pd.to_numeric(valid_entries['Latitude'])
-valid_entries['Longitude'] = pd.to_numeric(valid_entries['Longitude'])
+# Koordinaten über den indexierten Code nachschlagen, Regionen ohne Koordinaten werden entfernt
+regions_lookup = regions_filtered.drop_duplicates('Code').set_index('Code')[['Latitude', 'Longitude']]
+flood_data = expanded_data.join(regions_lookup, on='Code')
+valid_entries = flood_data.dropna(subset=['Latitude', 'Longitude'])
 
-print(valid_entries[['Latitude', 'Longitude']].head())
+print(valid_entries[['Code', 'Latitude', 'Longitude']].head())
+print(f"{len(flood_data) - len(valid_entries)} of {len(flood_data)} region rows without coordinates")
 
-# Save the updated dataframe to a new CSV file
-valid_entries.to_csv('path_to_your_file/flood_data_with_lat_long_valid.csv', index=False)
+rain_related = valid_entries[valid_entries['Cause'].str.contains('rain', case=False, na=False)]
+print(valid_entries[['Cause']].head())
 
 #########################################################################################3
 #Spalten neu anordnen
 
 cols = valid_entries.columns.tolist()
 end_date_index = cols.index('End date')
-new_order = cols[:end_date_index + 1] + ['Latitude', 'Longitude'] + cols[end_date_index + 1:-2]
+new_order = cols[:end_date_index + 1] + ['Code', 'Latitude', 'Longitude'] + \
+    [col for col in cols[end_date_index + 1:] if col not in ('Code', 'Latitude', 'Longitude')]
 valid_entries = valid_entries[new_order]
 
 print(valid_entries.columns)
 
-output_path = r"C:\Users\Murat Kayhan\OneDrive - FHNW\Documents\FHNW\ckd\Data\flood_data_fixed_everything_mitSpalte.csv"
-valid_entries.to_csv(output_path, index=False)
+output_path = config.generated_path('flood_data_fixed.csv')
+valid_entries.to_csv(output_path, index=False, date_format=dates.ISO_FORMAT)
@@ -0,0 +1,175 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from climate_data import config, loader
+
+CACHE_COLUMNS = ['Code', 'Name', 'Latitude', 'Longitude', 'Source']
+
+
+class GeocodeCache:
+    """Persistent CSV cache of region coordinates, keyed by NUTS region code."""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            cached = pd.read_csv(path, sep=',', keep_default_na=False, na_values=[''])
+            for row in cached.itertuples(index=False):
+                self.entries[row.Code] = (row.Name, row.Latitude, row.Longitude, row.Source)
+        self.dirty = False
+
+    def get(self, code):
+        entry = self.entries.get(code)
+        return None if entry is None else (entry[1], entry[2])
+
+    def put(self, code, name, coordinates, source):
+        latitude, longitude = coordinates if coordinates else (None, None)
+        self.entries[code] = (name, latitude, longitude, source)
+        self.dirty = True
+
+    def seed(self, regions):
+        # Bereits vorhandene Koordinaten (z.B. regionswithcords.csv) übernehmen, ohne Netzwerk
+        added = 0
+        for row in regions.itertuples(index=False):
+            if row.Code not in self.entries and pd.notna(row.Latitude) and pd.notna(row.Longitude):
+                self.put(row.Code, row.Name, (row.Latitude, row.Longitude), 'seed')
+                added += 1
+        return added
+
+    def save(self):
+        if not self.dirty:
+            return
+        rows = [(code,) + entry for code, entry in sorted(self.entries.items())]
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        pd.DataFrame(rows, columns=CACHE_COLUMNS).to_csv(self.path + '.tmp', index=False)
+        os.replace(self.path + '.tmp', self.path)
+        self.dirty = False
+
+
+class OpenCageBackend:
+    name = 'opencage'
+
+    def __init__(self, key):
+        from opencage.geocoder import OpenCageGeocode
+        self.geocoder = OpenCageGeocode(key)
+
+    def lookup(self, code, name):
+        result = self.geocoder.geocode(name)
+        if result:
+            return result[0]['geometry']['lat'], result[0]['geometry']['lng']
+        return None
+
+
+class NominatimBackend:
+    name = 'nominatim'
+
+    def __init__(self, user_agent='cdk1', min_delay_seconds=1):
+        from geopy.extra.rate_limiter import RateLimiter
+        from geopy.geocoders import Nominatim
+        self.geocode = RateLimiter(Nominatim(user_agent=user_agent).geocode, min_delay_seconds=min_delay_seconds)
+
+    def lookup(self, code, name):
+        location = self.geocode(name)
+        return (location.latitude, location.longitude) if location else None
+
+
+class ShapefileCentroidBackend:
+    """Offline backend: centroid of the region polygon in a local NUTS shapefile."""
+    name = 'shapefile'
+
+    def __init__(self, path, code_column='NUTS_ID'):
+        import geopandas as gpd
+        regions = gpd.read_file(path)[[code_column, 'geometry']]
+        # Schwerpunkt in einer flächentreuen Projektion (ETRS89-LAEA) berechnen, dann zurück nach WGS84
+        centroids = regions.to_crs('EPSG:3035').centroid.to_crs('EPSG:4326')
+        self.centroids = dict(zip(regions[code_column], zip(centroids.y, centroids.x)))
+
+    def lookup(self, code, name):
+        return self.centroids.get(code)
+
+
+class Geocoder:
+    def __init__(self, cache, backend=None):
+        self.cache = cache
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.hit_seconds = []
+        self.miss_seconds = []
+
+    def locate(self, code, name):
+        start = time.perf_counter()
+        coordinates = self.cache.get(code)
+        if coordinates is not None:
+            self.hits += 1
+            self.hit_seconds.append(time.perf_counter() - start)
+            return coordinates if pd.notna(coordinates[0]) else (None, None)
+
+        self.misses += 1
+        coordinates = self.backend.lookup(code, name) if self.backend else None
+        if self.backend:
+            self.cache.put(code, name, coordinates, self.backend.name)
+        self.miss_seconds.append(time.perf_counter() - start)
+        return coordinates or (None, None)
+
+    def locate_all(self, regions, code_column='Code', name_column='Name'):
+        coordinates = [self.locate(code, name) for code, name in zip(regions[code_column], regions[name_column])]
+        self.cache.save()
+        return coordinates
+
+    def report(self):
+        total = self.hits + self.misses
+        lines = [f"geocoding: {total} lookups, {self.hits} cache hits ({self.hits / total:.0%})" if total
+                 else "geocoding: no lookups"]
+        for label, seconds in (('cache hit', self.hit_seconds), ('backend', self.miss_seconds)):
+            if seconds:
+                lines.append(f"  {label}: mean {np.mean(seconds) * 1000:.2f} ms, "
+                             f"p95 {np.percentile(seconds, 95) * 1000:.2f} ms")
+        if self.misses and self.backend is None:
+            lines.append(f"  {self.misses} codes not in the cache and no backend configured")
+        return '\n'.join(lines)
+
+
+def make_backend(name):
+    if name == 'opencage':
+        return OpenCageBackend(os.environ['OPENCAGE_API_KEY'])
+    if name == 'nominatim':
+        return NominatimBackend()
+    if name == 'shapefile':
+        if not config.REGIONS_SHAPEFILE:
+            raise ValueError("The shapefile backend needs CDK_REGIONS_SHAPEFILE (NUTS polygons with NUTS_ID)")
+        return ShapefileCentroidBackend(config.REGIONS_SHAPEFILE)
+    if name in (None, '', 'cache'):
+        return None
+    raise ValueError(f"Unknown geocoding backend '{name}', expected cache, shapefile, opencage or nominatim")
+
+
+def from_config():
+    # Default: nur Cache und, falls vorhanden, NUTS-Shapefile – Netzwerk-Backends nur auf ausdrücklichen Wunsch
+    backend = config.GEOCODER or ('shapefile' if config.REGIONS_SHAPEFILE else 'cache')
+    return Geocoder(GeocodeCache(config.generated_path(config.GEOCODE_CACHE)), make_backend(backend))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the local geocoding cache for the NUTS regions.')
+    parser.add_argument('--seed', help='CSV with Code, Name and Latitude/Longitude (or Coordinates) to import into the cache')
+    args = parser.parse_args()
+
+    cache = GeocodeCache(config.generated_path(config.GEOCODE_CACHE))
+    if args.seed:
+        regions = pd.read_csv(args.seed, sep=',')
+        if 'Latitude' not in regions.columns:
+            regions['Latitude'], regions['Longitude'] = loader.split_coordinates(regions['Coordinates'])
+        print(f"{cache.seed(regions)} regions added to {cache.path}")
+        cache.save()
+    print(f"{len(cache.entries)} regions in the cache")
+
+
+if __name__ == '__main__':
+    main()
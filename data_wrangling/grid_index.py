@@ -0,0 +1,188 @@
+import argparse
+import hashlib
+import os
+import sys
+import time
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from climate_data import config, loader
+
+# Parquet-Metadaten einer Jahrespartition: Fingerabdruck der Zuordnung, mit der ihre CELL_ID geschrieben wurde
+GRID_KEY = b'cdk_grid_cells'
+NATURAL_EARTH_URL = 'https://naciscdn.org/naturalearth/110m/cultural/ne_110m_admin_0_countries.zip'
+
+
+def load_country_shapes():
+    path = config.COUNTRIES_SHAPEFILE
+    if not path:
+        # naturalearth_lowres lag bis geopandas 0.14 bei, ab geopandas 1.0 muss die Datei angegeben werden
+        try:
+            path = gpd.datasets.get_path('naturalearth_lowres')
+        except AttributeError:
+            raise ValueError(f"CDK_COUNTRIES_SHAPEFILE is not set and geopandas {gpd.__version__} no longer ships "
+                             f"naturalearth_lowres: set it to country polygons with a 'name' column, e.g. the "
+                             f"Natural Earth admin 0 countries ({NATURAL_EARTH_URL})") from None
+    shapes = gpd.read_file(path)
+    # Die Natural-Earth-Datei selbst nennt die Spalte NAME, naturalearth_lowres und eigene Dateien name
+    if 'name' not in shapes.columns and 'NAME' in shapes.columns:
+        shapes = shapes.rename(columns={'NAME': 'name'})
+    return shapes[['name', 'geometry']]
+
+
+def assign_countries(cells, country_shapes):
+    points = gpd.GeoDataFrame(cells, geometry=gpd.points_from_xy(cells.LONGITUDE, cells.LATITUDE),
+                              crs=country_shapes.crs)
+    joined = gpd.sjoin(points, country_shapes, how='left', predicate='within')
+    joined = joined[~joined.index.duplicated()]
+    return joined['name'].to_numpy()
+
+
+def assign_regions_from_shapefile(cells, path):
+    regions = gpd.read_file(path)[['NUTS_ID', 'geometry']].to_crs('EPSG:4326')
+    points = gpd.GeoDataFrame(cells, geometry=gpd.points_from_xy(cells.LONGITUDE, cells.LATITUDE), crs='EPSG:4326')
+    joined = gpd.sjoin(points, regions, how='left', predicate='within')
+    joined = joined[~joined.index.duplicated()]
+    return joined['NUTS_ID'].to_numpy()
+
+
+def region_countries(countries, codes):
+    # Mit NUTS-Polygonen bestimmt die Region das Land: naturalearth und NUTS sind sich an der Grenze nicht einig
+    # (Zelle in Frankreich, Region DE...), dann läge eine Region in zwei Ländern und wäre im Cube kein
+    # Spaltenbereich. Land aus dem NUTS-Präfix (config.COUNTRY_CODES), sonst das häufigste Land der Region.
+    names = {prefix: country for country, prefix in config.COUNTRY_CODES.items()}
+    cells = pd.DataFrame({'COUNTRY': countries, 'REGION_CODE': codes})
+    known = cells.dropna(subset=['REGION_CODE'])
+    majority = known.dropna(subset=['COUNTRY']).groupby('REGION_CODE')['COUNTRY'].agg(
+        lambda values: values.value_counts().index[0])
+    country = known['REGION_CODE'].str[:2].map(names)
+    country = country.fillna(known['REGION_CODE'].map(majority)).fillna(known['COUNTRY'])
+    result = cells['COUNTRY'].astype(object)
+    result[known.index] = country
+    return result.to_numpy()
+
+
+def assign_regions_by_centroid(cells, countries):
+    # Ohne NUTS-Polygone: nächstgelegenes Regionszentrum aus regionswithcords.csv im selben Land
+    regions = loader.load_regions('regionswithcords.csv').dropna(subset=['Latitude', 'Longitude'])
+    regions['Code'] = regions['Code'].astype(str)
+
+    codes = np.full(len(cells), None, dtype=object)
+    for country, prefix in config.COUNTRY_CODES.items():
+        in_country = countries == country
+        candidates = regions[regions['Code'].str[:2] == prefix]
+        if not in_country.any() or candidates.empty:
+            continue
+        lat = cells['LATITUDE'].to_numpy()[in_country, None]
+        lon = cells['LONGITUDE'].to_numpy()[in_country, None]
+        distance = (lat - candidates['Latitude'].to_numpy()) ** 2 \
+            + ((lon - candidates['Longitude'].to_numpy()) * np.cos(np.radians(lat))) ** 2
+        codes[in_country] = candidates['Code'].to_numpy()[distance.argmin(axis=1)]
+    return codes
+
+
+def collect_cells():
+    frames = []
+    for dataset in sorted(config.RAIN_STORES):
+        if not os.path.isdir(config.rain_store_path(dataset)):
+            continue
+        for year in loader.available_years(dataset):
+            cells = loader.load_rain(dataset, years=[year], columns=['LATITUDE', 'LONGITUDE'])
+            frames.append(cells.drop_duplicates())
+    return pd.concat(frames, ignore_index=True).drop_duplicates()
+
+
+def build_index():
+    path = config.generated_path(config.GRID_CELLS)
+    cells = collect_cells()
+
+    # Bestehende CELL_IDs bleiben stabil, neue Zellen werden hinten angehängt
+    if os.path.exists(path):
+        known = pd.read_parquet(path)
+        cells = cells.merge(known[['LATITUDE', 'LONGITUDE']], how='left', indicator=True)
+        cells = cells[cells['_merge'] == 'left_only'].drop(columns='_merge')
+        next_id = int(known['CELL_ID'].max()) + 1 if len(known) else 0
+    else:
+        known = None
+        next_id = 0
+
+    if cells.empty:
+        if config.REGIONS_SHAPEFILE and known is not None:
+            return reconcile_countries(known, path)
+        print("grid index is up to date")
+        return known
+
+    cells = cells.sort_values(['LATITUDE', 'LONGITUDE'], ignore_index=True)
+    cells.insert(0, 'CELL_ID', np.arange(next_id, next_id + len(cells), dtype='int32'))
+    cells['COUNTRY'] = assign_countries(cells, load_country_shapes())
+    if config.REGIONS_SHAPEFILE:
+        cells['REGION_CODE'] = assign_regions_from_shapefile(cells, config.REGIONS_SHAPEFILE)
+    else:
+        cells['REGION_CODE'] = assign_regions_by_centroid(cells, cells['COUNTRY'].to_numpy())
+
+    cells = pd.concat([known, cells], ignore_index=True) if known is not None else cells
+    if config.REGIONS_SHAPEFILE:
+        cells['COUNTRY'] = region_countries(cells['COUNTRY'].to_numpy(), cells['REGION_CODE'].to_numpy())
+    cells.to_parquet(path, index=False)
+    print(f"{len(cells)} grid cells written to {path}")
+    return cells
+
+
+def reconcile_countries(cells, path):
+    # Ältere Indizes wurden ohne region_countries gebaut, ihre Grenzzellen werden einmal korrigiert
+    countries = region_countries(cells['COUNTRY'].to_numpy(), cells['REGION_CODE'].to_numpy())
+    changed = ~((countries == cells['COUNTRY'].to_numpy()) | (pd.isna(countries) & cells['COUNTRY'].isna()))
+    if not changed.any():
+        print("grid index is up to date")
+        return cells
+    cells = cells.assign(COUNTRY=countries)
+    cells.to_parquet(path, index=False)
+    print(f"{int(changed.sum())} border cells moved to the country of their NUTS region in {path}")
+    return cells
+
+
+def grid_fingerprint(keys):
+    # Nur Koordinaten und CELL_ID zählen: ein anderes Land oder eine andere Region ändert die CELL_IDs nicht
+    return hashlib.sha1(pd.util.hash_pandas_object(keys, index=False).to_numpy().tobytes()).hexdigest().encode()
+
+
+def attach_cell_ids(dataset, cells):
+    # CELL_ID als Spalte in jede Jahrespartition schreiben, damit Länderfilter reine Integer-Filter sind.
+    # Partitionen, deren CELL_ID mit einem anderen Index geschrieben wurde (neue Zellen, neu aufgebauter Index),
+    # werden neu zugeordnet
+    store_path = config.rain_store_path(dataset)
+    keys = cells[['LATITUDE', 'LONGITUDE', 'CELL_ID']].astype({'LATITUDE': 'float32', 'LONGITUDE': 'float32'})
+    fingerprint = grid_fingerprint(keys)
+    for year in loader.available_years(dataset):
+        part_path = os.path.join(store_path, f'YEAR={year}', 'part-0.parquet')
+        schema = pq.read_schema(part_path)
+        if 'CELL_ID' in schema.names and (schema.metadata or {}).get(GRID_KEY) == fingerprint:
+            continue
+        start = time.perf_counter()
+        rain = pd.read_parquet(part_path).drop(columns='CELL_ID', errors='ignore')
+        rain = rain.merge(keys, on=['LATITUDE', 'LONGITUDE'], how='left', sort=False)
+        rain['CELL_ID'] = rain['CELL_ID'].fillna(-1).astype('int32')
+        table = pa.Table.from_pandas(rain, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), GRID_KEY: fingerprint})
+        pq.write_table(table, part_path + '.tmp', compression='zstd')
+        os.replace(part_path + '.tmp', part_path)
+        print(f"{dataset} {year}: CELL_ID attached in {time.perf_counter() - start:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Map every grid cell to a country and region code once.')
+    parser.parse_args()
+
+    cells = build_index()
+    for dataset in sorted(config.RAIN_STORES):
+        if os.path.isdir(config.rain_store_path(dataset)):
+            attach_cell_ids(dataset, cells)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from climate_data import config
+
+# Baut data/generated/ aus den Skripten in data_wrangling/ neu auf. Jeder Knoten in pipeline.json ist ein Skript mit
+# Ein- und Ausgaben; ein Knoten läuft nur, wenn sich der Inhalt seiner Eingaben, das Skript oder die Argumente seit
+# dem letzten erfolgreichen Lauf geändert haben. Unabhängige Knoten laufen parallel, jeder als eigener Prozess.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_FILE = os.path.join(SCRIPT_DIR, 'pipeline.json')
+STATE_FILE = '.pipeline_state.json'
+
+
+def placeholders():
+    # Pfade in pipeline.json kommen aus climate_data/config.py (CDK_DATA_DIR, CDK_*_SHAPEFILE), nicht absolut
+    return {
+        'data': config.DATA_DIR,
+        'source': config.SOURCE_DIR,
+        'generated': config.GENERATED_DIR,
+        'countries_shapefile': config.COUNTRIES_SHAPEFILE,
+        'regions_shapefile': config.REGIONS_SHAPEFILE,
+    }
+
+
+def resolve(value, values):
+    """Fill the placeholders of a path; None if its setting is not configured. A list means: first configured entry."""
+    if isinstance(value, list):
+        return next((path for path in (resolve(item, values) for item in value) if path is not None), None)
+    if value.startswith('{'):
+        name = value[1:value.index('}')]
+        if name not in values:
+            raise ValueError(f"Unknown placeholder {{{name}}} in '{value}', expected one of {sorted(values)}")
+        if values[name] is None:
+            return None
+        return os.path.normpath(value.format(**values))
+    return value
+
+
+def load_nodes(path):
+    with open(path) as file:
+        nodes = json.load(file)['nodes']
+    values = placeholders()
+    producers = {}
+    for name, node in nodes.items():
+        node['script'] = os.path.join(SCRIPT_DIR, node['script'])
+        node['args'] = [resolve(arg, values) for arg in node.get('args', [])]
+        node['inputs'] = [path for path in (resolve(item, values) for item in node.get('inputs', [])) if path]
+        node['outputs'] = [resolve(item, values) for item in node.get('outputs', [])]
+        for output in node['outputs']:
+            if output in producers:
+                raise ValueError(f"'{output}' is produced by both '{producers[output]}' and '{name}'")
+            producers[output] = name
+
+    # Abhängigkeiten ergeben sich aus den Pfaden: ein Knoten hängt von den Erzeugern seiner Eingaben ab
+    for name, node in nodes.items():
+        node['depends'] = {producers[path] for path in node['inputs'] if path in producers} - {name}
+    topological_order(nodes)
+    return nodes
+
+
+def topological_order(nodes):
+    order = []
+    visiting = set()
+
+    def visit(name):
+        if name in order:
+            return
+        if name in visiting:
+            raise ValueError(f"Cycle in the pipeline at '{name}'")
+        visiting.add(name)
+        for dependency in sorted(nodes[name]['depends']):
+            visit(dependency)
+        visiting.discard(name)
+        order.append(name)
+
+    for name in nodes:
+        visit(name)
+    return order
+
+
+def upstream(nodes, targets):
+    selected = set()
+    stack = list(targets)
+    while stack:
+        name = stack.pop()
+        if name not in nodes:
+            raise ValueError(f"Unknown node '{name}', expected one of {sorted(nodes)}")
+        if name not in selected:
+            selected.add(name)
+            stack.extend(nodes[name]['depends'])
+    return selected
+
+
+class ContentHashes:
+    """SHA-256 of files and directories (e.g. Parquet stores); unchanged files (size, mtime) are not read again."""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def file(self, path):
+        stat = os.stat(path)
+        cached = self.cache.get(path)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(2 ** 20), b''):
+                digest.update(block)
+        self.cache[path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def path(self, path):
+        if not os.path.exists(path):
+            return None
+        if os.path.isfile(path):
+            return self.file(path)
+        digest = hashlib.sha256()
+        for directory, subdirectories, files in os.walk(path):
+            subdirectories.sort()
+            for name in sorted(files):
+                file_path = os.path.join(directory, name)
+                digest.update(os.path.relpath(file_path, path).encode())
+                digest.update(self.file(file_path).encode())
+        return digest.hexdigest()
+
+
+def fingerprint(node, hashes):
+    key = {
+        'script': hashes.path(node['script']),
+        'args': node['args'],
+        'inputs': {path: hashes.path(path) for path in node['inputs']},
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+def load_state(path):
+    if not os.path.exists(path):
+        return {'nodes': {}, 'files': {}}
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_state(state, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'w') as file:
+        json.dump(state, file, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def run_node(node):
+    # Skripte laufen wie von Hand aufgerufen, jedes in einem eigenen Python-Prozess (CDK_*-Variablen werden vererbt)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, node['script']] + node['args'], cwd=SCRIPT_DIR,
+                            capture_output=True, text=True)
+    return result.returncode, result.stdout + result.stderr, time.perf_counter() - start
+
+
+def run(nodes, targets, state, state_path, workers=None, force=False, verbose=False):
+    hashes = ContentHashes(state['files'])
+    pending = set(targets)
+    running = {}
+    failed = set()
+    ran = []
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        while pending or running:
+            for name in sorted(pending):
+                node = nodes[name]
+                if node['depends'] & (pending | set(running.values())):
+                    continue
+                pending.discard(name)
+                if node['depends'] & failed:
+                    failed.add(name)
+                    print(f"{name:<20} skipped, upstream failed")
+                    continue
+                # Eingaben erst prüfen, wenn alle Vorgänger fertig sind: gleicher Inhalt stoppt den Neubau hier
+                if not force and state['nodes'].get(name) == fingerprint(node, hashes) \
+                        and all(os.path.exists(path) for path in node['outputs']):
+                    print(f"{name:<20} up to date")
+                    continue
+                print(f"{name:<20} started")
+                running[executor.submit(run_node, node)] = name
+
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                returncode, output, seconds = future.result()
+                if verbose or returncode:
+                    print(output.rstrip())
+                if returncode:
+                    failed.add(name)
+                    print(f"{name:<20} failed (exit code {returncode}) after {seconds:.1f}s")
+                    continue
+                # Nach dem Lauf festhalten: Skripte wie grid_index.py ergänzen ihre Eingaben (CELL_ID im Store)
+                state['nodes'][name] = fingerprint(nodes[name], hashes)
+                save_state(state, state_path)
+                ran.append(name)
+                print(f"{name:<20} done in {seconds:.1f}s")
+
+    save_state(state, state_path)
+    return ran, failed
+
+
+def dry_run(nodes, targets, state):
+    hashes = ContentHashes(state['files'])
+    stale = set()
+    for name in topological_order(nodes):
+        if name not in targets:
+            continue
+        node = nodes[name]
+        after = sorted(node['depends'] & stale)
+        if after:
+            status = f"runs if {', '.join(after)} change their outputs"
+        elif state['nodes'].get(name) != fingerprint(node, hashes) \
+                or not all(os.path.exists(path) for path in node['outputs']):
+            status = 'stale'
+        else:
+            status = 'up to date'
+        if status != 'up to date':
+            stale.add(name)
+        print(f"{name:<20} {status}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild data/generated incrementally from pipeline.json.')
+    parser.add_argument('nodes', nargs='*', help='nodes to build (with their upstream nodes), default: all')
+    parser.add_argument('--config', default=CONFIG_FILE)
+    parser.add_argument('--workers', type=int, help='nodes running at the same time, default: CPU count')
+    parser.add_argument('--force', action='store_true', help='run the selected nodes even if their inputs are unchanged')
+    parser.add_argument('--dry-run', action='store_true', help='only show which nodes are stale')
+    parser.add_argument('--verbose', action='store_true', help='print the output of every script')
+    args = parser.parse_args()
+
+    nodes = load_nodes(args.config)
+    targets = upstream(nodes, args.nodes or list(nodes))
+    state_path = config.generated_path(STATE_FILE)
+    state = load_state(state_path)
+
+    if args.dry_run:
+        dry_run(nodes, targets, state)
+        return
+
+    start = time.perf_counter()
+    ran, failed = run(nodes, targets, state, state_path, workers=args.workers, force=args.force, verbose=args.verbose)
+    print(f"{len(ran)} of {len(targets)} nodes run, {len(failed)} failed, total {time.perf_counter() - start:.1f}s")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from climate_data import config, cube, indices, trends
+
+
+def write(table, path):
+    table.to_parquet(path + '.tmp', index=False, compression='zstd')
+    os.replace(path + '.tmp', path)
+
+
+def build(dataset, workers):
+    start = time.perf_counter()
+    rain_cube = cube.open_cube(dataset)
+    index_table = indices.load_indices(dataset)
+    trend_table, scaling_table = trends.trend_analysis(rain_cube, index_table, workers)
+    write(trend_table, config.precipitation_trends_path(dataset))
+    write(scaling_table, config.cc_scaling_path(dataset))
+
+    cells = trend_table[(trend_table['LEVEL'] == 'cell') & (trend_table['VARIABLE'] == trends.PRCPTOT)]
+    regions = trend_table[(trend_table['LEVEL'] == 'region') & (trend_table['VARIABLE'] == trends.PRCPTOT)]
+    print(f"{dataset}: trends of {trend_table['VARIABLE'].nunique()} variables for {len(cells)} cells and "
+          f"{len(regions)} regions ({(cells['MK_P'] < 0.05).mean():.0%} of the cells with a significant PRCPTOT "
+          f"trend), scaling with {scaling_table['TEMPERATURE'].nunique()} temperatures "
+          f"in {time.perf_counter() - start:.1f}s")
+    if index_table is None:
+        print(f"{dataset}: no extreme indices, run extreme_indices.py first to get their trends")
+    if scaling_table.empty:
+        print(f"{dataset}: the cube has no temperatures, rebuild it with rain_cube.py from a rain_prep.py store")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precipitation trends and temperature scaling per cell and region.')
+    parser.add_argument('datasets', nargs='*', help=f'one of {sorted(config.PRECIPITATION_TRENDS)}, default: all')
+    parser.add_argument('--workers', type=int, help='processes, default: one per CPU')
+    args = parser.parse_args()
+
+    for dataset in args.datasets or sorted(config.PRECIPITATION_TRENDS):
+        build(dataset, args.workers)
+
+
+if __name__ == '__main__':
+    main()
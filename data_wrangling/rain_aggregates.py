@@ -0,0 +1,153 @@
+import argparse
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from climate_data import config, loader
+
+# Ersetzt die Zellen von cdk_daw.ipynb: die Quelle wird einmal gelesen und auf eine Monatsbasis (Monat x Zelle)
+# verdichtet, alle Ausgaben werden daraus abgeleitet. Dateinamen und Spalten wie bisher im Notebook.
+FIRST_YEAR = 1979
+LAST_YEAR = 2020
+
+KEY_COLUMNS = ['LATITUDE', 'LONGITUDE']
+OUTPUTS = {
+    'yearly_sum': 'precipation_yearly_sum.csv',
+    'monthly_sum': 'precipation_monthly_sum.csv',
+    'monthly_sum_with_global_mean_temp': 'precipation_monthly_sum_with_global_mean_temp.csv',
+    'monthly_regularity': 'precipation_monthly_regularity.csv',
+    'floods_filtered': 'flooding_events_ch_filtered.csv',
+    'floods_yearly': 'flooding_events_ch_precipation_yearly.csv',
+}
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def read_csv_batches(path, block_size):
+    # Nur die vier benötigten Spalten, DAY bleibt yyyymmdd als Ganzzahl: Monat = DAY // 100, kein strptime pro Zeile
+    reader = pa_csv.open_csv(
+        path,
+        read_options=pa_csv.ReadOptions(block_size=block_size),
+        parse_options=pa_csv.ParseOptions(delimiter=';'),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=['DAY'] + KEY_COLUMNS + ['PRECIPITATION'],
+            column_types={'DAY': pa.int32(), 'LATITUDE': pa.float64(), 'LONGITUDE': pa.float64(),
+                          'PRECIPITATION': pa.float64()}))
+    for batch in reader:
+        frame = batch.to_pandas()
+        frame['MONTH'] = frame.pop('DAY') // 100
+        yield frame
+
+
+def read_store_batches(dataset):
+    # Alternative zur CSV: der Parquet-Store von rain_prep.py (DAY als Zeitstempel, Werte float32), Jahr für Jahr
+    for year in loader.available_years(dataset):
+        frame = loader.load_rain(dataset, years=[year], columns=['DAY'] + KEY_COLUMNS + ['PRECIPITATION'])
+        day = frame.pop('DAY')
+        frame['MONTH'] = day.dt.year * 100 + day.dt.month
+        frame['PRECIPITATION'] = frame['PRECIPITATION'].astype('float64')
+        yield frame
+
+
+def monthly_base(batches, timings):
+    # Ein Durchgang: jeder Block wird sofort auf Monat x Zelle summiert, gehalten werden nur diese Teilsummen
+    start = time.perf_counter()
+    rows = 0
+    parts = []
+    for frame in batches:
+        rows += len(frame)
+        parts.append(frame.groupby(['MONTH'] + KEY_COLUMNS)['PRECIPITATION'].sum())
+    monthly = pd.concat(parts).groupby(level=[0, 1, 2]).sum().reset_index()
+    monthly.insert(1, 'YEAR', monthly['MONTH'] // 100)
+    timings.append(('read and monthly base', time.perf_counter() - start, rows))
+    return monthly
+
+
+def count_floods(floods):
+    # Notebook prüfte 'rainfall' auf floods['Cause'].to_string() (ein Wert für alle Zeilen), hier pro Ereignis
+    floods = floods[(floods['Year'] >= FIRST_YEAR) & (floods['Year'] <= LAST_YEAR)
+                    & floods['Cause'].str.contains('rainfall', na=False)]
+    return floods.groupby(['Year']).size().reset_index(name='count')
+
+
+def aggregates(monthly, global_mean_temp, floods):
+    in_range = monthly[(monthly['YEAR'] >= FIRST_YEAR) & (monthly['YEAR'] <= LAST_YEAR)]
+    outputs = {}
+
+    outputs['yearly_sum'] = in_range.groupby(['YEAR'] + KEY_COLUMNS, as_index=False)['PRECIPITATION'].sum()
+    outputs['monthly_sum'] = in_range[['MONTH'] + KEY_COLUMNS + ['PRECIPITATION']]
+
+    with_temp = pd.merge(monthly, global_mean_temp, on='YEAR', how='outer')
+    with_temp = with_temp[(with_temp['YEAR'] >= FIRST_YEAR) & (with_temp['YEAR'] <= LAST_YEAR)]
+    outputs['monthly_sum_with_global_mean_temp'] = with_temp.astype({'MONTH': 'Int64'})
+
+    regularity = in_range[['YEAR'] + KEY_COLUMNS + ['PRECIPITATION']].copy()
+    regularity.insert(1, 'MONTH', (in_range['MONTH'] % 100).map('{:02d}'.format))
+    outputs['monthly_regularity'] = regularity
+
+    # Jahressumme über alle Zellen und alle Jahre (wie im Notebook ohne Jahresfilter) neben der Anzahl Fluten
+    flood_counts = count_floods(floods)
+    outputs['floods_filtered'] = flood_counts[['Year', 'count']]
+    yearly_total = monthly.groupby(['YEAR'], as_index=False)['PRECIPITATION'].sum()
+    result = pd.merge(yearly_total, flood_counts, left_on='YEAR', right_on='Year', how='outer')
+    result['YEAR'] = result['YEAR'].fillna(result['Year'])
+    outputs['floods_yearly'] = result[['YEAR', 'PRECIPITATION', 'count']].fillna(0)
+
+    for name in outputs:
+        outputs[name] = outputs[name].reset_index(drop=True)
+    return outputs
+
+
+def write_outputs(outputs, output_dir, workers, timings):
+    # Die Dateien sind unabhängig voneinander und werden parallel geschrieben
+    def write(name):
+        path = os.path.join(output_dir, OUTPUTS[name])
+        outputs[name].to_csv(path)
+        return path
+
+    start = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        paths = list(executor.map(write, outputs))
+    timings.append((f'write {len(paths)} files', time.perf_counter() - start, sum(map(len, outputs.values()))))
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Yearly and monthly precipitation aggregates (formerly cdk_daw.ipynb).')
+    parser.add_argument('--source', default=config.source_path('df_ch.csv'), help='Agri4cast CSV (; separated)')
+    parser.add_argument('--dataset', help=f'read a Parquet store instead of --source, one of {sorted(config.RAIN_STORES)}')
+    parser.add_argument('--global-mean-temp', default=config.source_path('global_mean_temp.csv'))
+    parser.add_argument('--floods', default=config.source_path('HANZE_events.csv'))
+    parser.add_argument('--output-dir', default=config.GENERATED_DIR)
+    parser.add_argument('--block-size', type=int, default=64 * 2 ** 20, help='bytes of CSV parsed per batch')
+    parser.add_argument('--workers', type=int, default=len(OUTPUTS), help='threads writing the output files')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    timings = []
+    batches = read_store_batches(args.dataset) if args.dataset else read_csv_batches(args.source, args.block_size)
+    monthly = monthly_base(batches, timings)
+
+    step = time.perf_counter()
+    outputs = aggregates(monthly, pd.read_csv(args.global_mean_temp, delimiter=','),
+                         pd.read_csv(args.floods, delimiter=','))
+    timings.append(('aggregates', time.perf_counter() - step, len(monthly)))
+    write_outputs(outputs, args.output_dir, args.workers, timings)
+
+    for stage, seconds, rows in timings:
+        print(f"{stage:<40} {rows:>12} rows {seconds:>8.1f}s")
+    print(f"total {time.perf_counter() - start:.1f}s, peak RSS {peak_rss_mb():.0f} MB, written to {args.output_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import pyarrow.dataset as ds
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from climate_data import config, cube, loader
+
+
+def cube_cells(dataset, grid_cells):
+    # Nur Zellen, die im Store vorkommen, sortiert nach Land und Region: jedes Land ist ein Spaltenbereich
+    cell_ids = set()
+    for year in loader.available_years(dataset):
+        cell_ids.update(loader.load_rain(dataset, years=[year], columns=['CELL_ID'])['CELL_ID'].unique().tolist())
+    cell_ids.discard(-1)
+    cells = grid_cells.loc[sorted(cell_ids)].reset_index()
+    cells = cells.sort_values(['COUNTRY', 'REGION_CODE', 'CELL_ID'], na_position='last', ignore_index=True)
+    return cells[['CELL_ID', 'LATITUDE', 'LONGITUDE', 'COUNTRY', 'REGION_CODE']]
+
+
+def check_inputs(dataset):
+    # Vor dem Lesen prüfen, welches Skript fehlt, statt später an einer leeren Liste zu scheitern
+    store_path = config.rain_store_path(dataset)
+    if not os.path.isdir(store_path) or not loader.available_years(dataset):
+        raise ValueError(f"Rain store {store_path} is missing or has no YEAR= partitions, "
+                         f"run data_wrangling/rain_prep.py first")
+    grid_path = config.generated_path(config.GRID_CELLS)
+    if not os.path.exists(grid_path) or 'CELL_ID' not in loader.open_rain_store(dataset).schema.names:
+        raise ValueError(f"Rain store {store_path} has no CELL_ID or {grid_path} is missing, "
+                         f"run data_wrangling/grid_index.py first")
+
+
+def build(dataset):
+    check_inputs(dataset)
+    years = loader.available_years(dataset)
+    cells = cube_cells(dataset, loader.load_grid_cells())
+    if cells.empty:
+        raise ValueError(f"No cell of the rain store {config.rain_store_path(dataset)} is in the grid index, "
+                         f"run data_wrangling/grid_index.py first")
+    column_of = np.full(int(cells['CELL_ID'].max()) + 1, -1, dtype='int64')
+    column_of[cells['CELL_ID'].to_numpy()] = np.arange(len(cells))
+
+    first_day = np.datetime64(f'{years[0]}-01-01', 'D')
+    n_days = int((np.datetime64(f'{years[-1] + 1}-01-01', 'D') - first_day).astype(int))
+
+    # In ein temporäres Verzeichnis schreiben und erst am Ende austauschen, laufende Dashboards lesen den alten Cube
+    path = config.rain_cube_path(dataset)
+    tmp_path = path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    # Die Temperaturen für die Clausius-Clapeyron-Skalierung (climate_data/trends.py) gleich mit, falls vorhanden;
+    # Stores aus den generierten CSVs (rain_to_parquet.py) haben die Spalten, aber ohne Werte
+    files = {'PRECIPITATION': cube.CUBE_FILE}
+    store = loader.open_rain_store(dataset)
+    files.update({column: name for column, name in cube.TEMPERATURE_FILES.items()
+                  if column in store.schema.names and store.count_rows(filter=ds.field(column).is_valid())})
+    arrays = {column: np.lib.format.open_memmap(os.path.join(tmp_path, name), mode='w+', dtype='float32',
+                                                shape=(n_days, len(cells)))
+              for column, name in files.items()}
+    for year in years:
+        start = time.perf_counter()
+        rain = loader.load_rain(dataset, years=[year], columns=['DAY', 'CELL_ID'] + list(files))
+        first_row = int((np.datetime64(f'{year}-01-01', 'D') - first_day).astype(int))
+        last_row = int((np.datetime64(f'{year + 1}-01-01', 'D') - first_day).astype(int))
+
+        # Ein Jahr im Speicher füllen, Tage ohne Wert bleiben NaN, Zeilen ohne CELL_ID (-1) fallen weg
+        rain = rain[rain['CELL_ID'] >= 0]
+        rows = (rain['DAY'].to_numpy().astype('datetime64[D]') - first_day).astype(int) - first_row
+        columns = column_of[rain['CELL_ID'].to_numpy()]
+        for column, array in arrays.items():
+            block = np.full((last_row - first_row, len(cells)), np.nan, dtype='float32')
+            block[rows, columns] = rain[column].to_numpy()
+            array[first_row:last_row] = block
+        print(f"{dataset} {year}: {len(rain)} values in {time.perf_counter() - start:.1f}s")
+    for array in arrays.values():
+        array.flush()
+    del arrays
+
+    cells.to_parquet(os.path.join(tmp_path, cube.CELLS_FILE), index=False)
+    with open(os.path.join(tmp_path, cube.META_FILE), 'w') as file:
+        json.dump({'first_day': str(first_day), 'days': n_days, 'cells': len(cells), 'years': years}, file, indent=1)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    size_mb = n_days * len(cells) * 4 / 2 ** 20
+    print(f"{dataset}: {n_days} days x {len(cells)} cells ({size_mb:.0f} MB per variable, {', '.join(files)}) "
+          f"written to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pack the daily precipitation into a dense [day, cell] array.')
+    parser.add_argument('datasets', nargs='*', help=f'one of {sorted(config.RAIN_STORES)}, default: all')
+    args = parser.parse_args()
+
+    for dataset in args.datasets or sorted(config.RAIN_STORES):
+        build(dataset)
+
+
+if __name__ == '__main__':
+    main()
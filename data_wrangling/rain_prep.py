@@ -1,30 +1,119 @@
-import pandas as pd
-import csv
-
-rain_data_1 = pd.read_csv(r'../data/source/rain_data_1.csv', sep =';')
-rain_data_2 = pd.read_csv(r'../data/source/rain_data_2.csv', sep=';')
-rain_data_3 = pd.read_csv(r'../data/source/rain_data_3.csv', sep=';')
-rain_data_4 = pd.read_csv(r'../data/source/rain_data_4.csv', sep=';')
-rain_data_ch = pd.read_csv(r'../data/source/rain_data_ch.csv', sep=';')
-
-rain_data_1['DAY'] = pd.to_datetime(rain_data_1['DAY'], format='%Y%m%d').dt.strftime('%d.%m.%Y')
-rain_data_2['DAY'] = pd.to_datetime(rain_data_2['DAY'], format='%Y%m%d').dt.strftime('%d.%m.%Y')
-rain_data_3['DAY'] = pd.to_datetime(rain_data_3['DAY'], format='%Y%m%d').dt.strftime('%d.%m.%Y')
-rain_data_4['DAY'] = pd.to_datetime(rain_data_4['DAY'], format='%Y%m%d').dt.strftime('%d.%m.%Y')
-rain_data_ch['DAY'] = pd.to_datetime(rain_data_4['DAY'], format='%Y%m%d').dt.strftime('%d.%m.%Y')
-
-# Zusammenführen der DataFrames
-rain_data = pd.concat([rain_data_1, rain_data_2, rain_data_3, rain_data_4, rain_data_ch])
-
-# Reset des Index, um doppelte Indizes zu vermeiden
-rain_data.reset_index(drop=True, inplace=True)
-
-print(rain_data.head)
-
-
-output_csv_path = r'C:/Users/Murat Kayhan/OneDrive - FHNW/Documents/FHNW/ckd/Data/rain_data_total.csv'
-
-
-
-# CSV-Datei speichern
-rain_data.to_csv(output_csv_path, index=False)
\ No newline at end of file
+import argparse
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from climate_data import config, dates
+
+# Agri4cast-Exporte, in Prioritätsreihenfolge: bei doppelten (DAY, Zelle) gewinnt die erste Quelle
+SOURCES = ['rain_data_1.csv', 'rain_data_2.csv', 'rain_data_3.csv', 'rain_data_4.csv', 'rain_data_ch.csv']
+
+KEY_COLUMNS = ['DAY', 'LATITUDE', 'LONGITUDE']
+VALUE_COLUMNS = ['PRECIPITATION', 'TEMPERATURE_MAX', 'TEMPERATURE_MIN', 'TEMPERATURE_AVG', 'ET0']
+
+# Einziges Schema der Rain-Stores (auch rain_to_parquet.py schreibt über prepare), fehlende Spalten bleiben NaN
+SCHEMA = pa.schema([('DAY', pa.timestamp('ns'))]
+                   + [(column, pa.float32()) for column in KEY_COLUMNS[1:] + VALUE_COLUMNS])
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def read_chunks(path, chunksize, sep=';'):
+    for chunk in pd.read_csv(path, sep=sep, usecols=lambda column: column in SCHEMA.names, chunksize=chunksize):
+        # DAY genau einmal parsen (Agri4cast liefert %Y%m%d), fehlende Wertespalten mit NaN ergänzen
+        days = chunk['DAY']
+        chunk['DAY'], unparsed = dates.normalize_dates(days)
+        if unparsed.any():
+            print(f"{os.path.basename(path)}: {dates.unparsed_report(days, unparsed)}")
+            chunk = chunk[~unparsed]
+        chunk = chunk.reindex(columns=SCHEMA.names)
+        yield chunk.astype({column: 'float32' for column in SCHEMA.names[1:]})
+
+
+def spill_by_year(sources, spill_dir, chunksize, timings, sep=';'):
+    # Stufe 1: alle Quellen chunkweise lesen und nach Jahr in temporäre Parquet-Dateien verteilen
+    writers = {}
+    try:
+        for source in sources:
+            start = time.perf_counter()
+            rows = 0
+            for chunk in read_chunks(source, chunksize, sep):
+                for year, year_chunk in chunk.groupby(chunk['DAY'].dt.year):
+                    if year not in writers:
+                        writers[year] = pq.ParquetWriter(os.path.join(spill_dir, f'{year}.parquet'), SCHEMA)
+                    writers[year].write_table(pa.Table.from_pandas(year_chunk, schema=SCHEMA, preserve_index=False))
+                rows += len(chunk)
+            timings.append((f'read {os.path.basename(source)}', time.perf_counter() - start, rows))
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return sorted(writers)
+
+
+def write_years(years, spill_dir, store_path, timings):
+    # Stufe 2: pro Jahr Duplikate entfernen und typisiert in den Store schreiben; Speicherbedarf = ein Jahr
+    for year in years:
+        start = time.perf_counter()
+        rain = pd.read_parquet(os.path.join(spill_dir, f'{year}.parquet'))
+        rows_in = len(rain)
+        rain = rain.drop_duplicates(subset=KEY_COLUMNS, keep='first').sort_values(KEY_COLUMNS, ignore_index=True)
+
+        partition_dir = os.path.join(store_path, f'YEAR={year}')
+        os.makedirs(partition_dir, exist_ok=True)
+        pq.write_table(pa.Table.from_pandas(rain, schema=SCHEMA, preserve_index=False),
+                       os.path.join(partition_dir, 'part-0.parquet'), compression='zstd')
+        timings.append((f'write {year} ({rows_in - len(rain)} duplicates)', time.perf_counter() - start, len(rain)))
+
+
+def prepare(sources, store_path, chunksize=1_000_000, tmp_dir=None, sep=';'):
+    timings = []
+    spill_dir = tempfile.mkdtemp(prefix='rain_prep_', dir=tmp_dir)
+    # In ein temporäres Verzeichnis schreiben und erst am Ende austauschen: scheitert ein Lauf, bleibt der alte Store,
+    # und laufende Dashboards lesen bis zum Austausch den alten Store
+    tmp_path = store_path + '.tmp'
+    old_path = store_path + '.old'
+    try:
+        years = spill_by_year(sources, spill_dir, chunksize, timings, sep)
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        write_years(years, spill_dir, tmp_path, timings)
+        shutil.rmtree(old_path, ignore_errors=True)
+        if os.path.isdir(store_path):
+            os.replace(store_path, old_path)
+        os.replace(tmp_path, store_path)
+        shutil.rmtree(old_path, ignore_errors=True)
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Merge the Agri4cast rain exports into a year-partitioned Parquet store.')
+    parser.add_argument('--sources', nargs='+', default=[config.source_path(name) for name in SOURCES])
+    parser.add_argument('--dataset', default='alps', help=f'target store, one of {sorted(config.RAIN_STORES)}')
+    parser.add_argument('--chunksize', type=int, default=1_000_000)
+    parser.add_argument('--tmp-dir', default=None, help='directory for the temporary per-year files')
+    args = parser.parse_args()
+
+    store_path = config.rain_store_path(args.dataset)
+    start = time.perf_counter()
+    timings = prepare(args.sources, store_path, chunksize=args.chunksize, tmp_dir=args.tmp_dir)
+
+    for stage, seconds, rows in timings:
+        print(f"{stage:<40} {rows:>12} rows {seconds:>8.1f}s")
+    print(f"total {time.perf_counter() - start:.1f}s, peak RSS {peak_rss_mb():.0f} MB, written to {store_path}")
+    print("run grid_index.py and rain_rollup.py afterwards to refresh CELL_ID and the rollup")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import argparse
+import os
+import shutil
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from climate_data import config, cube, indices, raster, trends
+
+
+def cube_years(rain_cube):
+    last_day = rain_cube.first_day + rain_cube.precipitation.shape[0] - 1
+    return range(int(str(rain_cube.first_day)[:4]), int(str(last_day)[:4]) + 1)
+
+
+def map_paths(rain_raster, statistic, years):
+    # Monatskarten pro Jahr und Monat, Extremindizes pro Jahr, Trends und Skalierung einmal (None: keine Werte)
+    if statistic in trends.MAP_LAYERS:
+        return [rain_raster.layer_png_path(statistic)]
+    if statistic in raster.INDEX_STATISTICS:
+        return [rain_raster.index_png_path(year, statistic) for year in years]
+    return [rain_raster.png_path(year, month, statistic) for year in years for month in range(1, 13)]
+
+
+def build(dataset, statistics, force=False):
+    # Alle Karten vorab rendern, sonst entstehen sie beim ersten Abruf im Dashboard
+    start = time.perf_counter()
+    rain_cube = cube.open_cube(dataset)
+    if force:
+        shutil.rmtree(config.rain_raster_path(dataset), ignore_errors=True)
+    layers = trends.map_layers(*trends.load_trends(dataset), rain_cube)
+    rain_raster = raster.open_raster(dataset, rain_cube, indices.load_indices(dataset), layers)
+
+    size = 0
+    count = 0
+    for statistic in statistics:
+        for path in map_paths(rain_raster, statistic, cube_years(rain_cube)):
+            if path is not None:
+                size += os.path.getsize(path)
+                count += 1
+    height, width = rain_raster.columns.shape
+    print(f"{dataset}: {count} maps of {width}x{height} px ({size / max(count, 1) / 1024:.1f} kB each) "
+          f"in {time.perf_counter() - start:.1f}s, written to {rain_raster.path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render the precipitation, index and trend maps (PNG overlays).')
+    parser.add_argument('datasets', nargs='*', help=f'one of {sorted(config.RAIN_RASTERS)}, default: all')
+    # Extremindizes, Trends und Skalierung nur, wenn extreme_indices.py bzw. precipitation_trends.py gelaufen sind
+    statistics = raster.STATISTICS + raster.INDEX_STATISTICS + tuple(trends.MAP_LAYERS)
+    parser.add_argument('--statistics', nargs='+', choices=statistics, default=list(statistics))
+    parser.add_argument('--force', action='store_true', help='render every map again')
+    args = parser.parse_args()
+
+    for dataset in args.datasets or sorted(config.RAIN_RASTERS):
+        build(dataset, args.statistics, force=args.force)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+import argparse
+import os
+import shutil
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from climate_data import config, loader
+
+
+def rollup_year(rain, country_by_cell, rules):
+    # Land über die CELL_ID nachschlagen (data_wrangling/grid_index.py), keine Geometrie nötig
+    rain['COUNTRY'] = country_by_cell.reindex(rain['CELL_ID']).to_numpy()
+
+    # Summe und Anzahl statt Mittelwert speichern, damit Wochen/Monate exakt und über Jahre hinweg aggregierbar bleiben
+    groups = [(config.ALL_COUNTRIES, rain)] + list(rain.dropna(subset=['COUNTRY']).groupby('COUNTRY'))
+    frames = []
+    for country, country_rain in groups:
+        daily = country_rain.groupby('DAY')['PRECIPITATION'].agg(PRECIPITATION_SUM='sum', N='count')
+        for timeframe, rule in rules.items():
+            rows = daily if timeframe == 'D' else daily.resample(rule).sum()
+            rows = rows.reset_index()
+            rows.insert(0, 'TIMEFRAME', timeframe)
+            rows.insert(0, 'COUNTRY', country)
+            frames.append(rows)
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def stale_years(dataset, force=False):
+    # Ein Jahr wird neu berechnet, wenn die Rollup-Partition fehlt oder älter als die Quell-Partition oder der
+    # Rasterindex ist (grid_index.py ordnet Zellen einem anderen Land zu, die Ländermittel ändern sich)
+    store_path = config.rain_store_path(dataset)
+    rollup_path = config.rain_rollup_path(dataset)
+    grid_path = config.generated_path(config.GRID_CELLS)
+    grid_mtime = os.path.getmtime(grid_path) if os.path.exists(grid_path) else 0
+    years = []
+    for year in loader.available_years(dataset):
+        source_file = os.path.join(store_path, f'YEAR={year}', 'part-0.parquet')
+        target_file = os.path.join(rollup_path, f'YEAR={year}', 'part-0.parquet')
+        if force or not os.path.exists(target_file) \
+                or os.path.getmtime(target_file) < max(os.path.getmtime(source_file), grid_mtime):
+            years.append(year)
+    return years
+
+
+def remove_orphans(dataset):
+    # Rollup-Partitionen von Jahren, die es im Store nicht mehr gibt, würden sonst weiter gelesen
+    rollup_path = config.rain_rollup_path(dataset)
+    if not os.path.isdir(rollup_path):
+        return []
+    years = set(loader.available_years(dataset))
+    orphans = sorted(int(name[len('YEAR='):]) for name in os.listdir(rollup_path)
+                     if name.startswith('YEAR=') and int(name[len('YEAR='):]) not in years)
+    for year in orphans:
+        shutil.rmtree(os.path.join(rollup_path, f'YEAR={year}'))
+        print(f"{dataset} {year}: rollup partition removed, the year is no longer in the store")
+    return orphans
+
+
+def build(dataset, force=False):
+    remove_orphans(dataset)
+    years = stale_years(dataset, force=force)
+    if not years:
+        print(f"{dataset}: rollup is up to date")
+        return []
+
+    country_by_cell = loader.load_grid_cells()['COUNTRY']
+    rules = config.TIMEFRAME_RULES[dataset]
+
+    for year in years:
+        start = time.perf_counter()
+        rain = loader.load_rain(dataset, years=[year], columns=['DAY', 'CELL_ID', 'PRECIPITATION'])
+        rollup = rollup_year(rain, country_by_cell, rules)
+        partition_dir = os.path.join(config.rain_rollup_path(dataset), f'YEAR={year}')
+        os.makedirs(partition_dir, exist_ok=True)
+        rollup.to_parquet(os.path.join(partition_dir, 'part-0.parquet'), index=False, compression='zstd')
+        print(f"{dataset} {year}: {len(rollup)} rollup rows in {time.perf_counter() - start:.1f}s")
+
+    return years
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute spatial mean precipitation per country and timeframe.')
+    parser.add_argument('datasets', nargs='*', help=f'one of {sorted(config.RAIN_STORES)}, default: all')
+    parser.add_argument('--force', action='store_true', help='rebuild all years, not only new or changed ones')
+    args = parser.parse_args()
+
+    for dataset in args.datasets or sorted(config.RAIN_STORES):
+        build(dataset, force=args.force)
+
+
+if __name__ == '__main__':
+    main()
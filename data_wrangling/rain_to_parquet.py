@@ -0,0 +1,30 @@
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from climate_data import config
+import rain_prep
+
+
+def convert(csv_path, store_path, chunksize=2_000_000):
+    # Die generierten CSVs sind kommagetrennt; geschrieben wird wie von rain_prep.py, mit dessen Schema
+    timings = rain_prep.prepare([csv_path], store_path, chunksize=chunksize, sep=',')
+    return sum(rows for stage, seconds, rows in timings if stage.startswith('write '))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert the generated rain CSVs into year-partitioned Parquet stores.')
+    parser.add_argument('datasets', nargs='*', help=f'one of {sorted(config.RAIN_STORES)}, default: all')
+    parser.add_argument('--chunksize', type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    for dataset in args.datasets or sorted(config.RAIN_STORES):
+        store_path = config.rain_store_path(dataset)
+        csv_path = config.generated_path(config.RAIN_CSV[dataset])
+        rows = convert(csv_path, store_path, chunksize=args.chunksize)
+        print(f"{dataset}: {rows} rows written to {store_path}")
+
+
+if __name__ == '__main__':
+    main()